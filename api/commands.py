@@ -16,11 +16,16 @@ from extensions.ext_database import db
 from libs.rsa import generate_key_pair
 from models.account import InvitationCode, Tenant
 from models.dataset import Dataset, DatasetQuery, Document
-from models.model import Account
+from models.model import Account, App
 import secrets
 import base64
 
 from models.provider import Provider, ProviderType, ProviderQuotaType
+from models.source import DataSourceBinding
+from services.app_statistic_service import AppStatisticService
+from services.dataset_service import DatasetService, SegmentService
+from services.message_search_service import MessageSearchService
+from services.notion_sync_service import NotionSyncService
 
 
 @click.command('reset-password', help='Reset the account password.')
@@ -249,6 +254,71 @@ def clean_unused_dataset_indexes():
     click.echo(click.style('Cleaned unused dataset from db success latency: {}'.format(end_at - start_at), fg='green'))
 
 
+@click.command('sync-notion-documents', help='Sync the notion documents edited since the last sync.')
+def sync_notion_documents():
+    click.echo(click.style('Start sync notion documents.', fg='green'))
+    start_at = time.perf_counter()
+    count = 0
+    data_source_bindings = db.session.query(DataSourceBinding).filter(
+        DataSourceBinding.provider == 'notion',
+        DataSourceBinding.disabled == False
+    ).all()
+    for data_source_binding in data_source_bindings:
+        try:
+            count += NotionSyncService.sync_data_source_binding(data_source_binding)
+        except Exception as e:
+            click.echo(
+                click.style('sync notion data source binding {} error: {} {}'.format(
+                    data_source_binding.id, e.__class__.__name__, str(e)), fg='red'))
+    end_at = time.perf_counter()
+    click.echo(click.style('Enqueued {} notion documents to sync, latency: {}'.format(count, end_at - start_at),
+                           fg='green'))
+
+
+@click.command('rollup-app-statistics', help='Roll up the hourly statistics of all apps.')
+def rollup_app_statistics():
+    click.echo(click.style('Start roll up app statistics.', fg='green'))
+    start_at = time.perf_counter()
+    count = 0
+    app_ids = [app_id for app_id, in db.session.query(App.id).all()]
+    for app_id in app_ids:
+        try:
+            count += AppStatisticService.rollup(app_id)
+        except Exception as e:
+            db.session.rollback()
+            click.echo(click.style('roll up statistics of app {} error: {} {}'.format(
+                app_id, e.__class__.__name__, str(e)), fg='red'))
+    end_at = time.perf_counter()
+    click.echo(click.style('Rolled up {} app hours, latency: {}'.format(count, end_at - start_at), fg='green'))
+
+
+@click.command('create-message-search-indexes', help='Add all messages to the search index of the logs.')
+def create_message_search_indexes():
+    click.echo(click.style('Start create message search indexes.', fg='green'))
+    start_at = time.perf_counter()
+    count = MessageSearchService.index_all_messages()
+    end_at = time.perf_counter()
+    click.echo(click.style('Indexed {} messages, latency: {}'.format(count, end_at - start_at), fg='green'))
+
+
+@click.command('create-segment-search-indexes', help='Fill the keyword search vectors of existing segments.')
+def create_segment_search_indexes():
+    click.echo(click.style('Start create segment search indexes.', fg='green'))
+    start_at = time.perf_counter()
+    count = SegmentService.index_all_segments()
+    end_at = time.perf_counter()
+    click.echo(click.style('Indexed {} segments, latency: {}'.format(count, end_at - start_at), fg='green'))
+
+
+@click.command('reconcile-dataset-counters', help='Recount the counters of all datasets and documents.')
+def reconcile_dataset_counters():
+    click.echo(click.style('Start reconcile dataset counters.', fg='green'))
+    start_at = time.perf_counter()
+    count = DatasetService.reconcile_counters()
+    end_at = time.perf_counter()
+    click.echo(click.style('Reconciled {} datasets, latency: {}'.format(count, end_at - start_at), fg='green'))
+
+
 @click.command('sync-anthropic-hosted-providers', help='Sync anthropic hosted providers.')
 def sync_anthropic_hosted_providers():
     if not hosted_model_providers.anthropic:
@@ -300,3 +370,8 @@ def register_commands(app):
     app.cli.add_command(recreate_all_dataset_indexes)
     app.cli.add_command(sync_anthropic_hosted_providers)
     app.cli.add_command(clean_unused_dataset_indexes)
+    app.cli.add_command(sync_notion_documents)
+    app.cli.add_command(rollup_app_statistics)
+    app.cli.add_command(create_message_search_indexes)
+    app.cli.add_command(create_segment_search_indexes)
+    app.cli.add_command(reconcile_dataset_counters)
@@ -62,7 +62,17 @@ DEFAULTS = {
     'HOSTED_ANTHROPIC_PAID_ENABLED': 'False',
     'HOSTED_ANTHROPIC_PAID_INCREASE_QUOTA': 1,
     'TENANT_DOCUMENT_COUNT': 100,
-    'CLEAN_DAY_SETTING': 30
+    'CLEAN_DAY_SETTING': 30,
+    'HYBRID_SEARCH_ENABLED': 'False',
+    'HYBRID_SEARCH_VECTOR_WEIGHT': 0.7,
+    'HYBRID_SEARCH_KEYWORD_WEIGHT': 0.3,
+    'SEGMENT_CONTENT_CACHE_TTL': 0,
+    'PDF_EXTRACT_MAX_WORKERS': 1,
+    'NOTION_FETCH_MAX_WORKERS': 4,
+    'INDEXING_PROCESS_POOL_WORKERS': 0,
+    'QA_GENERATION_MAX_WORKERS': 10,
+    'QA_GENERATION_RATE_LIMIT': 2,
+    'CONVERSATION_GENERATION_MAX_WORKERS': 4,
 }
 
 
@@ -244,6 +254,32 @@ class Config:
         self.TENANT_DOCUMENT_COUNT = get_env('TENANT_DOCUMENT_COUNT')
         self.CLEAN_DAY_SETTING = get_env('CLEAN_DAY_SETTING')
 
+        # hybrid search settings, fuse vector and keyword results for high_quality datasets
+        self.HYBRID_SEARCH_ENABLED = get_bool_env('HYBRID_SEARCH_ENABLED')
+        self.HYBRID_SEARCH_VECTOR_WEIGHT = float(get_env('HYBRID_SEARCH_VECTOR_WEIGHT'))
+        self.HYBRID_SEARCH_KEYWORD_WEIGHT = float(get_env('HYBRID_SEARCH_KEYWORD_WEIGHT'))
+
+        # seconds to cache retrieved segment content in redis, 0 to disable
+        self.SEGMENT_CONTENT_CACHE_TTL = int(get_env('SEGMENT_CONTENT_CACHE_TTL'))
+
+        # processes to extract pdf pages with, 1 to extract in the calling process
+        self.PDF_EXTRACT_MAX_WORKERS = int(get_env('PDF_EXTRACT_MAX_WORKERS'))
+
+        # concurrent requests to fetch a notion block tree with, rate limited to 3 requests per second
+        self.NOTION_FETCH_MAX_WORKERS = int(get_env('NOTION_FETCH_MAX_WORKERS'))
+
+        # processes to clean, split and extract keywords with while indexing, 0 to run in the indexing process
+        self.INDEXING_PROCESS_POOL_WORKERS = int(get_env('INDEXING_PROCESS_POOL_WORKERS'))
+
+        # threads shared by the process to generate the qa pairs of qa_model documents with
+        self.QA_GENERATION_MAX_WORKERS = int(get_env('QA_GENERATION_MAX_WORKERS'))
+
+        # qa generation requests per second of a tenant, in a process
+        self.QA_GENERATION_RATE_LIMIT = float(get_env('QA_GENERATION_RATE_LIMIT'))
+
+        # threads a batch task generates the names or summaries of conversations with
+        self.CONVERSATION_GENERATION_MAX_WORKERS = int(get_env('CONVERSATION_GENERATION_MAX_WORKERS'))
+
 
 class CloudEditionConfig(Config):
 
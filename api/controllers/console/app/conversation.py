@@ -2,19 +2,21 @@ from datetime import datetime
 
 import pytz
 from flask_login import login_required, current_user
-from flask_restful import Resource, reqparse, fields, marshal_with
+from flask_restful import Resource, reqparse, fields, marshal_with, marshal
 from flask_restful.inputs import int_range
 from sqlalchemy import or_, func
-from sqlalchemy.orm import joinedload
 from werkzeug.exceptions import NotFound
 
 from controllers.console import api
 from controllers.console.app import _get_app
+from controllers.console.error import InvalidCursorError
 from controllers.console.setup import setup_required
 from controllers.console.wraps import account_initialization_required
 from libs.helper import TimestampField, datetime_string, uuid_value
 from extensions.ext_database import db
 from models.model import Message, MessageAnnotation, Conversation
+from services.conversation_service import ConversationService
+from services.message_search_service import MessageSearchService
 
 account_fields = {
     'id': fields.String,
@@ -114,10 +116,17 @@ class CompletionConversationApi(Resource):
         'data': fields.List(fields.Nested(conversation_fields), attribute='items')
     }
 
+    conversation_cursor_pagination_fields = {
+        'limit': fields.Integer,
+        'total': fields.Integer,
+        'has_more': fields.Boolean,
+        'next_cursor': fields.String,
+        'data': fields.List(fields.Nested(conversation_fields))
+    }
+
     @setup_required
     @login_required
     @account_initialization_required
-    @marshal_with(conversation_pagination_fields)
     def get(self, app_id):
         app_id = str(app_id)
 
@@ -128,6 +137,7 @@ class CompletionConversationApi(Resource):
         parser.add_argument('annotation_status', type=str,
                             choices=['annotated', 'not_annotated', 'all'], default='all', location='args')
         parser.add_argument('page', type=int_range(1, 99999), default=1, location='args')
+        parser.add_argument('cursor', type=str, location='args')
         parser.add_argument('limit', type=int_range(1, 100), default=20, location='args')
         args = parser.parse_args()
 
@@ -137,13 +147,8 @@ class CompletionConversationApi(Resource):
         query = db.select(Conversation).where(Conversation.app_id == app.id, Conversation.mode == 'completion')
 
         if args['keyword']:
-            query = query.join(
-                Message, Message.conversation_id == Conversation.id
-            ).filter(
-                or_(
-                    Message.query.ilike('%{}%'.format(args['keyword'])),
-                    Message.answer.ilike('%{}%'.format(args['keyword']))
-                )
+            query = query.where(
+                Conversation.id.in_(MessageSearchService.search_conversation_ids(app.id, args['keyword']))
             )
 
         account = current_user
@@ -169,7 +174,7 @@ class CompletionConversationApi(Resource):
             query = query.where(Conversation.created_at < end_datetime_utc)
 
         if args['annotation_status'] == "annotated":
-            query = query.options(joinedload(Conversation.message_annotations)).join(
+            query = query.join(
                 MessageAnnotation, MessageAnnotation.conversation_id == Conversation.id
             )
         elif args['annotation_status'] == "not_annotated":
@@ -177,6 +182,14 @@ class CompletionConversationApi(Resource):
                 MessageAnnotation, MessageAnnotation.conversation_id == Conversation.id
             ).group_by(Conversation.id).having(func.count(MessageAnnotation.id) == 0)
 
+        if args['cursor'] is not None:
+            try:
+                pagination = ConversationService.paginate_list_by_cursor(query, args['cursor'], args['limit'])
+            except ValueError:
+                raise InvalidCursorError()
+
+            return marshal(pagination, self.conversation_cursor_pagination_fields)
+
         query = query.order_by(Conversation.created_at.desc())
 
         conversations = db.paginate(
@@ -185,8 +198,9 @@ class CompletionConversationApi(Resource):
             per_page=args['limit'],
             error_out=False
         )
+        ConversationService.load_list_aggregates(conversations.items)
 
-        return conversations
+        return marshal(conversations, self.conversation_pagination_fields)
 
 
 class CompletionConversationDetailApi(Resource):
@@ -267,10 +281,17 @@ class ChatConversationApi(Resource):
         'data': fields.List(fields.Nested(conversation_fields), attribute='items')
     }
 
+    conversation_cursor_pagination_fields = {
+        'limit': fields.Integer,
+        'total': fields.Integer,
+        'has_more': fields.Boolean,
+        'next_cursor': fields.String,
+        'data': fields.List(fields.Nested(conversation_fields))
+    }
+
     @setup_required
     @login_required
     @account_initialization_required
-    @marshal_with(conversation_pagination_fields)
     def get(self, app_id):
         app_id = str(app_id)
 
@@ -282,6 +303,7 @@ class ChatConversationApi(Resource):
                             choices=['annotated', 'not_annotated', 'all'], default='all', location='args')
         parser.add_argument('message_count_gte', type=int_range(1, 99999), required=False, location='args')
         parser.add_argument('page', type=int_range(1, 99999), required=False, default=1, location='args')
+        parser.add_argument('cursor', type=str, required=False, location='args')
         parser.add_argument('limit', type=int_range(1, 100), required=False, default=20, location='args')
         args = parser.parse_args()
 
@@ -291,16 +313,12 @@ class ChatConversationApi(Resource):
         query = db.select(Conversation).where(Conversation.app_id == app.id, Conversation.mode == 'chat')
 
         if args['keyword']:
-            query = query.join(
-                Message, Message.conversation_id == Conversation.id
-            ).filter(
+            query = query.where(
                 or_(
-                    Message.query.ilike('%{}%'.format(args['keyword'])),
-                    Message.answer.ilike('%{}%'.format(args['keyword'])),
+                    Conversation.id.in_(MessageSearchService.search_conversation_ids(app.id, args['keyword'])),
                     Conversation.name.ilike('%{}%'.format(args['keyword'])),
                     Conversation.introduction.ilike('%{}%'.format(args['keyword'])),
-                ),
-
+                )
             )
 
         account = current_user
@@ -326,7 +344,7 @@ class ChatConversationApi(Resource):
             query = query.where(Conversation.created_at < end_datetime_utc)
 
         if args['annotation_status'] == "annotated":
-            query = query.options(joinedload(Conversation.message_annotations)).join(
+            query = query.join(
                 MessageAnnotation, MessageAnnotation.conversation_id == Conversation.id
             )
         elif args['annotation_status'] == "not_annotated":
@@ -336,12 +354,19 @@ class ChatConversationApi(Resource):
 
         if args['message_count_gte'] and args['message_count_gte'] >= 1:
             query = (
-                query.options(joinedload(Conversation.messages))
-                .join(Message, Message.conversation_id == Conversation.id)
+                query.join(Message, Message.conversation_id == Conversation.id)
                 .group_by(Conversation.id)
                 .having(func.count(Message.id) >= args['message_count_gte'])
             )
 
+        if args['cursor'] is not None:
+            try:
+                pagination = ConversationService.paginate_list_by_cursor(query, args['cursor'], args['limit'])
+            except ValueError:
+                raise InvalidCursorError()
+
+            return marshal(pagination, self.conversation_cursor_pagination_fields)
+
         query = query.order_by(Conversation.created_at.desc())
 
         conversations = db.paginate(
@@ -350,8 +375,9 @@ class ChatConversationApi(Resource):
             per_page=args['limit'],
             error_out=False
         )
+        ConversationService.load_list_aggregates(conversations.items)
 
-        return conversations
+        return marshal(conversations, self.conversation_pagination_fields)
 
 
 class ChatConversationDetailApi(Resource):
@@ -1,6 +1,7 @@
 # -*- coding:utf-8 -*-
 from decimal import Decimal
 from datetime import datetime
+from typing import Optional, Tuple
 
 import pytz
 from flask import jsonify
@@ -12,57 +13,50 @@ from controllers.console.app import _get_app
 from controllers.console.setup import setup_required
 from controllers.console.wraps import account_initialization_required
 from libs.helper import datetime_string
-from extensions.ext_database import db
+from services.app_statistic_service import AppStatisticService
 
 
-class DailyConversationStatistic(Resource):
-
-    @setup_required
-    @login_required
-    @account_initialization_required
-    def get(self, app_id):
-        account = current_user
-        app_id = str(app_id)
-        app_model = _get_app(app_id)
-
-        parser = reqparse.RequestParser()
-        parser.add_argument('start', type=datetime_string('%Y-%m-%d %H:%M'), location='args')
-        parser.add_argument('end', type=datetime_string('%Y-%m-%d %H:%M'), location='args')
-        args = parser.parse_args()
-
-        sql_query = '''
-        SELECT date(DATE_TRUNC('day', created_at AT TIME ZONE 'UTC' AT TIME ZONE :tz )) AS date, count(distinct messages.conversation_id) AS conversation_count
-            FROM messages where app_id = :app_id 
-        '''
-        arg_dict = {'tz': account.timezone, 'app_id': app_model.id}
+def _parse_range_args(timezone: str) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """Parse the start and end args in the timezone of the account to UTC datetimes."""
+    parser = reqparse.RequestParser()
+    parser.add_argument('start', type=datetime_string('%Y-%m-%d %H:%M'), location='args')
+    parser.add_argument('end', type=datetime_string('%Y-%m-%d %H:%M'), location='args')
+    args = parser.parse_args()
 
-        timezone = pytz.timezone(account.timezone)
-        utc_timezone = pytz.utc
+    timezone = pytz.timezone(timezone)
+    utc_timezone = pytz.utc
 
-        if args['start']:
-            start_datetime = datetime.strptime(args['start'], '%Y-%m-%d %H:%M')
-            start_datetime = start_datetime.replace(second=0)
+    start_datetime_utc = None
+    if args['start']:
+        start_datetime = datetime.strptime(args['start'], '%Y-%m-%d %H:%M')
+        start_datetime = start_datetime.replace(second=0)
 
-            start_datetime_timezone = timezone.localize(start_datetime)
-            start_datetime_utc = start_datetime_timezone.astimezone(utc_timezone)
+        start_datetime_timezone = timezone.localize(start_datetime)
+        start_datetime_utc = start_datetime_timezone.astimezone(utc_timezone).replace(tzinfo=None)
 
-            sql_query += ' and created_at >= :start'
-            arg_dict['start'] = start_datetime_utc
+    end_datetime_utc = None
+    if args['end']:
+        end_datetime = datetime.strptime(args['end'], '%Y-%m-%d %H:%M')
+        end_datetime = end_datetime.replace(second=0)
 
-        if args['end']:
-            end_datetime = datetime.strptime(args['end'], '%Y-%m-%d %H:%M')
-            end_datetime = end_datetime.replace(second=0)
+        end_datetime_timezone = timezone.localize(end_datetime)
+        end_datetime_utc = end_datetime_timezone.astimezone(utc_timezone).replace(tzinfo=None)
 
-            end_datetime_timezone = timezone.localize(end_datetime)
-            end_datetime_utc = end_datetime_timezone.astimezone(utc_timezone)
+    return start_datetime_utc, end_datetime_utc
 
-            sql_query += ' and created_at < :end'
-            arg_dict['end'] = end_datetime_utc
 
-        sql_query += ' GROUP BY date order by date'
+class DailyConversationStatistic(Resource):
+    @setup_required
+    @login_required
+    @account_initialization_required
+    def get(self, app_id):
+        account = current_user
+        app_id = str(app_id)
+        app_model = _get_app(app_id)
 
-        with db.engine.begin() as conn:
-            rs = conn.execute(db.text(sql_query), arg_dict)
+        start_datetime_utc, end_datetime_utc = _parse_range_args(account.timezone)
+        rs = AppStatisticService.get_daily_conversations(
+            app_model.id, account.timezone, start_datetime_utc, end_datetime_utc)
 
         response_data = []
 
@@ -78,7 +72,6 @@ class DailyConversationStatistic(Resource):
 
 
 class DailyTerminalsStatistic(Resource):
-
     @setup_required
     @login_required
     @account_initialization_required
@@ -87,44 +80,9 @@ class DailyTerminalsStatistic(Resource):
         app_id = str(app_id)
         app_model = _get_app(app_id)
 
-        parser = reqparse.RequestParser()
-        parser.add_argument('start', type=datetime_string('%Y-%m-%d %H:%M'), location='args')
-        parser.add_argument('end', type=datetime_string('%Y-%m-%d %H:%M'), location='args')
-        args = parser.parse_args()
-
-        sql_query = '''
-                SELECT date(DATE_TRUNC('day', created_at AT TIME ZONE 'UTC' AT TIME ZONE :tz )) AS date, count(distinct messages.from_end_user_id) AS terminal_count
-                    FROM messages where app_id = :app_id 
-                '''
-        arg_dict = {'tz': account.timezone, 'app_id': app_model.id}
-
-        timezone = pytz.timezone(account.timezone)
-        utc_timezone = pytz.utc
-
-        if args['start']:
-            start_datetime = datetime.strptime(args['start'], '%Y-%m-%d %H:%M')
-            start_datetime = start_datetime.replace(second=0)
-
-            start_datetime_timezone = timezone.localize(start_datetime)
-            start_datetime_utc = start_datetime_timezone.astimezone(utc_timezone)
-
-            sql_query += ' and created_at >= :start'
-            arg_dict['start'] = start_datetime_utc
-
-        if args['end']:
-            end_datetime = datetime.strptime(args['end'], '%Y-%m-%d %H:%M')
-            end_datetime = end_datetime.replace(second=0)
-
-            end_datetime_timezone = timezone.localize(end_datetime)
-            end_datetime_utc = end_datetime_timezone.astimezone(utc_timezone)
-
-            sql_query += ' and created_at < :end'
-            arg_dict['end'] = end_datetime_utc
-
-        sql_query += ' GROUP BY date order by date'
-
-        with db.engine.begin() as conn:
-            rs = conn.execute(db.text(sql_query), arg_dict)
+        start_datetime_utc, end_datetime_utc = _parse_range_args(account.timezone)
+        rs = AppStatisticService.get_daily_terminals(
+            app_model.id, account.timezone, start_datetime_utc, end_datetime_utc)
 
         response_data = []
 
@@ -148,46 +106,9 @@ class DailyTokenCostStatistic(Resource):
         app_id = str(app_id)
         app_model = _get_app(app_id)
 
-        parser = reqparse.RequestParser()
-        parser.add_argument('start', type=datetime_string('%Y-%m-%d %H:%M'), location='args')
-        parser.add_argument('end', type=datetime_string('%Y-%m-%d %H:%M'), location='args')
-        args = parser.parse_args()
-
-        sql_query = '''
-                SELECT date(DATE_TRUNC('day', created_at AT TIME ZONE 'UTC' AT TIME ZONE :tz )) AS date, 
-                    (sum(messages.message_tokens) + sum(messages.answer_tokens)) as token_count,
-                    sum(total_price) as total_price
-                    FROM messages where app_id = :app_id 
-                '''
-        arg_dict = {'tz': account.timezone, 'app_id': app_model.id}
-
-        timezone = pytz.timezone(account.timezone)
-        utc_timezone = pytz.utc
-
-        if args['start']:
-            start_datetime = datetime.strptime(args['start'], '%Y-%m-%d %H:%M')
-            start_datetime = start_datetime.replace(second=0)
-
-            start_datetime_timezone = timezone.localize(start_datetime)
-            start_datetime_utc = start_datetime_timezone.astimezone(utc_timezone)
-
-            sql_query += ' and created_at >= :start'
-            arg_dict['start'] = start_datetime_utc
-
-        if args['end']:
-            end_datetime = datetime.strptime(args['end'], '%Y-%m-%d %H:%M')
-            end_datetime = end_datetime.replace(second=0)
-
-            end_datetime_timezone = timezone.localize(end_datetime)
-            end_datetime_utc = end_datetime_timezone.astimezone(utc_timezone)
-
-            sql_query += ' and created_at < :end'
-            arg_dict['end'] = end_datetime_utc
-
-        sql_query += ' GROUP BY date order by date'
-
-        with db.engine.begin() as conn:
-            rs = conn.execute(db.text(sql_query), arg_dict)
+        start_datetime_utc, end_datetime_utc = _parse_range_args(account.timezone)
+        rs = AppStatisticService.get_daily_token_costs(
+            app_model.id, account.timezone, start_datetime_utc, end_datetime_utc)
 
         response_data = []
 
@@ -213,50 +134,9 @@ class AverageSessionInteractionStatistic(Resource):
         app_id = str(app_id)
         app_model = _get_app(app_id, 'chat')
 
-        parser = reqparse.RequestParser()
-        parser.add_argument('start', type=datetime_string('%Y-%m-%d %H:%M'), location='args')
-        parser.add_argument('end', type=datetime_string('%Y-%m-%d %H:%M'), location='args')
-        args = parser.parse_args()
-
-        sql_query = """SELECT date(DATE_TRUNC('day', c.created_at AT TIME ZONE 'UTC' AT TIME ZONE :tz )) AS date, 
-AVG(subquery.message_count) AS interactions
-FROM (SELECT m.conversation_id, COUNT(m.id) AS message_count
-    FROM conversations c
-    JOIN messages m ON c.id = m.conversation_id
-    WHERE c.override_model_configs IS NULL AND c.app_id = :app_id"""
-        arg_dict = {'tz': account.timezone, 'app_id': app_model.id}
-
-        timezone = pytz.timezone(account.timezone)
-        utc_timezone = pytz.utc
-
-        if args['start']:
-            start_datetime = datetime.strptime(args['start'], '%Y-%m-%d %H:%M')
-            start_datetime = start_datetime.replace(second=0)
-
-            start_datetime_timezone = timezone.localize(start_datetime)
-            start_datetime_utc = start_datetime_timezone.astimezone(utc_timezone)
-
-            sql_query += ' and c.created_at >= :start'
-            arg_dict['start'] = start_datetime_utc
-
-        if args['end']:
-            end_datetime = datetime.strptime(args['end'], '%Y-%m-%d %H:%M')
-            end_datetime = end_datetime.replace(second=0)
-
-            end_datetime_timezone = timezone.localize(end_datetime)
-            end_datetime_utc = end_datetime_timezone.astimezone(utc_timezone)
-
-            sql_query += ' and c.created_at < :end'
-            arg_dict['end'] = end_datetime_utc
-
-        sql_query += """
-        GROUP BY m.conversation_id) subquery
-LEFT JOIN conversations c on c.id=subquery.conversation_id
-GROUP BY date
-ORDER BY date"""
-
-        with db.engine.begin() as conn:
-            rs = conn.execute(db.text(sql_query), arg_dict)
+        start_datetime_utc, end_datetime_utc = _parse_range_args(account.timezone)
+        rs = AppStatisticService.get_daily_average_session_interactions(
+            app_model.id, account.timezone, start_datetime_utc, end_datetime_utc)
 
         response_data = []
 
@@ -280,47 +160,9 @@ class UserSatisfactionRateStatistic(Resource):
         app_id = str(app_id)
         app_model = _get_app(app_id)
 
-        parser = reqparse.RequestParser()
-        parser.add_argument('start', type=datetime_string('%Y-%m-%d %H:%M'), location='args')
-        parser.add_argument('end', type=datetime_string('%Y-%m-%d %H:%M'), location='args')
-        args = parser.parse_args()
-
-        sql_query = '''
-                        SELECT date(DATE_TRUNC('day', m.created_at AT TIME ZONE 'UTC' AT TIME ZONE :tz )) AS date, 
-                            COUNT(m.id) as message_count, COUNT(mf.id) as feedback_count 
-                            FROM messages m
-                            LEFT JOIN message_feedbacks mf on mf.message_id=m.id
-                            WHERE m.app_id = :app_id 
-                        '''
-        arg_dict = {'tz': account.timezone, 'app_id': app_model.id}
-
-        timezone = pytz.timezone(account.timezone)
-        utc_timezone = pytz.utc
-
-        if args['start']:
-            start_datetime = datetime.strptime(args['start'], '%Y-%m-%d %H:%M')
-            start_datetime = start_datetime.replace(second=0)
-
-            start_datetime_timezone = timezone.localize(start_datetime)
-            start_datetime_utc = start_datetime_timezone.astimezone(utc_timezone)
-
-            sql_query += ' and m.created_at >= :start'
-            arg_dict['start'] = start_datetime_utc
-
-        if args['end']:
-            end_datetime = datetime.strptime(args['end'], '%Y-%m-%d %H:%M')
-            end_datetime = end_datetime.replace(second=0)
-
-            end_datetime_timezone = timezone.localize(end_datetime)
-            end_datetime_utc = end_datetime_timezone.astimezone(utc_timezone)
-
-            sql_query += ' and m.created_at < :end'
-            arg_dict['end'] = end_datetime_utc
-
-        sql_query += ' GROUP BY date order by date'
-
-        with db.engine.begin() as conn:
-            rs = conn.execute(db.text(sql_query), arg_dict)
+        start_datetime_utc, end_datetime_utc = _parse_range_args(account.timezone)
+        rs = AppStatisticService.get_daily_user_satisfaction(
+            app_model.id, account.timezone, start_datetime_utc, end_datetime_utc)
 
         response_data = []
 
@@ -331,8 +173,8 @@ class UserSatisfactionRateStatistic(Resource):
             })
 
         return jsonify({
-                'data': response_data
-            })
+            'data': response_data
+        })
 
 
 class AverageResponseTimeStatistic(Resource):
@@ -344,46 +186,9 @@ class AverageResponseTimeStatistic(Resource):
         app_id = str(app_id)
         app_model = _get_app(app_id, 'completion')
 
-        parser = reqparse.RequestParser()
-        parser.add_argument('start', type=datetime_string('%Y-%m-%d %H:%M'), location='args')
-        parser.add_argument('end', type=datetime_string('%Y-%m-%d %H:%M'), location='args')
-        args = parser.parse_args()
-
-        sql_query = '''
-                SELECT date(DATE_TRUNC('day', created_at AT TIME ZONE 'UTC' AT TIME ZONE :tz )) AS date, 
-                    AVG(provider_response_latency) as latency
-                    FROM messages
-                    WHERE app_id = :app_id
-                '''
-        arg_dict = {'tz': account.timezone, 'app_id': app_model.id}
-
-        timezone = pytz.timezone(account.timezone)
-        utc_timezone = pytz.utc
-
-        if args['start']:
-            start_datetime = datetime.strptime(args['start'], '%Y-%m-%d %H:%M')
-            start_datetime = start_datetime.replace(second=0)
-
-            start_datetime_timezone = timezone.localize(start_datetime)
-            start_datetime_utc = start_datetime_timezone.astimezone(utc_timezone)
-
-            sql_query += ' and created_at >= :start'
-            arg_dict['start'] = start_datetime_utc
-
-        if args['end']:
-            end_datetime = datetime.strptime(args['end'], '%Y-%m-%d %H:%M')
-            end_datetime = end_datetime.replace(second=0)
-
-            end_datetime_timezone = timezone.localize(end_datetime)
-            end_datetime_utc = end_datetime_timezone.astimezone(utc_timezone)
-
-            sql_query += ' and created_at < :end'
-            arg_dict['end'] = end_datetime_utc
-
-        sql_query += ' GROUP BY date order by date'
-
-        with db.engine.begin() as conn:
-            rs = conn.execute(db.text(sql_query), arg_dict)
+        start_datetime_utc, end_datetime_utc = _parse_range_args(account.timezone)
+        rs = AppStatisticService.get_daily_average_response_time(
+            app_model.id, account.timezone, start_datetime_utc, end_datetime_utc)
 
         response_data = []
 
@@ -407,47 +212,9 @@ class TokensPerSecondStatistic(Resource):
         app_id = str(app_id)
         app_model = _get_app(app_id)
 
-        parser = reqparse.RequestParser()
-        parser.add_argument('start', type=datetime_string('%Y-%m-%d %H:%M'), location='args')
-        parser.add_argument('end', type=datetime_string('%Y-%m-%d %H:%M'), location='args')
-        args = parser.parse_args()
-
-        sql_query = '''SELECT date(DATE_TRUNC('day', created_at AT TIME ZONE 'UTC' AT TIME ZONE :tz )) AS date, 
-    CASE 
-        WHEN SUM(provider_response_latency) = 0 THEN 0
-        ELSE (SUM(answer_tokens) / SUM(provider_response_latency))
-    END as tokens_per_second
-FROM messages
-WHERE app_id = :app_id'''
-        arg_dict = {'tz': account.timezone, 'app_id': app_model.id}
-
-        timezone = pytz.timezone(account.timezone)
-        utc_timezone = pytz.utc
-
-        if args['start']:
-            start_datetime = datetime.strptime(args['start'], '%Y-%m-%d %H:%M')
-            start_datetime = start_datetime.replace(second=0)
-
-            start_datetime_timezone = timezone.localize(start_datetime)
-            start_datetime_utc = start_datetime_timezone.astimezone(utc_timezone)
-
-            sql_query += ' and created_at >= :start'
-            arg_dict['start'] = start_datetime_utc
-
-        if args['end']:
-            end_datetime = datetime.strptime(args['end'], '%Y-%m-%d %H:%M')
-            end_datetime = end_datetime.replace(second=0)
-
-            end_datetime_timezone = timezone.localize(end_datetime)
-            end_datetime_utc = end_datetime_timezone.astimezone(utc_timezone)
-
-            sql_query += ' and created_at < :end'
-            arg_dict['end'] = end_datetime_utc
-
-        sql_query += ' GROUP BY date order by date'
-
-        with db.engine.begin() as conn:
-            rs = conn.execute(db.text(sql_query), arg_dict)
+        start_datetime_utc, end_datetime_utc = _parse_range_args(account.timezone)
+        rs = AppStatisticService.get_daily_tokens_per_second(
+            app_model.id, account.timezone, start_datetime_utc, end_datetime_utc)
 
         response_data = []
 
@@ -17,6 +17,7 @@ from libs.helper import TimestampField
 from models.dataset import Document
 from models.source import DataSourceBinding
 from services.dataset_service import DatasetService, DocumentService
+from services.notion_sync_service import NotionSyncService
 from tasks.document_indexing_sync_task import document_indexing_sync_task
 
 cache = TTLCache(maxsize=None, ttl=30)
@@ -270,9 +271,8 @@ class DataSourceNotionDatasetSyncApi(Resource):
         if dataset is None:
             raise NotFound("Dataset not found.")
 
-        documents = DocumentService.get_document_by_dataset_id(dataset_id_str)
-        for document in documents:
-            document_indexing_sync_task.delay(dataset_id_str, document.id)
+        # only the documents edited since the last sync are enqueued
+        NotionSyncService.sync_dataset(dataset.tenant_id, dataset_id_str)
         return 200
 
 
@@ -1,9 +1,10 @@
 # -*- coding:utf-8 -*-
+import json
 import random
 from datetime import datetime
-from typing import List
+from typing import List, Generator
 
-from flask import request
+from flask import request, Response, stream_with_context
 from flask_login import login_required, current_user
 from flask_restful import Resource, fields, marshal, marshal_with, reqparse
 from sqlalchemy import desc, asc
@@ -15,17 +16,20 @@ from controllers.console.app.error import ProviderNotInitializeError, ProviderQu
     ProviderModelCurrentlyNotSupportError
 from controllers.console.datasets.error import DocumentAlreadyFinishedError, InvalidActionError, DocumentIndexingError, \
     InvalidMetadataError, ArchivedDocumentImmutableError
+from controllers.console.error import InvalidCursorError
 from controllers.console.setup import setup_required
 from controllers.console.wraps import account_initialization_required
+from core.indexing_progress import IndexingProgress
 from core.indexing_runner import IndexingRunner
 from core.model_providers.error import ProviderTokenNotInitError, QuotaExceededError, ModelCurrentlyNotSupportError, \
     LLMBadRequestError
 from core.model_providers.model_factory import ModelFactory
 from extensions.ext_redis import redis_client
+from libs.cursor_pagination import paginate_by_cursor, estimate_count
 from libs.helper import TimestampField
 from extensions.ext_database import db
 from models.dataset import DatasetProcessRule, Dataset
-from models.dataset import Document, DocumentSegment
+from models.dataset import Document
 from models.model import UploadFile
 from services.dataset_service import DocumentService, DatasetService
 from tasks.add_document_to_index_task import add_document_to_index_task
@@ -176,6 +180,7 @@ class DatasetDocumentListApi(Resource):
     def get(self, dataset_id):
         dataset_id = str(dataset_id)
         page = request.args.get('page', default=1, type=int)
+        cursor = request.args.get('cursor', default=None, type=str)
         limit = request.args.get('limit', default=20, type=int)
         search = request.args.get('keyword', default=None, type=str)
         sort = request.args.get('sort', default='-created_at', type=str)
@@ -197,46 +202,53 @@ class DatasetDocumentListApi(Resource):
             query = query.filter(Document.name.like(search))
 
         if sort.startswith('-'):
-            sort_logic = desc
+            descending = True
             sort = sort[1:]
         else:
-            sort_logic = asc
+            descending = False
 
+        # the id makes the order, and so the cursors, unique
         if sort == 'hit_count':
-            sub_query = db.select(DocumentSegment.document_id,
-                                  db.func.sum(DocumentSegment.hit_count).label("total_hit_count")) \
-                .group_by(DocumentSegment.document_id) \
-                .subquery()
-
-            query = query.outerjoin(sub_query, sub_query.c.document_id == Document.id) \
-                .order_by(sort_logic(db.func.coalesce(sub_query.c.total_hit_count, 0)))
+            sort_columns = [Document.hit_count, Document.id]
         elif sort == 'created_at':
-            query = query.order_by(sort_logic(Document.created_at))
+            sort_columns = [Document.created_at, Document.id]
+        else:
+            descending = True
+            sort_columns = [Document.created_at, Document.id]
+
+        if cursor is not None:
+            limit = min(limit, 100)
+            try:
+                pagination = paginate_by_cursor(query, sort_columns, cursor, limit, descending)
+            except ValueError:
+                raise InvalidCursorError()
+            documents = pagination.data
+            response = {
+                'has_more': pagination.has_more,
+                'next_cursor': pagination.next_cursor,
+                'limit': limit,
+                # the counter of the dataset is exact without a keyword, the planner estimates the rest
+                'total': estimate_count(query) if search else dataset.document_count
+            }
         else:
-            query = query.order_by(desc(Document.created_at))
+            sort_logic = desc if descending else asc
+            paginated_documents = query.order_by(*[sort_logic(column) for column in sort_columns]).paginate(
+                page=page, per_page=limit, max_per_page=100, error_out=False)
+            documents = paginated_documents.items
+            response = {
+                'has_more': len(documents) == limit,
+                'limit': limit,
+                'total': paginated_documents.total,
+                'page': page
+            }
 
-        paginated_documents = query.paginate(
-            page=page, per_page=limit, max_per_page=100, error_out=False)
-        documents = paginated_documents.items
         if fetch:
+            segment_counts = IndexingProgress.get_segment_counts([document.id for document in documents])
             for document in documents:
-                completed_segments = DocumentSegment.query.filter(DocumentSegment.completed_at.isnot(None),
-                                                                  DocumentSegment.document_id == str(document.id),
-                                                                  DocumentSegment.status != 're_segment').count()
-                total_segments = DocumentSegment.query.filter(DocumentSegment.document_id == str(document.id),
-                                                              DocumentSegment.status != 're_segment').count()
-                document.completed_segments = completed_segments
-                document.total_segments = total_segments
-            data = marshal(documents, document_with_segments_fields)
+                document.completed_segments, document.total_segments = segment_counts[document.id]
+            response['data'] = marshal(documents, document_with_segments_fields)
         else:
-            data = marshal(documents, document_fields)
-        response = {
-            'data': data,
-            'has_more': len(documents) == limit,
-            'limit': limit,
-            'total': paginated_documents.total,
-            'page': page
-        }
+            response['data'] = marshal(documents, document_fields)
 
         return response
 
@@ -521,22 +533,50 @@ class DocumentBatchIndexingStatusApi(DocumentResource):
         dataset_id = str(dataset_id)
         batch = str(batch)
         documents = self.get_batch_documents(dataset_id, batch)
+        data = {
+            'data': self.get_documents_status(documents)
+        }
+        return data
+
+    @classmethod
+    def get_documents_status(cls, documents: List[Document]) -> List[dict]:
+        segment_counts = IndexingProgress.get_segment_counts([document.id for document in documents])
         documents_status = []
         for document in documents:
-            completed_segments = DocumentSegment.query.filter(DocumentSegment.completed_at.isnot(None),
-                                                              DocumentSegment.document_id == str(document.id),
-                                                              DocumentSegment.status != 're_segment').count()
-            total_segments = DocumentSegment.query.filter(DocumentSegment.document_id == str(document.id),
-                                                          DocumentSegment.status != 're_segment').count()
-            document.completed_segments = completed_segments
-            document.total_segments = total_segments
+            document.completed_segments, document.total_segments = segment_counts[document.id]
             if document.is_paused:
                 document.indexing_status = 'paused'
-            documents_status.append(marshal(document, self.document_status_fields))
-        data = {
-            'data': documents_status
-        }
-        return data
+            documents_status.append(marshal(document, cls.document_status_fields))
+
+        return documents_status
+
+
+class DocumentBatchIndexingStatusStreamApi(DocumentResource):
+    @setup_required
+    @login_required
+    @account_initialization_required
+    def get(self, dataset_id, batch):
+        """Stream the indexing status of the documents of a batch as server-sent events until all finish."""
+        dataset_id = str(dataset_id)
+        batch = str(batch)
+        document_ids = [document.id for document in self.get_batch_documents(dataset_id, batch)]
+
+        def snapshot() -> List[dict]:
+            documents = DocumentService.get_batch_documents(dataset_id, batch)
+            documents_status = DocumentBatchIndexingStatusApi.get_documents_status(documents)
+            # the connection is not held while waiting for events
+            db.session.close()
+            return documents_status
+
+        def generate() -> Generator:
+            for status in IndexingProgress.listen(dataset_id, document_ids, snapshot):
+                if status is None:
+                    yield ": ping\n\n"
+                else:
+                    yield "data: " + json.dumps(status) + "\n\n"
+
+        return Response(stream_with_context(generate()), status=200,
+                        mimetype='text/event-stream')
 
 
 class DocumentIndexingStatusApi(DocumentResource):
@@ -563,18 +603,8 @@ class DocumentIndexingStatusApi(DocumentResource):
         document_id = str(document_id)
         document = self.get_document(dataset_id, document_id)
 
-        completed_segments = DocumentSegment.query \
-            .filter(DocumentSegment.completed_at.isnot(None),
-                    DocumentSegment.document_id == str(document_id),
-                    DocumentSegment.status != 're_segment') \
-            .count()
-        total_segments = DocumentSegment.query \
-            .filter(DocumentSegment.document_id == str(document_id),
-                    DocumentSegment.status != 're_segment') \
-            .count()
-
-        document.completed_segments = completed_segments
-        document.total_segments = total_segments
+        document.completed_segments, document.total_segments = \
+            IndexingProgress.get_segment_counts([document.id])[document.id]
 
         return marshal(document, self.document_status_fields)
 
@@ -788,6 +818,7 @@ class DocumentStatusApi(DocumentResource):
             document.disabled_at = None
             document.disabled_by = None
             document.updated_at = datetime.utcnow()
+            Dataset.update_counters(document.dataset_id)
             db.session.commit()
 
             # Set cache to prevent indexing the same document multiple times
@@ -807,6 +838,7 @@ class DocumentStatusApi(DocumentResource):
             document.disabled_at = datetime.utcnow()
             document.disabled_by = current_user.id
             document.updated_at = datetime.utcnow()
+            Dataset.update_counters(document.dataset_id)
             db.session.commit()
 
             # Set cache to prevent indexing the same document multiple times
@@ -824,6 +856,7 @@ class DocumentStatusApi(DocumentResource):
             document.archived_at = datetime.utcnow()
             document.archived_by = current_user.id
             document.updated_at = datetime.utcnow()
+            Dataset.update_counters(document.dataset_id)
             db.session.commit()
 
             if document.enabled:
@@ -903,6 +936,8 @@ api.add_resource(DocumentBatchIndexingEstimateApi,
                  '/datasets/<uuid:dataset_id>/batch/<string:batch>/indexing-estimate')
 api.add_resource(DocumentBatchIndexingStatusApi,
                  '/datasets/<uuid:dataset_id>/batch/<string:batch>/indexing-status')
+api.add_resource(DocumentBatchIndexingStatusStreamApi,
+                 '/datasets/<uuid:dataset_id>/batch/<string:batch>/indexing-status/stream')
 api.add_resource(DocumentIndexingStatusApi,
                  '/datasets/<uuid:dataset_id>/documents/<uuid:document_id>/indexing-status')
 api.add_resource(DocumentDetailApi,
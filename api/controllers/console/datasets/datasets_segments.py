@@ -12,7 +12,7 @@ from controllers.console.setup import setup_required
 from controllers.console.wraps import account_initialization_required
 from extensions.ext_database import db
 from extensions.ext_redis import redis_client
-from models.dataset import DocumentSegment
+from models.dataset import Dataset, DocumentSegment
 
 from libs.helper import TimestampField
 from services.dataset_service import DatasetService, DocumentService, SegmentService
@@ -73,6 +73,7 @@ class DatasetDocumentSegmentListApi(Resource):
 
         parser = reqparse.RequestParser()
         parser.add_argument('last_id', type=str, default=None, location='args')
+        parser.add_argument('last_position', type=int, default=None, location='args')
         parser.add_argument('limit', type=int, default=20, location='args')
         parser.add_argument('status', type=str,
                             action='append', default=[], location='args')
@@ -83,6 +84,7 @@ class DatasetDocumentSegmentListApi(Resource):
         args = parser.parse_args()
 
         last_id = args['last_id']
+        last_position = args['last_position']
         limit = min(args['limit'], 100)
         status_list = args['status']
         hit_count_gte = args['hit_count_gte']
@@ -93,14 +95,6 @@ class DatasetDocumentSegmentListApi(Resource):
             DocumentSegment.tenant_id == current_user.current_tenant_id
         )
 
-        if last_id is not None:
-            last_segment = DocumentSegment.query.get(str(last_id))
-            if last_segment:
-                query = query.filter(
-                    DocumentSegment.position > last_segment.position)
-            else:
-                return {'data': [], 'has_more': False, 'limit': limit}, 200
-
         if status_list:
             query = query.filter(DocumentSegment.status.in_(status_list))
 
@@ -108,7 +102,7 @@ class DatasetDocumentSegmentListApi(Resource):
             query = query.filter(DocumentSegment.hit_count >= hit_count_gte)
 
         if keyword:
-            query = query.where(DocumentSegment.content.ilike(f'%{keyword}%'))
+            query = SegmentService.filter_by_keyword(query, keyword)
 
         if args['enabled'].lower() != 'all':
             if args['enabled'].lower() == 'true':
@@ -116,7 +110,19 @@ class DatasetDocumentSegmentListApi(Resource):
             elif args['enabled'].lower() == 'false':
                 query = query.filter(DocumentSegment.enabled == False)
 
-        total = query.count()
+        # the total of all pages, counted before the cursor
+        total = SegmentService.count(query)
+
+        if last_position is not None:
+            query = query.filter(DocumentSegment.position > last_position)
+        elif last_id is not None:
+            # the position of the last segment is looked up within the page query, no rows if it does not exist
+            last_segment_position = db.session.query(DocumentSegment.position).filter(
+                DocumentSegment.id == str(last_id),
+                DocumentSegment.document_id == str(document_id)
+            ).scalar_subquery()
+            query = query.filter(DocumentSegment.position > last_segment_position)
+
         segments = query.order_by(DocumentSegment.position).limit(limit + 1).all()
 
         has_more = False
@@ -177,6 +183,7 @@ class DatasetDocumentSegmentApi(Resource):
             segment.enabled = True
             segment.disabled_at = None
             segment.disabled_by = None
+            Dataset.update_counters(segment.dataset_id)
             db.session.commit()
 
             # Set cache to prevent indexing the same segment multiple times
@@ -192,6 +199,7 @@ class DatasetDocumentSegmentApi(Resource):
             segment.enabled = False
             segment.disabled_at = datetime.utcnow()
             segment.disabled_by = current_user.id
+            Dataset.update_counters(segment.dataset_id)
             db.session.commit()
 
             # Set cache to prevent indexing the same segment multiple times
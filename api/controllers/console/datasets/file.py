@@ -68,12 +68,22 @@ class FileApi(Resource):
         if extension not in ALLOWED_EXTENSIONS:
             raise UnsupportedFileTypeError()
 
-        # user uuid as file name
-        file_uuid = str(uuid.uuid4())
-        file_key = 'upload_files/' + current_user.current_tenant_id + '/' + file_uuid + '.' + extension
+        file_hash = hashlib.sha3_256(file_content).hexdigest()
 
-        # save file to storage
-        storage.save(file_key, file_content)
+        # reuse the stored content of an identical file of the tenant
+        file_key = db.session.query(UploadFile.key).filter(
+            UploadFile.tenant_id == current_user.current_tenant_id,
+            UploadFile.hash == file_hash,
+            UploadFile.extension == extension
+        ).limit(1).scalar()
+
+        if not file_key:
+            # user uuid as file name
+            file_uuid = str(uuid.uuid4())
+            file_key = 'upload_files/' + current_user.current_tenant_id + '/' + file_uuid + '.' + extension
+
+            # save file to storage
+            storage.save(file_key, file_content)
 
         # save file to db
         config = current_app.config
@@ -88,7 +98,7 @@ class FileApi(Resource):
             created_by=current_user.id,
             created_at=datetime.datetime.utcnow(),
             used=False,
-            hash=hashlib.sha3_256(file_content).hexdigest()
+            hash=file_hash
         )
 
         db.session.add(upload_file)
@@ -78,6 +78,7 @@ class HitTestingApi(Resource):
 
         parser = reqparse.RequestParser()
         parser.add_argument('query', type=str, location='json')
+        parser.add_argument('projection', type=str, choices=['pca', 'tsne'], default='pca', location='json')
         args = parser.parse_args()
 
         query = args['query']
@@ -91,6 +92,7 @@ class HitTestingApi(Resource):
                 query=query,
                 account=current_user,
                 limit=10,
+                projection=args['projection']
             )
 
             return {"query": response['query'], 'records': marshal(response['records'], hit_testing_record_fields)}
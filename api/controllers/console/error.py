@@ -24,3 +24,9 @@ class AlreadyActivateError(BaseHTTPException):
     error_code = 'already_activate'
     description = "Auth Token is invalid or account already activated, please check again."
     code = 403
+
+
+class InvalidCursorError(BaseHTTPException):
+    error_code = 'invalid_cursor'
+    description = "Invalid cursor, please reload the list."
+    code = 400
@@ -1,4 +1,5 @@
 import datetime
+import hashlib
 import uuid
 
 from flask import current_app
@@ -60,7 +61,8 @@ class DocumentListApi(DatasetApiResource):
             created_at=datetime.datetime.utcnow(),
             used=True,
             used_by=dataset.created_by,
-            used_at=datetime.datetime.utcnow()
+            used_at=datetime.datetime.utcnow(),
+            hash=hashlib.sha3_256(args.get('text').encode('utf-8')).hexdigest()
         )
 
         db.session.add(upload_file)
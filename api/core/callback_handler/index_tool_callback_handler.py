@@ -4,6 +4,7 @@ from langchain.schema import Document
 
 from extensions.ext_database import db
 from models.dataset import DocumentSegment
+from models.dataset import Document as DatasetDocument
 
 
 class DatasetIndexToolCallbackHandler:
@@ -26,4 +27,15 @@ class DatasetIndexToolCallbackHandler:
                 synchronize_session=False
             )
 
+            # and to the counter of its document
+            db.session.query(DatasetDocument).filter(
+                DatasetDocument.id.in_(db.select(DocumentSegment.document_id).where(
+                    DocumentSegment.dataset_id == self.dataset_id,
+                    DocumentSegment.index_node_id == doc_id
+                ))
+            ).update(
+                {DatasetDocument.hit_count: DatasetDocument.hit_count + 1},
+                synchronize_session=False
+            )
+
             db.session.commit()
@@ -1,9 +1,10 @@
 import tempfile
 from pathlib import Path
-from typing import List, Union, Optional
+from typing import List, Union, Optional, Iterator, Iterable, Tuple
 
 import requests
 from langchain.document_loaders import TextLoader, Docx2txtLoader
+from langchain.document_loaders.base import BaseLoader
 from langchain.schema import Document
 
 from core.data_loader.loader.csv import CSVLoader
@@ -42,11 +43,80 @@ class FileExtractor:
 
             return cls.load_from_file(file_path, return_text)
 
+    @classmethod
+    def lazy_load(cls, upload_file: UploadFile) -> Iterator[Document]:
+        """
+        Yield the pages / rows / sections of an upload file one by one,
+        the downloaded temp file lives until the generator is exhausted or closed.
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            suffix = Path(upload_file.key).suffix
+            file_path = f"{temp_dir}/{next(tempfile._get_candidate_names())}{suffix}"
+            storage.download(upload_file.key, file_path)
+
+            yield from cls.lazy_load_from_file(file_path, upload_file)
+
+    @classmethod
+    def lazy_load_from_file(cls, file_path: str, upload_file: Optional[UploadFile] = None) -> Iterator[Document]:
+        loader = cls._get_loader(file_path, upload_file)
+        try:
+            documents = loader.lazy_load()
+        except NotImplementedError:
+            # loaders which can only parse the whole file, e.g. docx
+            documents = iter(loader.load())
+
+        yield from documents
+
+    @classmethod
+    def sample(cls, upload_file: UploadFile, max_pages: int, max_characters: int) -> Tuple[List[Document], float]:
+        """
+        Sample the text documents of an upload file, e.g. for an estimate.
+
+        Pages of pdf files are sampled evenly over the file and the others are never extracted, the documents
+        of other files are sampled up to max_characters from the start.
+
+        :return: the sampled documents and the ratio of the file to the sample
+        """
+        with tempfile.TemporaryDirectory() as temp_dir:
+            suffix = Path(upload_file.key).suffix
+            file_path = f"{temp_dir}/{next(tempfile._get_candidate_names())}{suffix}"
+            storage.download(upload_file.key, file_path)
+
+            if suffix == '.pdf':
+                documents, page_count = PdfLoader(file_path, upload_file=upload_file).sample_pages(max_pages)
+                return documents, page_count / len(documents) if documents else 1.0
+
+            return cls.sample_documents(cls.lazy_load_from_file(file_path, upload_file), max_characters)
+
+    @staticmethod
+    def sample_documents(documents: Iterable[Document], max_characters: int) -> Tuple[List[Document], float]:
+        """
+        Sample the documents up to max_characters from the start, the others are only measured.
+
+        :return: the sampled documents and the ratio of the characters of all documents to the sample
+        """
+        sampled_documents = []
+        sampled_characters = 0
+        total_characters = 0
+        for document in documents:
+            total_characters += len(document.page_content)
+            if sampled_characters < max_characters:
+                sampled_documents.append(document)
+                sampled_characters += len(document.page_content)
+
+        return sampled_documents, total_characters / sampled_characters if sampled_characters else 1.0
+
     @classmethod
     def load_from_file(cls, file_path: str, return_text: bool = False,
                        upload_file: Optional[UploadFile] = None) -> Union[List[Document] | str]:
-        input_file = Path(file_path)
         delimiter = '\n'
+        loader = cls._get_loader(file_path, upload_file)
+
+        return delimiter.join([document.page_content for document in loader.load()]) if return_text else loader.load()
+
+    @classmethod
+    def _get_loader(cls, file_path: str, upload_file: Optional[UploadFile] = None) -> BaseLoader:
+        input_file = Path(file_path)
         if input_file.suffix == '.xlsx':
             loader = ExcelLoader(file_path)
         elif input_file.suffix == '.pdf':
@@ -63,4 +133,4 @@ class FileExtractor:
             # txt
             loader = TextLoader(file_path, autodetect_encoding=True)
 
-        return delimiter.join([document.page_content for document in loader.load()]) if return_text else loader.load()
+        return loader
@@ -1,13 +1,15 @@
+import csv
 import logging
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Iterator
 
 from langchain.document_loaders import CSVLoader as LCCSVLoader
 from langchain.document_loaders.helpers import detect_file_encodings
-
-from models.dataset import Document
+from langchain.schema import Document
 
 logger = logging.getLogger(__name__)
 
+READ_CHUNK_SIZE = 1024 * 1024
+
 
 class CSVLoader(LCCSVLoader):
     def __init__(
@@ -26,27 +28,44 @@ class CSVLoader(LCCSVLoader):
 
     def load(self) -> List[Document]:
         """Load data into document objects."""
+        return list(self.lazy_load())
+
+    def lazy_load(self) -> Iterator[Document]:
+        """Yield one document per row."""
+        encoding = self._detect_encoding()
+        with open(self.file_path, newline="", encoding=encoding) as csvfile:
+            yield from self._read_from_file(csvfile)
+
+    def _detect_encoding(self) -> Optional[str]:
+        """
+        Find an encoding that decodes the whole file before yielding any row,
+        a decode error in the middle of the stream could not be retried.
+        """
+        if self._can_decode(self.encoding):
+            return self.encoding
+
+        if not self.autodetect_encoding:
+            raise RuntimeError(f"Error loading {self.file_path}")
+
+        detected_encodings = detect_file_encodings(self.file_path)
+        for encoding in detected_encodings:
+            logger.debug("Trying encoding: ", encoding.encoding)
+            if self._can_decode(encoding.encoding):
+                return encoding.encoding
+
+        raise RuntimeError(f"Error loading {self.file_path}")
+
+    def _can_decode(self, encoding: Optional[str]) -> bool:
         try:
-            with open(self.file_path, newline="", encoding=self.encoding) as csvfile:
-                docs = self._read_from_file(csvfile)
-        except UnicodeDecodeError as e:
-            if self.autodetect_encoding:
-                detected_encodings = detect_file_encodings(self.file_path)
-                for encoding in detected_encodings:
-                    logger.debug("Trying encoding: ", encoding.encoding)
-                    try:
-                        with open(self.file_path, newline="", encoding=encoding.encoding) as csvfile:
-                            docs = self._read_from_file(csvfile)
-                        break
-                    except UnicodeDecodeError:
-                        continue
-            else:
-                raise RuntimeError(f"Error loading {self.file_path}") from e
+            with open(self.file_path, newline="", encoding=encoding) as csvfile:
+                while csvfile.read(READ_CHUNK_SIZE):
+                    pass
+        except UnicodeDecodeError:
+            return False
 
-        return docs
+        return True
 
-    def _read_from_file(self, csvfile):
-        docs = []
+    def _read_from_file(self, csvfile) -> Iterator[Document]:
         csv_reader = csv.DictReader(csvfile, **self.csv_args)  # type: ignore
         for i, row in enumerate(csv_reader):
             content = "\n".join(f"{k.strip()}: {v.strip()}" for k, v in row.items())
@@ -61,7 +80,4 @@ class CSVLoader(LCCSVLoader):
                     f"Source column '{self.source_column}' not found in CSV file."
                 )
             metadata = {"source": source, "row": i}
-            doc = Document(page_content=content, metadata=metadata)
-            docs.append(doc)
-
-        return docs
+            yield Document(page_content=content, metadata=metadata)
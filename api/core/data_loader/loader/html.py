@@ -1,21 +1,37 @@
+import codecs
 import logging
-from typing import List
+from typing import List, Iterator, Optional, Tuple
 
-from bs4 import BeautifulSoup
+from bs4.dammit import EncodingDetector, UnicodeDammit
 from langchain.document_loaders.base import BaseLoader
 from langchain.schema import Document
+from lxml import etree
+
+from core.data_loader.loader.markdown import HEADINGS_SEPARATOR
 
 logger = logging.getLogger(__name__)
 
+HEADING_LEVELS = {'h1': 1, 'h2': 2, 'h3': 3, 'h4': 4, 'h5': 5, 'h6': 6}
+# elements whose text is not part of the page
+SKIPPED_TAGS = {'script', 'style', 'template', 'noscript', 'head'}
+# elements which start a new line of text
+BLOCK_TAGS = {'address', 'article', 'aside', 'blockquote', 'br', 'dd', 'div', 'dl', 'dt', 'figcaption', 'figure',
+              'footer', 'form', 'header', 'hr', 'li', 'main', 'nav', 'ol', 'p', 'pre', 'section', 'table', 'td',
+              'th', 'tr', 'ul', *HEADING_LEVELS}
+
 
 class HTMLLoader(BaseLoader):
     """Load html files.
 
+    The file is fed to an lxml parser in chunks, no tree is built, and one document is yielded per
+    heading section, with the titles of its heading hierarchy in metadata.
 
     Args:
         file_path: Path to the file to load.
     """
 
+    READ_CHUNK_SIZE = 64 * 1024
+
     def __init__(
         self,
         file_path: str
@@ -24,12 +40,116 @@ class HTMLLoader(BaseLoader):
         self._file_path = file_path
 
     def load(self) -> List[Document]:
-        return [Document(page_content=self._load_as_text())]
+        return list(self.lazy_load())
+
+    def lazy_load(self) -> Iterator[Document]:
+        target = _SectionTarget()
+        parser = etree.HTMLParser(target=target, recover=True, remove_comments=True, remove_pis=True)
 
-    def _load_as_text(self) -> str:
         with open(self._file_path, "rb") as fp:
-            soup = BeautifulSoup(fp, 'html.parser')
-            text = soup.get_text()
-            text = text.strip() if text else ''
+            chunk = fp.read(self.READ_CHUNK_SIZE)
+            decoder = codecs.getincrementaldecoder(self._detect_encoding(chunk))(errors='replace')
+            while chunk:
+                parser.feed(decoder.decode(chunk))
+                yield from self._to_documents(target.pop_sections())
+                chunk = fp.read(self.READ_CHUNK_SIZE)
+
+            parser.feed(decoder.decode(b'', final=True))
+
+        try:
+            parser.close()
+        except etree.XMLSyntaxError:
+            # empty or unparsable document, the sections collected so far are kept
+            logger.debug(f"Failed to close the html parser of {self._file_path}")
+
+        target.flush()
+        yield from self._to_documents(target.pop_sections())
+
+    @staticmethod
+    def _detect_encoding(head: bytes) -> str:
+        """Detect the encoding of a file from its first chunk, like BeautifulSoup does for the whole file."""
+        if head.startswith(codecs.BOM_UTF8):
+            return 'utf-8-sig'
+
+        declared_encoding = EncodingDetector.find_declared_encoding(head, is_html=True)
+        if declared_encoding:
+            try:
+                return codecs.lookup(declared_encoding).name
+            except LookupError:
+                pass
+
+        try:
+            # the chunk may end in the middle of a character
+            codecs.getincrementaldecoder('utf-8')().decode(head, final=False)
+            return 'utf-8'
+        except UnicodeDecodeError:
+            return UnicodeDammit(head, is_html=True).original_encoding or 'utf-8'
+
+    def _to_documents(self, sections: List[Tuple[List[str], str]]) -> Iterator[Document]:
+        for headings, text in sections:
+            metadata = {'source': self._file_path}
+            if headings:
+                metadata['headings'] = HEADINGS_SEPARATOR.join(headings)
+                text = f"{headings[-1]}\n{text}"
+
+            yield Document(page_content=text, metadata=metadata)
+
+
+class _SectionTarget:
+    """lxml parser target which collects the text of the page by heading sections."""
+
+    def __init__(self):
+        # titles of the headings enclosing the current section, by heading level
+        self._heading_stack: List[Tuple[int, str]] = []
+        self._heading_level: Optional[int] = None
+        self._parts: List[str] = []
+        self._skip_depth = 0
+        self._sections: List[Tuple[List[str], str]] = []
+
+    def start(self, tag, attrib):
+        if tag in SKIPPED_TAGS:
+            self._skip_depth += 1
+        elif tag in HEADING_LEVELS and not self._skip_depth:
+            self.flush()
+            self._heading_level = HEADING_LEVELS[tag]
+        elif tag in BLOCK_TAGS:
+            self._new_line()
+
+    def end(self, tag):
+        if tag in SKIPPED_TAGS:
+            self._skip_depth = max(self._skip_depth - 1, 0)
+        elif tag in HEADING_LEVELS and self._heading_level is not None:
+            title = " ".join("".join(self._parts).split())
+            self._parts = []
+            level = self._heading_level
+            self._heading_level = None
+
+            while self._heading_stack and self._heading_stack[-1][0] >= level:
+                self._heading_stack.pop()
+            if title:
+                self._heading_stack.append((level, title))
+        elif tag in BLOCK_TAGS:
+            self._new_line()
+
+    def data(self, data):
+        if not self._skip_depth:
+            self._parts.append(data)
+
+    def close(self):
+        pass
+
+    def _new_line(self):
+        if self._parts and self._parts[-1] != "\n":
+            self._parts.append("\n")
+
+    def flush(self):
+        """Close the current section, it is kept unless it has no text."""
+        text = "".join(self._parts).strip()
+        self._parts = []
+        if text:
+            self._sections.append(([title for _, title in self._heading_stack], text))
 
-        return text
+    def pop_sections(self) -> List[Tuple[List[str], str]]:
+        sections = self._sections
+        self._sections = []
+        return sections
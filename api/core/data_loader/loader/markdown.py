@@ -1,6 +1,6 @@
 import logging
 import re
-from typing import Optional, List, Tuple, cast
+from typing import Optional, List, Tuple, cast, Iterator
 
 from langchain.document_loaders.base import BaseLoader
 from langchain.document_loaders.helpers import detect_file_encodings
@@ -8,6 +8,13 @@ from langchain.schema import Document
 
 logger = logging.getLogger(__name__)
 
+HEADER_PATTERN = re.compile(r"^#+\s")
+TAG_PATTERN = re.compile(r"<.*?>")
+IMAGE_PATTERN = re.compile(r"!{1}\[\[(.*)\]\]")
+HYPERLINK_PATTERN = re.compile(r"\[(.*?)\]\((.*?)\)")
+# joins the titles of the parent headings and the heading of a section in metadata['headings']
+HEADINGS_SEPARATOR = " > "
+
 
 class MarkdownLoader(BaseLoader):
     """Load md files.
@@ -43,16 +50,28 @@ class MarkdownLoader(BaseLoader):
         self._autodetect_encoding = autodetect_encoding
 
     def load(self) -> List[Document]:
-        tups = self.parse_tups(self._file_path)
-        documents = []
-        for header, value in tups:
+        return list(self.lazy_load())
+
+    def lazy_load(self) -> Iterator[Document]:
+        """Yield one document per section, with the titles of its heading hierarchy in metadata."""
+        # titles of the headings enclosing the current section, by heading level
+        heading_stack: List[Tuple[int, str]] = []
+        for header, level, value in self._markdown_to_sections(self._read_content(self._file_path)):
             value = value.strip()
             if header is None:
-                documents.append(Document(page_content=value))
+                yield Document(page_content=value, metadata={'source': self._file_path})
             else:
-                documents.append(Document(page_content=f"\n\n{header}\n{value}"))
-
-        return documents
+                while heading_stack and heading_stack[-1][0] >= level:
+                    heading_stack.pop()
+                heading_stack.append((level, header))
+
+                yield Document(
+                    page_content=f"\n\n{header}\n{value}",
+                    metadata={
+                        'source': self._file_path,
+                        'headings': HEADINGS_SEPARATOR.join(title for _, title in heading_stack)
+                    }
+                )
 
     def markdown_to_tups(self, markdown_text: str) -> List[Tuple[Optional[str], str]]:
         """Convert a markdown file to a dictionary.
@@ -60,51 +79,64 @@ class MarkdownLoader(BaseLoader):
         The keys are the headers and the values are the text under each header.
 
         """
-        markdown_tups: List[Tuple[Optional[str], str]] = []
+        return [(header, value) for header, _, value in self._markdown_to_sections(markdown_text)]
+
+    def _markdown_to_sections(self, markdown_text: str) -> List[Tuple[Optional[str], int, str]]:
+        """Split a markdown text into (header, heading level, text under the header) tuples."""
+        markdown_tups: List[Tuple[Optional[str], int, str]] = []
         lines = markdown_text.split("\n")
 
         current_header = None
-        current_text = ""
+        current_lines: List[str] = []
 
         for line in lines:
-            header_match = re.match(r"^#+\s", line)
-            if header_match:
+            if HEADER_PATTERN.match(line):
                 if current_header is not None:
-                    markdown_tups.append((current_header, current_text))
+                    markdown_tups.append((current_header, self._header_level(current_header),
+                                          self._join_lines(current_lines)))
 
                 current_header = line
-                current_text = ""
+                current_lines = []
             else:
-                current_text += line + "\n"
-        markdown_tups.append((current_header, current_text))
+                current_lines.append(line)
+        markdown_tups.append((current_header, self._header_level(current_header), self._join_lines(current_lines)))
 
         if current_header is not None:
             # pass linting, assert keys are defined
             markdown_tups = [
-                (re.sub(r"#", "", cast(str, key)).strip(), re.sub(r"<.*?>", "", value))
-                for key, value in markdown_tups
+                (cast(str, key).replace("#", "").strip(), level, TAG_PATTERN.sub("", value))
+                for key, level, value in markdown_tups
             ]
         else:
             markdown_tups = [
-                (key, re.sub("\n", "", value)) for key, value in markdown_tups
+                (key, level, value.replace("\n", "")) for key, level, value in markdown_tups
             ]
 
         return markdown_tups
 
+    @staticmethod
+    def _header_level(header: Optional[str]) -> int:
+        return len(header) - len(header.lstrip("#")) if header else 0
+
+    @staticmethod
+    def _join_lines(lines: List[str]) -> str:
+        """Join the lines of a section, each one terminated by a newline."""
+        return "\n".join(lines) + "\n" if lines else ""
+
     def remove_images(self, content: str) -> str:
         """Get a dictionary of a markdown file from its path."""
-        pattern = r"!{1}\[\[(.*)\]\]"
-        content = re.sub(pattern, "", content)
-        return content
+        return IMAGE_PATTERN.sub("", content)
 
     def remove_hyperlinks(self, content: str) -> str:
         """Get a dictionary of a markdown file from its path."""
-        pattern = r"\[(.*?)\]\((.*?)\)"
-        content = re.sub(pattern, r"\1", content)
-        return content
+        return HYPERLINK_PATTERN.sub(r"\1", content)
 
     def parse_tups(self, filepath: str) -> List[Tuple[Optional[str], str]]:
         """Parse file into tuples."""
+        return self.markdown_to_tups(self._read_content(filepath))
+
+    def _read_content(self, filepath: str) -> str:
+        """Read the file, without hyperlinks and images if configured."""
         content = ""
         try:
             with open(filepath, "r", encoding=self._encoding) as f:
@@ -131,4 +163,4 @@ class MarkdownLoader(BaseLoader):
         if self._remove_images:
             content = self.remove_images(content)
 
-        return self.markdown_to_tups(content)
+        return content
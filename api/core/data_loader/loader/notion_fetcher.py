@@ -0,0 +1,131 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Dict, List, Optional, Any
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from core.helper.token_bucket import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+BLOCK_CHILD_URL_TMPL = "https://api.notion.com/v1/blocks/{block_id}/children"
+NOTION_VERSION = "2022-06-28"
+
+
+class NotionBlockFetcher:
+    """
+    Fetch the block tree of a Notion page concurrently.
+
+    Children lists of blocks are fetched by a bounded thread pool over a frontier of blocks with children,
+    on a shared keep-alive session. Requests of an integration token share a token bucket within the process,
+    matching the Notion rate limit of 3 requests per second, and a 429 pauses the bucket for Retry-After.
+    """
+
+    RATE_LIMIT = 3
+    MAX_RETRIES = 5
+    RETRY_BACKOFF = 1.0
+    REQUEST_TIMEOUT = 30
+
+    _buckets: Dict[str, TokenBucket] = {}
+    _buckets_lock = threading.Lock()
+
+    def __init__(self, access_token: str, max_workers: int = 4):
+        self._access_token = access_token
+        self._max_workers = max(max_workers, 1)
+        self._bucket = self._get_bucket(access_token)
+
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self._max_workers)
+        self._session.mount('https://', adapter)
+        self._session.headers.update({
+            "Authorization": "Bearer " + access_token,
+            "Content-Type": "application/json",
+            "Notion-Version": NOTION_VERSION,
+        })
+
+    def request(self, method: str, url: str, params: Optional[dict] = None, json: Optional[dict] = None) -> dict:
+        """Send a rate limited request, retrying rate limited and server errors."""
+        for attempt in range(self.MAX_RETRIES + 1):
+            self._bucket.acquire()
+            try:
+                res = self._session.request(method, url, params=params, json=json, timeout=self.REQUEST_TIMEOUT)
+            except requests.exceptions.ConnectionError:
+                if attempt == self.MAX_RETRIES:
+                    raise
+                time.sleep(self.RETRY_BACKOFF * 2 ** attempt)
+                continue
+
+            if res.status_code == 429:
+                retry_after = float(res.headers.get('Retry-After', self.RETRY_BACKOFF * 2 ** attempt))
+                logger.info('Notion rate limited, retry after {}s'.format(retry_after))
+                self._bucket.pause(retry_after)
+                continue
+
+            if res.status_code >= 500 and attempt < self.MAX_RETRIES:
+                time.sleep(self.RETRY_BACKOFF * 2 ** attempt)
+                continue
+
+            return res.json()
+
+        raise Exception('Notion request {} {} still rate limited after {} retries'.format(
+            method, url, self.MAX_RETRIES))
+
+    def fetch_children(self, block_id: str) -> List[dict]:
+        """Fetch all the children of a block, following the pagination cursor."""
+        children = []
+        params = {}
+        while True:
+            data = self.request("GET", BLOCK_CHILD_URL_TMPL.format(block_id=block_id), params=params)
+            if 'results' not in data or data["results"] is None:
+                break
+
+            children.extend(data["results"])
+
+            if not data.get("next_cursor"):
+                break
+
+            params = {'start_cursor': data["next_cursor"]}
+
+        return children
+
+    def fetch_tree(self, block_id: str) -> Dict[str, List[dict]]:
+        """
+        Fetch the children of a block and of all its descendants with children, except child pages.
+
+        :return: children by block id, each list in Notion order
+        """
+        block_children = {}
+        with ThreadPoolExecutor(max_workers=self._max_workers) as executor:
+            pending = {executor.submit(self.fetch_children, block_id): block_id}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    parent_block_id = pending.pop(future)
+                    children = future.result()
+                    block_children[parent_block_id] = children
+
+                    for child in children:
+                        if child.get("has_children") and child.get("type") != 'child_page':
+                            pending[executor.submit(self.fetch_children, child["id"])] = child["id"]
+
+        return block_children
+
+    def close(self) -> None:
+        self._session.close()
+
+    @classmethod
+    def _get_bucket(cls, access_token: str) -> TokenBucket:
+        with cls._buckets_lock:
+            if access_token not in cls._buckets:
+                cls._buckets[access_token] = TokenBucket(cls.RATE_LIMIT)
+
+            return cls._buckets[access_token]
+
+    def __enter__(self) -> "NotionBlockFetcher":
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
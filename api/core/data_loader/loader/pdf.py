@@ -1,10 +1,15 @@
+import json
 import logging
-from typing import List, Optional
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future
+from typing import List, Optional, Iterator, Tuple
 
-from langchain.document_loaders import PyPDFium2Loader
+from flask import current_app, has_app_context
 from langchain.document_loaders.base import BaseLoader
 from langchain.schema import Document
 
+from core.data_loader.loader.pdf_page_extractor import get_page_count, extract_pages
 from extensions.ext_storage import storage
 from models.model import UploadFile
 
@@ -14,42 +19,130 @@ logger = logging.getLogger(__name__)
 class PdfLoader(BaseLoader):
     """Load pdf files.
 
+    Pages are extracted in shards spread over a process pool, and the text of each shard is cached
+    under the content hash of the upload file, so an interrupted extraction resumes from the shards done.
 
     Args:
         file_path: Path to the file to load.
     """
 
+    PAGES_PER_SHARD = 16
+
     def __init__(
         self,
         file_path: str,
-        upload_file: Optional[UploadFile] = None
+        upload_file: Optional[UploadFile] = None,
+        max_workers: Optional[int] = None
     ):
         """Initialize with file path."""
         self._file_path = file_path
         self._upload_file = upload_file
+        if max_workers is None:
+            max_workers = int(current_app.config.get('PDF_EXTRACT_MAX_WORKERS', 1)) if has_app_context() else 1
+
+        self._max_workers = max_workers
 
     def load(self) -> List[Document]:
-        plaintext_file_key = ''
-        plaintext_file_exists = False
-        if self._upload_file:
-            if self._upload_file.hash:
-                plaintext_file_key = 'upload_files/' + self._upload_file.tenant_id + '/' \
-                                     + self._upload_file.hash + '.0625.plaintext'
-                try:
-                    text = storage.load(plaintext_file_key).decode('utf-8')
-                    plaintext_file_exists = True
-                    return [Document(page_content=text)]
-                except FileNotFoundError:
-                    pass
-        documents = PyPDFium2Loader(file_path=self._file_path).load()
-        text_list = []
-        for document in documents:
-            text_list.append(document.page_content)
-        text = "\n\n".join(text_list)
-
-        # save plaintext file for caching
-        if not plaintext_file_exists and plaintext_file_key:
-            storage.save(plaintext_file_key, text.encode('utf-8'))
-
-        return documents
+        return list(self.lazy_load())
+
+    def lazy_load(self) -> Iterator[Document]:
+        """Yield one document per page, in page order, with the page number in metadata."""
+        page_count = get_page_count(self._file_path)
+        shards = [(page_start, min(page_start + self.PAGES_PER_SHARD, page_count))
+                  for page_start in range(0, page_count, self.PAGES_PER_SHARD)]
+
+        for (page_start, _), texts in self._extract_shards(shards):
+            for offset, text in enumerate(texts):
+                yield Document(
+                    page_content=text,
+                    metadata={'source': self._file_path, 'page': page_start + offset}
+                )
+
+    def sample_pages(self, max_pages: int) -> Tuple[List[Document], int]:
+        """
+        Extract at most max_pages pages spread evenly over the file, without extracting the others.
+
+        :return: the documents of the sampled pages and the page count of the file
+        """
+        page_count = get_page_count(self._file_path)
+        if page_count <= max_pages:
+            return list(self.lazy_load()), page_count
+
+        documents = []
+        for page in sorted(set(i * page_count // max_pages for i in range(max_pages))):
+            documents.append(Document(
+                page_content=extract_pages(self._file_path, page, page + 1)[0],
+                metadata={'source': self._file_path, 'page': page}
+            ))
+
+        return documents, page_count
+
+    def _extract_shards(self, shards: List[Tuple[int, int]]) -> Iterator[Tuple[Tuple[int, int], List[str]]]:
+        """Yield the page texts of each shard in order, at most 2 * max_workers shards are held in memory."""
+        if self._max_workers <= 1 or len(shards) <= 1 or multiprocessing.current_process().daemon:
+            # daemonic processes are not allowed to have children
+            for shard in shards:
+                yield shard, self._extract_shard(shard)
+            return
+
+        with ProcessPoolExecutor(max_workers=self._max_workers) as executor:
+            pending = deque()
+            shard_iter = iter(shards)
+            for shard in shard_iter:
+                pending.append((shard, self._submit_shard(executor, shard)))
+                if len(pending) >= self._max_workers * 2:
+                    break
+
+            while pending:
+                shard, result = pending.popleft()
+                if isinstance(result, Future):
+                    result = result.result()
+                    self._save_shard_cache(shard, result)
+
+                yield shard, result
+
+                next_shard = next(shard_iter, None)
+                if next_shard:
+                    pending.append((next_shard, self._submit_shard(executor, next_shard)))
+
+    def _submit_shard(self, executor: ProcessPoolExecutor, shard: Tuple[int, int]):
+        texts = self._load_shard_cache(shard)
+        if texts is not None:
+            return texts
+
+        return executor.submit(extract_pages, self._file_path, shard[0], shard[1])
+
+    def _extract_shard(self, shard: Tuple[int, int]) -> List[str]:
+        texts = self._load_shard_cache(shard)
+        if texts is None:
+            texts = extract_pages(self._file_path, shard[0], shard[1])
+            self._save_shard_cache(shard, texts)
+
+        return texts
+
+    def _load_shard_cache(self, shard: Tuple[int, int]) -> Optional[List[str]]:
+        shard_cache_key = self._shard_cache_key(shard)
+        if not shard_cache_key:
+            return None
+
+        try:
+            return json.loads(storage.load(shard_cache_key).decode('utf-8'))
+        except FileNotFoundError:
+            return None
+
+    def _save_shard_cache(self, shard: Tuple[int, int], texts: List[str]) -> None:
+        shard_cache_key = self._shard_cache_key(shard)
+        if not shard_cache_key:
+            return
+
+        try:
+            storage.save(shard_cache_key, json.dumps(texts).encode('utf-8'))
+        except Exception:
+            logger.exception('Failed to save pdf pages cache {}'.format(shard_cache_key))
+
+    def _shard_cache_key(self, shard: Tuple[int, int]) -> Optional[str]:
+        if not self._upload_file or not self._upload_file.hash:
+            return None
 
+        return 'upload_files/' + self._upload_file.tenant_id + '/' + self._upload_file.hash \
+            + '.pages/{}-{}.json'.format(shard[0], shard[1])
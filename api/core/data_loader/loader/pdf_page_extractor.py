@@ -0,0 +1,30 @@
+from typing import List
+
+import pypdfium2
+
+# NOTE: this module runs in the worker processes of PdfLoader, keep its imports light.
+
+
+def get_page_count(file_path: str) -> int:
+    pdf_reader = pypdfium2.PdfDocument(file_path, autoclose=True)
+    try:
+        return len(pdf_reader)
+    finally:
+        pdf_reader.close()
+
+
+def extract_pages(file_path: str, page_start: int, page_end: int) -> List[str]:
+    """Extract the text of pages [page_start, page_end) of a pdf file."""
+    pdf_reader = pypdfium2.PdfDocument(file_path, autoclose=True)
+    try:
+        texts = []
+        for page_number in range(page_start, page_end):
+            page = pdf_reader[page_number]
+            text_page = page.get_textpage()
+            texts.append(text_page.get_text_range())
+            text_page.close()
+            page.close()
+
+        return texts
+    finally:
+        pdf_reader.close()
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import logging
+from typing import List, Optional, Iterable, Iterator
+
+from langchain.schema import Document
+
+from extensions.ext_storage import storage
+from models.dataset import DatasetProcessRule
+
+
+class ArtifactStore:
+    """
+    Content addressed store of the processing artifacts of an upload file, shared across documents and tenants.
+
+    The extracted text is keyed by the file hash, the split segments by the file hash and the hash of the
+    processing rule, and the indexing estimate also by the embedding model it counts tokens with, so indexing
+    an identical file again skips extraction and splitting. Embeddings of the segments are deduplicated by the
+    embedding cache, what is left is the index upsert.
+    """
+
+    # metadata bound to a document or a segment, never stored in artifacts
+    DOCUMENT_METADATA_KEYS = ['doc_id', 'document_id', 'dataset_id', 'source']
+
+    def __init__(self, file_hash: str):
+        self._file_hash = file_hash
+
+    @classmethod
+    def generate_rule_hash(cls, processing_rule: DatasetProcessRule, doc_form: Optional[str] = None) -> str:
+        if processing_rule.mode == "automatic":
+            rules = DatasetProcessRule.AUTOMATIC_RULES
+        else:
+            rules = json.loads(processing_rule.rules) if processing_rule.rules else {}
+
+        rule = json.dumps({
+            'mode': processing_rule.mode,
+            'rules': rules,
+            'doc_form': doc_form or 'text_model'
+        }, sort_keys=True)
+
+        return hashlib.sha3_256(rule.encode('utf-8')).hexdigest()
+
+    def get_text_docs(self) -> Optional[Iterator[Document]]:
+        """Get the extracted text documents of the file, None if the file was never extracted."""
+        artifact = self._load(self._text_docs_key())
+        if artifact is None:
+            return None
+
+        return self._to_documents(artifact['documents'])
+
+    def save_text_docs(self, text_docs: Iterable[Document]) -> None:
+        self._save(self._text_docs_key(), {
+            'documents': self._from_documents(text_docs)
+        })
+
+    def get_segments(self, rule_hash: str) -> Optional[dict]:
+        """
+        Get the split segments of the file under a processing rule, None if the file was never split with it.
+
+        :return: dict with the word_count of the text and the segments as documents, without doc_id
+        """
+        artifact = self._load(self._segments_key(rule_hash))
+        if artifact is None:
+            return None
+
+        return {
+            'word_count': artifact['word_count'],
+            'segments': self._to_documents(artifact['segments'])
+        }
+
+    def save_segments(self, rule_hash: str, word_count: int, segments: Iterable[Document]) -> None:
+        self._save(self._segments_key(rule_hash), {
+            'word_count': word_count,
+            'segments': self._from_documents(segments)
+        })
+
+    def get_estimate(self, rule_hash: str, embedding_model_name: str) -> Optional[dict]:
+        """
+        Get the exact indexing estimate of the file under a processing rule, with the tokens counted by an
+        embedding model, None if it was never computed.
+
+        :return: dict with the total_segments, tokens and preview texts of the file
+        """
+        return self._load(self._estimate_key(rule_hash, embedding_model_name))
+
+    def save_estimate(self, rule_hash: str, embedding_model_name: str, total_segments: int, tokens: int,
+                      preview: List[str]) -> None:
+        self._save(self._estimate_key(rule_hash, embedding_model_name), {
+            'total_segments': total_segments,
+            'tokens': tokens,
+            'preview': preview
+        })
+
+    def _load(self, key: str) -> Optional[dict]:
+        try:
+            return json.loads(storage.load(key).decode('utf-8'))
+        except FileNotFoundError:
+            return None
+        except Exception:
+            logging.exception('Failed to load artifact {}'.format(key))
+            return None
+
+    def _save(self, key: str, artifact: dict) -> None:
+        try:
+            storage.save(key, json.dumps(artifact).encode('utf-8'))
+        except Exception:
+            logging.exception('Failed to save artifact {}'.format(key))
+
+    @classmethod
+    def _from_documents(cls, documents: Iterable[Document]) -> List[dict]:
+        return [{
+            'page_content': document.page_content,
+            'metadata': {key: value for key, value in document.metadata.items()
+                         if key not in cls.DOCUMENT_METADATA_KEYS}
+        } for document in documents]
+
+    @staticmethod
+    def _to_documents(items: List[dict]) -> Iterator[Document]:
+        for item in items:
+            yield Document(page_content=item['page_content'], metadata=item['metadata'])
+
+    def _text_docs_key(self) -> str:
+        return 'artifacts/{}/text_docs.json'.format(self._file_hash)
+
+    def _segments_key(self, rule_hash: str) -> str:
+        return 'artifacts/{}/segments/{}.json'.format(self._file_hash, rule_hash)
+
+    def _estimate_key(self, rule_hash: str, embedding_model_name: str) -> str:
+        # the tokenizers of the embedding models count differently
+        model_hash = hashlib.sha3_256(embedding_model_name.encode('utf-8')).hexdigest()
+        return 'artifacts/{}/estimates/{}/{}.json'.format(self._file_hash, rule_hash, model_hash)
@@ -3,6 +3,7 @@ from typing import Any, Dict, Optional, Sequence
 from langchain.schema import Document
 from sqlalchemy import func
 
+from core.helper.search_tokenizer import to_search_vector
 from core.model_providers.model_factory import ModelFactory
 from extensions.ext_database import db
 from models.dataset import Dataset, DocumentSegment
@@ -59,20 +60,23 @@ class DatesetDocumentStore:
         return output
 
     def add_documents(
-        self, docs: Sequence[Document], allow_update: bool = True
+        self, docs: Sequence[Document], allow_update: bool = True, positions: Optional[Sequence[int]] = None
     ) -> None:
-        max_position = db.session.query(func.max(DocumentSegment.position)).filter(
-            DocumentSegment.document_id == self._document_id
-        ).scalar()
+        """Add or update segments, new segments are appended unless their positions are given."""
+        max_position = None
+        if positions is None:
+            max_position = db.session.query(func.max(DocumentSegment.position)).filter(
+                DocumentSegment.document_id == self._document_id
+            ).scalar()
 
-        if max_position is None:
-            max_position = 0
+            if max_position is None:
+                max_position = 0
 
         embedding_model = ModelFactory.get_embedding_model(
             tenant_id=self._dataset.tenant_id
         )
 
-        for doc in docs:
+        for i, doc in enumerate(docs):
             if not isinstance(doc, Document):
                 raise ValueError("doc must be a Document")
 
@@ -89,7 +93,11 @@ class DatesetDocumentStore:
             tokens = embedding_model.get_num_tokens(doc.page_content)
 
             if not segment_document:
-                max_position += 1
+                if positions is None:
+                    max_position += 1
+                    position = max_position
+                else:
+                    position = positions[i]
 
                 segment_document = DocumentSegment(
                     tenant_id=self._dataset.tenant_id,
@@ -97,10 +105,11 @@ class DatesetDocumentStore:
                     document_id=self._document_id,
                     index_node_id=doc.metadata['doc_id'],
                     index_node_hash=doc.metadata['doc_hash'],
-                    position=max_position,
+                    position=position,
                     content=doc.page_content,
                     word_count=len(doc.page_content),
                     tokens=tokens,
+                    search_vector=to_search_vector(doc.page_content),
                     created_by=self._user_id,
                 )
                 if 'answer' in doc.metadata and doc.metadata['answer']:
@@ -109,6 +118,7 @@ class DatesetDocumentStore:
                 db.session.add(segment_document)
             else:
                 segment_document.content = doc.page_content
+                segment_document.search_vector = to_search_vector(doc.page_content)
                 if 'answer' in doc.metadata and doc.metadata['answer']:
                     segment_document.answer = doc.metadata.pop('answer', '')
                 segment_document.index_node_hash = doc.metadata['doc_hash']
@@ -0,0 +1,131 @@
+import json
+import logging
+from typing import List, Optional
+
+from flask import current_app
+from langchain.schema import Document
+
+from extensions.ext_database import db
+from extensions.ext_redis import redis_client
+from models.dataset import DocumentSegment
+
+
+class SegmentHydrator:
+    """
+    Turn the index node ids returned by an index search into segments with a single query,
+    keeping the rank order of the search and dropping disabled or incomplete segments.
+    """
+
+    def __init__(self, dataset_id: str, cache_ttl: Optional[int] = None):
+        self._dataset_id = dataset_id
+        if cache_ttl is None:
+            cache_ttl = int(current_app.config.get('SEGMENT_CONTENT_CACHE_TTL', 0))
+
+        self._cache_ttl = cache_ttl
+
+    def get_segments(self, index_node_ids: List[str]) -> List[DocumentSegment]:
+        """Fetch the available segments of index node ids, in the order of index_node_ids."""
+        if not index_node_ids:
+            return []
+
+        segments = db.session.query(DocumentSegment).filter(
+            DocumentSegment.dataset_id == self._dataset_id,
+            DocumentSegment.completed_at.isnot(None),
+            DocumentSegment.status == 'completed',
+            DocumentSegment.enabled == True,
+            DocumentSegment.index_node_id.in_(index_node_ids)
+        ).all()
+
+        return self._sort_by_rank(index_node_ids, segments, lambda segment: segment.index_node_id)
+
+    def get_documents(self, index_node_ids: List[str]) -> List[Document]:
+        """
+        Fetch the content of the available segments of index node ids as documents,
+        in the order of index_node_ids. Served from the segment content cache when enabled.
+        """
+        if not index_node_ids:
+            return []
+
+        cached_documents = self._get_cached_documents(index_node_ids)
+
+        missed_index_node_ids = [index_node_id for index_node_id in index_node_ids
+                                 if index_node_id not in cached_documents]
+        if missed_index_node_ids:
+            documents = [self._segment_to_document(segment) for segment in self.get_segments(missed_index_node_ids)]
+            self._set_cached_documents(documents)
+
+            for document in documents:
+                cached_documents[document.metadata['doc_id']] = document
+
+        return [cached_documents[index_node_id] for index_node_id in index_node_ids
+                if index_node_id in cached_documents]
+
+    @classmethod
+    def invalidate(cls, index_node_ids: List[str]) -> None:
+        """Drop cached content of segments, call it when segments are updated or disabled."""
+        if not index_node_ids:
+            return
+
+        try:
+            redis_client.delete(*[cls._cache_key(index_node_id) for index_node_id in index_node_ids])
+        except Exception:
+            logging.exception('Failed to invalidate segment content cache')
+
+    def _get_cached_documents(self, index_node_ids: List[str]) -> dict:
+        if self._cache_ttl <= 0:
+            return {}
+
+        try:
+            cache_results = redis_client.mget([self._cache_key(index_node_id) for index_node_id in index_node_ids])
+        except Exception:
+            logging.exception('Failed to get segment content cache')
+            return {}
+
+        cached_documents = {}
+        for index_node_id, cache_result in zip(index_node_ids, cache_results):
+            if cache_result is None:
+                continue
+
+            metadata = json.loads(cache_result)
+            page_content = metadata.pop('content')
+            cached_documents[index_node_id] = Document(page_content=page_content, metadata=metadata)
+
+        return cached_documents
+
+    def _set_cached_documents(self, documents: List[Document]) -> None:
+        if self._cache_ttl <= 0 or not documents:
+            return
+
+        try:
+            pipeline = redis_client.pipeline(transaction=False)
+            for document in documents:
+                pipeline.setex(
+                    self._cache_key(document.metadata['doc_id']),
+                    self._cache_ttl,
+                    json.dumps({'content': document.page_content, **document.metadata})
+                )
+            pipeline.execute()
+        except Exception:
+            logging.exception('Failed to set segment content cache')
+
+    @staticmethod
+    def _segment_to_document(segment: DocumentSegment) -> Document:
+        return Document(
+            page_content=segment.content,
+            metadata={
+                "doc_id": segment.index_node_id,
+                "doc_hash": segment.index_node_hash,
+                "document_id": segment.document_id,
+                "dataset_id": segment.dataset_id,
+                "answer": segment.answer,
+            }
+        )
+
+    @staticmethod
+    def _sort_by_rank(index_node_ids: List[str], items: list, key) -> list:
+        index_node_id_to_position = {id: position for position, id in enumerate(index_node_ids)}
+        return sorted(items, key=lambda item: index_node_id_to_position.get(key(item), float('inf')))
+
+    @staticmethod
+    def _cache_key(index_node_id: str) -> str:
+        return 'segment_content_{}'.format(index_node_id)
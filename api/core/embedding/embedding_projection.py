@@ -0,0 +1,113 @@
+import logging
+import pickle
+from typing import List, Optional
+
+import numpy as np
+
+from extensions.ext_redis import redis_client
+
+
+class ProjectionBasis:
+    """A linear map from embedding space to 2-D: (vector - mean) @ components."""
+
+    def __init__(self, mean: np.ndarray, components: np.ndarray, n_samples: int = 0):
+        self.mean = mean
+        self.components = components
+        self.n_samples = n_samples
+
+    @property
+    def dimension(self) -> int:
+        return self.components.shape[0]
+
+
+class EmbeddingProjection:
+    """
+    Project embeddings of a dataset to 2-D positions for hit testing visualization.
+
+    A PCA basis is fitted on a sample of the dataset embeddings at indexing time and cached in redis,
+    so projecting the query and the hits is a single matrix multiply. Datasets without a fitted basis
+    use a random projection seeded by the dataset id, which is stable across requests as well.
+    """
+
+    SAMPLE_SIZE = 256
+    RANDOM_SEED_BYTES = 4
+
+    def __init__(self, dataset_id: str):
+        self.dataset_id = dataset_id
+
+    def fit(self, embeddings: List[List[float]]) -> Optional[ProjectionBasis]:
+        """Fit and cache the PCA basis, unless a basis fitted on at least as many samples exists."""
+        embeddings = embeddings[:self.SAMPLE_SIZE]
+        if len(embeddings) < 3:
+            return None
+
+        basis = self.get_basis()
+        if basis and basis.n_samples >= len(embeddings) and basis.dimension == len(embeddings[0]):
+            return basis
+
+        basis = self.fit_pca_basis(np.array(embeddings, dtype=np.float32))
+        try:
+            redis_client.set(self._cache_key(), pickle.dumps({
+                'mean': basis.mean,
+                'components': basis.components,
+                'n_samples': basis.n_samples
+            }, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception:
+            logging.exception('Failed to cache projection basis of dataset {}'.format(self.dataset_id))
+
+        return basis
+
+    def get_basis(self) -> Optional[ProjectionBasis]:
+        try:
+            cache_result = redis_client.get(self._cache_key())
+        except Exception:
+            logging.exception('Failed to get projection basis of dataset {}'.format(self.dataset_id))
+            return None
+
+        return ProjectionBasis(**pickle.loads(cache_result)) if cache_result else None
+
+    def delete(self) -> None:
+        redis_client.delete(self._cache_key())
+
+    def project(self, embeddings: List[List[float]]) -> List[dict]:
+        """Project embeddings to positions, in the same order."""
+        if len(embeddings) == 0:
+            return []
+
+        data = np.array(embeddings, dtype=np.float32).reshape(len(embeddings), -1)
+
+        basis = self.get_basis()
+        if not basis or basis.dimension != data.shape[1]:
+            basis = self.random_basis(self.dataset_id, data.shape[1])
+
+        return self.to_positions(self.apply_basis(basis, data))
+
+    @classmethod
+    def fit_pca_basis(cls, data: np.ndarray) -> ProjectionBasis:
+        mean = data.mean(axis=0)
+        # rows of vt are the principal axes, sorted by explained variance
+        _, _, vt = np.linalg.svd(data - mean, full_matrices=False)
+        components = vt[:2].T
+        if components.shape[1] < 2:
+            components = np.pad(components, ((0, 0), (0, 2 - components.shape[1])))
+
+        return ProjectionBasis(mean=mean, components=components, n_samples=data.shape[0])
+
+    @classmethod
+    def random_basis(cls, dataset_id: str, dimension: int) -> ProjectionBasis:
+        seed = int(dataset_id.replace('-', '')[:cls.RANDOM_SEED_BYTES * 2], 16)
+        components = np.random.default_rng(seed).standard_normal((dimension, 2)).astype(np.float32)
+        components /= np.sqrt(dimension)
+
+        return ProjectionBasis(mean=np.zeros(dimension, dtype=np.float32), components=components)
+
+    @classmethod
+    def apply_basis(cls, basis: ProjectionBasis, data: np.ndarray) -> np.ndarray:
+        return (data - basis.mean) @ basis.components
+
+    @classmethod
+    def to_positions(cls, data: np.ndarray) -> List[dict]:
+        return [{'x': float(point[0]), 'y': float(point[1])} for point in data]
+
+    def _cache_key(self) -> str:
+        return 'dataset_projection_basis_{}'.format(self.dataset_id)
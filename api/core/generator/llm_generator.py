@@ -1,4 +1,5 @@
 import logging
+from typing import Iterable
 
 from langchain.schema import OutputParserException
 
@@ -37,7 +38,13 @@ class LLMGenerator:
         return answer.strip()
 
     @classmethod
-    def generate_conversation_summary(cls, tenant_id: str, messages):
+    def generate_conversation_summary(cls, tenant_id: str, messages: Iterable):
+        """
+        Summarize the messages which fit in the context of the model, in order.
+
+        Each message is tokenized once and added while the running sum of the tokens of the context fits
+        in the budget, messages are consumed until no other message can fit.
+        """
         max_tokens = 200
 
         model_instance = ModelFactory.get_text_generation_model(
@@ -47,14 +54,25 @@ class LLMGenerator:
             )
         )
 
+        def get_num_tokens(text: str) -> int:
+            return model_instance.get_num_tokens([PromptMessage(content=text)])
+
         prompt = CONVERSATION_SUMMARY_PROMPT
         prompt_with_empty_context = prompt.format(context='')
-        prompt_tokens = model_instance.get_num_tokens([PromptMessage(content=prompt_with_empty_context)])
+        prompt_tokens = get_num_tokens(prompt_with_empty_context)
         max_context_token_length = model_instance.model_rules.max_tokens.max
         rest_tokens = max_context_token_length - prompt_tokens - max_tokens - 1
 
-        context = ''
+        # tokens counted for any prompt message, e.g. its role, and the fewest tokens of a message text
+        message_overhead_tokens = get_num_tokens('')
+        min_message_tokens = get_num_tokens("\n\nHuman:\n\nAssistant:") - message_overhead_tokens
+
+        message_qa_texts = []
+        context_tokens = message_overhead_tokens
         for message in messages:
+            if rest_tokens - context_tokens - min_message_tokens <= 0:
+                break
+
             if not message.answer:
                 continue
 
@@ -69,13 +87,15 @@ class LLMGenerator:
                 answer = message.answer
 
             message_qa_text = "\n\nHuman:" + query + "\n\nAssistant:" + answer
-            if rest_tokens - model_instance.get_num_tokens([PromptMessage(content=context + message_qa_text)]) > 0:
-                context += message_qa_text
+            message_tokens = get_num_tokens(message_qa_text) - message_overhead_tokens
+            if rest_tokens - (context_tokens + message_tokens) > 0:
+                message_qa_texts.append(message_qa_text)
+                context_tokens += message_tokens
 
-        if not context:
+        if not message_qa_texts:
             return '[message too long, no summary]'
 
-        prompt = prompt.format(context=context)
+        prompt = prompt.format(context=''.join(message_qa_texts))
         prompts = [PromptMessage(content=prompt)]
         response = model_instance.run(prompts)
         answer = response.content
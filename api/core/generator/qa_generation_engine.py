@@ -0,0 +1,146 @@
+import json
+import logging
+import random
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from flask import current_app, Flask
+from langchain.schema import Document
+
+from core.generator.llm_generator import LLMGenerator
+from core.helper.token_bucket import TokenBucket
+from core.model_providers.error import LLMRateLimitError, LLMAPIConnectionError, LLMAPIUnavailableError
+from extensions.ext_redis import redis_client
+from libs import helper
+
+QA_PAIR_PATTERN = re.compile(r"Q\d+:\s*(.*?)\s*A\d+:\s*([\s\S]*?)(?=Q|$)", re.MULTILINE)
+ANSWER_NEWLINES_PATTERN = re.compile(r"\n\s*")
+
+
+def parse_qa_pairs(text: str) -> List[dict]:
+    """Parse the "Q1: ... A1: ..." output of the llm into question and answer pairs."""
+    result = []
+    for question, answer in QA_PAIR_PATTERN.findall(text):
+        if question and answer:
+            result.append({
+                "question": question,
+                "answer": ANSWER_NEWLINES_PATTERN.sub("\n", answer.strip())
+            })
+
+    return result
+
+
+class QAGenerationError(Exception):
+    pass
+
+
+class QAGenerationEngine:
+    """
+    Generate the question and answer documents of the nodes of qa_model documents.
+
+    Nodes are generated by a thread pool shared by the process, the requests of a tenant are limited
+    by a token bucket and retried with exponential backoff when the provider rate limits them or is
+    unreachable. The pairs of each node are checkpointed in redis by tenant and content hash, so a paused
+    or failed document resumes without generating the nodes it completed again.
+    """
+
+    MAX_RETRIES = 5
+    # seconds before the first retry, doubled on every retry
+    RETRY_BACKOFF = 2
+    RETRYABLE_ERRORS = (LLMRateLimitError, LLMAPIConnectionError, LLMAPIUnavailableError)
+    CHECKPOINT_TTL = 7 * 24 * 3600
+
+    _executor: Optional[ThreadPoolExecutor] = None
+    _max_workers = 0
+    _buckets: Dict[str, TokenBucket] = {}
+    _lock = threading.Lock()
+
+    def __init__(self, tenant_id: str):
+        self._tenant_id = tenant_id
+
+    def generate(self, nodes: List[Document]) -> List[Document]:
+        """
+        Generate the qa documents of nodes, in the order of the nodes.
+
+        Errors which are not retried, or persist after the retries, are raised, the nodes completed until
+        then are checkpointed.
+        """
+        flask_app = current_app._get_current_object()
+        executor = self._get_executor(int(flask_app.config.get('QA_GENERATION_MAX_WORKERS', 10)))
+        bucket = self._get_bucket(self._tenant_id, float(flask_app.config.get('QA_GENERATION_RATE_LIMIT', 2)))
+
+        futures = [executor.submit(self._generate_node, flask_app, bucket, node)
+                   for node in nodes if node.page_content and node.page_content.strip()]
+
+        qa_documents = []
+        try:
+            for future in futures:
+                qa_documents.extend(future.result())
+        finally:
+            for future in futures:
+                future.cancel()
+
+        return qa_documents
+
+    def _generate_node(self, flask_app: Flask, bucket: TokenBucket, node: Document) -> List[Document]:
+        with flask_app.app_context():
+            checkpoint_key = 'qa_generation_checkpoint:{}:{}'.format(self._tenant_id, node.metadata['doc_hash'])
+            checkpoint = redis_client.get(checkpoint_key)
+            if checkpoint is not None:
+                qa_pairs = json.loads(checkpoint)
+            else:
+                qa_pairs = parse_qa_pairs(self._generate_with_retries(bucket, node.page_content))
+                redis_client.setex(checkpoint_key, self.CHECKPOINT_TTL, json.dumps(qa_pairs))
+
+            qa_documents = []
+            for qa_pair in qa_pairs:
+                qa_document = Document(page_content=qa_pair['question'], metadata=node.metadata.copy())
+                qa_document.metadata['answer'] = qa_pair['answer']
+                qa_document.metadata['doc_id'] = str(uuid.uuid4())
+                qa_document.metadata['doc_hash'] = helper.generate_text_hash(qa_pair['question'])
+                qa_documents.append(qa_document)
+
+            return qa_documents
+
+    def _generate_with_retries(self, bucket: TokenBucket, content: str) -> str:
+        for attempt in range(self.MAX_RETRIES + 1):
+            bucket.acquire()
+            try:
+                return LLMGenerator.generate_qa_document(self._tenant_id, content)
+            except self.RETRYABLE_ERRORS as e:
+                if attempt == self.MAX_RETRIES:
+                    raise QAGenerationError('Failed to generate QA pairs after {} retries: {}'.format(
+                        self.MAX_RETRIES, str(e))) from e
+
+                backoff = self.RETRY_BACKOFF * 2 ** attempt * random.uniform(1, 1.5)
+                if isinstance(e, LLMRateLimitError):
+                    # all the requests of the tenant back off
+                    bucket.pause(backoff)
+
+                logging.warning('QA generation of tenant {} failed, retrying in {:.1f}s: {}'.format(
+                    self._tenant_id, backoff, str(e)))
+                time.sleep(backoff)
+
+    @classmethod
+    def _get_executor(cls, max_workers: int) -> ThreadPoolExecutor:
+        with cls._lock:
+            if cls._executor is None or cls._max_workers != max_workers:
+                if cls._executor is not None:
+                    cls._executor.shutdown(wait=False)
+
+                cls._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='qa_generation')
+                cls._max_workers = max_workers
+
+            return cls._executor
+
+    @classmethod
+    def _get_bucket(cls, tenant_id: str, rate: float) -> TokenBucket:
+        with cls._lock:
+            if tenant_id not in cls._buckets:
+                cls._buckets[tenant_id] = TokenBucket(rate)
+
+            return cls._buckets[tenant_id]
@@ -0,0 +1,46 @@
+import re
+from typing import Optional
+
+import jieba
+from sqlalchemy import func
+
+# texts longer than this are only indexed by their start, tsvector has a limit of 1MB
+MAX_SEARCH_TEXT_LENGTH = 65536
+WORD_PATTERN = re.compile(r'\w')
+# characters with a meaning in tsquery
+TS_QUERY_SPECIAL_PATTERN = re.compile(r"[&|!():*'\\<>\s]")
+
+
+def to_search_text(text: str) -> str:
+    """
+    Tokenize a text with jieba in search mode, the tokens joined by spaces go into to_tsvector('simple', ...).
+
+    Search mode also emits the shorter words within long chinese words, e.g. the word for "republic" within
+    the word for "people's republic of china", so that queries of either match.
+    """
+    if not text:
+        return ''
+
+    tokens = jieba.cut_for_search(text[:MAX_SEARCH_TEXT_LENGTH].lower())
+    return ' '.join(token for token in tokens if WORD_PATTERN.search(token))
+
+
+def to_search_vector(text: str):
+    """The tsvector of a text as an SQL expression, to be assigned to a TSVECTOR column."""
+    return func.to_tsvector('simple', to_search_text(text))
+
+
+def to_ts_query(keyword: str) -> Optional[str]:
+    """
+    Build a tsquery for to_tsquery('simple', ...) matching the texts which contain all the words of a keyword,
+    every word also matches as a prefix.
+
+    :return: None if the keyword has no words
+    """
+    terms = []
+    for token in jieba.cut(keyword.lower()):
+        token = TS_QUERY_SPECIAL_PATTERN.sub('', token)
+        if token and WORD_PATTERN.search(token):
+            terms.append(f"'{token}':*")
+
+    return ' & '.join(dict.fromkeys(terms)) if terms else None
@@ -0,0 +1,40 @@
+import threading
+import time
+from typing import Optional
+
+
+class TokenBucket:
+    """A thread safe token bucket, acquire() blocks until a token is available."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self._rate = rate
+        self._capacity = capacity or rate
+        self._tokens = self._capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now >= self._paused_until:
+                    self._tokens = min(self._capacity, self._tokens + (now - self._updated_at) * self._rate)
+                    self._updated_at = now
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+
+                    wait_seconds = (1 - self._tokens) / self._rate
+                else:
+                    wait_seconds = self._paused_until - now
+
+            time.sleep(wait_seconds)
+
+    def pause(self, seconds: float) -> None:
+        """Hold back all acquirers for seconds, e.g. on a Retry-After of the server."""
+        with self._lock:
+            now = time.monotonic()
+            self._paused_until = max(self._paused_until, now + seconds)
+            self._tokens = 0
+            self._updated_at = self._paused_until
@@ -1,11 +1,16 @@
 import re
+import threading
 from typing import Set
 
 import jieba
+from cachetools import TTLCache, cached
 from jieba.analyse import default_tfidf
 
 from core.index.keyword_table_index.stopwords import STOPWORDS
 
+# queries repeat a lot across conversations, avoid re-running jieba on them
+query_keywords_cache = TTLCache(maxsize=1024, ttl=600)
+
 
 class JiebaKeywordTableHandler:
 
@@ -21,6 +26,10 @@ class JiebaKeywordTableHandler:
 
         return set(self._expand_tokens_with_subtokens(keywords))
 
+    def extract_query_keywords(self, query: str, max_keywords_per_chunk: int = 10) -> Set[str]:
+        """Extract keywords of a search query, cached by query text."""
+        return set(_cached_extract_keywords(self, query, max_keywords_per_chunk))
+
     def _expand_tokens_with_subtokens(self, tokens: Set[str]) -> Set[str]:
         """Get subtokens from a list of tokens., filtering for stopwords."""
         results = set()
@@ -30,4 +39,11 @@ class JiebaKeywordTableHandler:
             if len(sub_tokens) > 1:
                 results.update({w for w in sub_tokens if w not in list(STOPWORDS)})
 
-        return results
\ No newline at end of file
+        return results
+
+
+@cached(cache=query_keywords_cache,
+        key=lambda handler, query, max_keywords_per_chunk: (query, max_keywords_per_chunk),
+        lock=threading.Lock())
+def _cached_extract_keywords(handler: JiebaKeywordTableHandler, query: str, max_keywords_per_chunk: int) -> frozenset:
+    return frozenset(handler.extract_keywords(query, max_keywords_per_chunk))
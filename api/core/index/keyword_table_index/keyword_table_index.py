@@ -5,8 +5,10 @@ from typing import Any, List, Optional, Dict
 from langchain.schema import Document, BaseRetriever
 from pydantic import BaseModel, Field, Extra
 
+from core.docstore.segment_hydrator import SegmentHydrator
 from core.index.base import BaseIndex
 from core.index.keyword_table_index.jieba_keyword_table_handler import JiebaKeywordTableHandler
+from core.indexing_process_pool import IndexingProcessPool
 from extensions.ext_database import db
 from models.dataset import Dataset, DocumentSegment, DatasetKeywordTable
 
@@ -21,10 +23,9 @@ class KeywordTableIndex(BaseIndex):
         self._config = config
 
     def create(self, texts: list[Document], **kwargs) -> BaseIndex:
-        keyword_table_handler = JiebaKeywordTableHandler()
         keyword_table = {}
-        for text in texts:
-            keywords = keyword_table_handler.extract_keywords(text.page_content, self._config.max_keywords_per_chunk)
+        keywords_list = self._extract_keywords([text.page_content for text in texts])
+        for text, keywords in zip(texts, keywords_list):
             self._update_segment_keywords(text.metadata['doc_id'], list(keywords))
             keyword_table = self._add_text_to_keyword_table(keyword_table, text.metadata['doc_id'], list(keywords))
 
@@ -47,11 +48,9 @@ class KeywordTableIndex(BaseIndex):
         return self
 
     def add_texts(self, texts: list[Document], **kwargs):
-        keyword_table_handler = JiebaKeywordTableHandler()
-
         keyword_table = self._get_dataset_keyword_table()
-        for text in texts:
-            keywords = keyword_table_handler.extract_keywords(text.page_content, self._config.max_keywords_per_chunk)
+        keywords_list = self._extract_keywords([text.page_content for text in texts])
+        for text, keywords in zip(texts, keywords_list):
             self._update_segment_keywords(text.metadata['doc_id'], list(keywords))
             keyword_table = self._add_text_to_keyword_table(keyword_table, text.metadata['doc_id'], list(keywords))
 
@@ -95,24 +94,7 @@ class KeywordTableIndex(BaseIndex):
 
         sorted_chunk_indices = self._retrieve_ids_by_query(keyword_table, query, k)
 
-        documents = []
-        for chunk_index in sorted_chunk_indices:
-            segment = db.session.query(DocumentSegment).filter(
-                DocumentSegment.dataset_id == self.dataset.id,
-                DocumentSegment.index_node_id == chunk_index
-            ).first()
-
-            if segment:
-                documents.append(Document(
-                    page_content=segment.content,
-                    metadata={
-                        "doc_id": chunk_index,
-                        "document_id": segment.document_id,
-                        "dataset_id": segment.dataset_id,
-                    }
-                ))
-
-        return documents
+        return SegmentHydrator(self.dataset.id).get_documents(sorted_chunk_indices)
 
     def delete(self) -> None:
         dataset_keyword_table = self.dataset.dataset_keyword_table
@@ -120,6 +102,16 @@ class KeywordTableIndex(BaseIndex):
             db.session.delete(dataset_keyword_table)
             db.session.commit()
 
+    def _extract_keywords(self, texts: List[str]) -> List[List[str]]:
+        """Extract keywords of texts, in the indexing process pool when it is enabled."""
+        indexing_process_pool = IndexingProcessPool.get() if len(texts) > 1 else None
+        if indexing_process_pool:
+            return indexing_process_pool.extract_keywords(texts, self._config.max_keywords_per_chunk)
+
+        keyword_table_handler = JiebaKeywordTableHandler()
+        return [list(keyword_table_handler.extract_keywords(text, self._config.max_keywords_per_chunk))
+                for text in texts]
+
     def _save_dataset_keyword_table(self, keyword_table):
         keyword_table_dict = {
             '__type__': 'keyword_table',
@@ -182,7 +174,7 @@ class KeywordTableIndex(BaseIndex):
 
     def _retrieve_ids_by_query(self, keyword_table: dict, query: str, k: int = 4):
         keyword_table_handler = JiebaKeywordTableHandler()
-        keywords = keyword_table_handler.extract_keywords(query)
+        keywords = keyword_table_handler.extract_query_keywords(query)
 
         # go through text chunks in order of most matching keywords
         chunk_indices_count: Dict[str, int] = defaultdict(int)
@@ -200,7 +192,10 @@ class KeywordTableIndex(BaseIndex):
         return sorted_chunk_indices[: k]
 
     def _update_segment_keywords(self, node_id: str, keywords: List[str]):
-        document_segment = db.session.query(DocumentSegment).filter(DocumentSegment.index_node_id == node_id).first()
+        document_segment = db.session.query(DocumentSegment).filter(
+            DocumentSegment.dataset_id == self.dataset.id,
+            DocumentSegment.index_node_id == node_id
+        ).first()
         if document_segment:
             document_segment.keywords = keywords
             db.session.commit()
@@ -1,11 +1,12 @@
 import json
 import logging
 from abc import abstractmethod
-from typing import List, Any, cast
+from typing import List, Any, cast, Optional, ClassVar
 
 from langchain.embeddings.base import Embeddings
 from langchain.schema import Document, BaseRetriever
 from langchain.vectorstores import VectorStore
+from pydantic import BaseModel
 from weaviate import UnexpectedStatusCodeException
 
 from core.index.base import BaseIndex
@@ -14,6 +15,75 @@ from models.dataset import Dataset, DocumentSegment
 from models.dataset import Document as DatasetDocument
 
 
+class VectorSearchFilter(BaseModel):
+    """Metadata filter pushed down into the vector store query."""
+    document_ids: Optional[List[str]] = None
+    exclude_document_ids: Optional[List[str]] = None
+    # documents too many to exclude in the query, the hits are checked against the database instead
+    post_filter_dataset_id: Optional[str] = None
+    post_filter_doc_form: Optional[str] = None
+
+    # document ids excluded in the vector store query at most
+    MAX_EXCLUDED_DOCUMENTS: ClassVar[int] = 500
+    # hits fetched per requested one when post filtering, some of them may be dropped
+    POST_FILTER_FETCH_FACTOR: ClassVar[int] = 2
+
+    @staticmethod
+    def _available_condition(doc_form: Optional[str] = None):
+        available_condition = db.and_(
+            DatasetDocument.indexing_status == 'completed',
+            DatasetDocument.enabled == True,
+            DatasetDocument.archived == False,
+        )
+        if doc_form:
+            available_condition = db.and_(available_condition, DatasetDocument.doc_form == doc_form)
+
+        return available_condition
+
+    @classmethod
+    def available_documents(cls, dataset_id: str, doc_form: Optional[str] = None) -> 'VectorSearchFilter':
+        """
+        Exclude the documents whose segments must not be returned: disabled, archived, not completed
+        and, if doc_form is given, of another doc form.
+        The index of such documents may still hold vectors while async index tasks are pending.
+        Beyond MAX_EXCLUDED_DOCUMENTS they are not excluded in the query, the hits are post filtered.
+        """
+        unavailable_documents = db.session.query(DatasetDocument.id).filter(
+            DatasetDocument.dataset_id == dataset_id,
+            db.not_(cls._available_condition(doc_form))
+        ).limit(cls.MAX_EXCLUDED_DOCUMENTS + 1).all()
+
+        if len(unavailable_documents) > cls.MAX_EXCLUDED_DOCUMENTS:
+            return cls(post_filter_dataset_id=dataset_id, post_filter_doc_form=doc_form)
+
+        return cls(exclude_document_ids=[document.id for document in unavailable_documents])
+
+    @property
+    def is_empty(self) -> bool:
+        return self.document_ids is None and not self.exclude_document_ids
+
+    def filter_documents(self, documents: List[Document]) -> List[Document]:
+        """Drop the hits of unavailable documents, hits without a document_id are kept."""
+        if not self.post_filter_dataset_id:
+            return documents
+
+        document_ids = {document.metadata['document_id'] for document in documents
+                        if document.metadata.get('document_id')}
+        if not document_ids:
+            return documents
+
+        available_documents = db.session.query(DatasetDocument.id).filter(
+            DatasetDocument.dataset_id == self.post_filter_dataset_id,
+            DatasetDocument.id.in_(document_ids),
+            self._available_condition(self.post_filter_doc_form)
+        ).all()
+        available_document_ids = {document.id for document in available_documents}
+
+        return [document for document in documents
+                if not document.metadata.get('document_id')
+                or document.metadata['document_id'] in available_document_ids]
+
+
 class BaseVectorIndex(BaseIndex):
     
     def __init__(self, dataset: Dataset, embeddings: Embeddings):
@@ -40,6 +110,11 @@ class BaseVectorIndex(BaseIndex):
     def _get_vector_store_class(self) -> type:
         raise NotImplementedError
 
+    @abstractmethod
+    def _build_search_filter(self, metadata_filter: VectorSearchFilter) -> Optional[dict]:
+        """Translate the metadata filter into search kwargs of the vector store."""
+        raise NotImplementedError
+
     def search(
             self, query: str,
             **kwargs: Any
@@ -50,11 +125,37 @@ class BaseVectorIndex(BaseIndex):
         search_type = kwargs.get('search_type') if kwargs.get('search_type') else 'similarity'
         search_kwargs = kwargs.get('search_kwargs') if kwargs.get('search_kwargs') else {}
 
-        if search_type == 'similarity_score_threshold':
+        # return the stored vectors of hits in metadata['vector'], saves re-embedding them
+        return_vectors = kwargs.get('return_vectors', False)
+
+        metadata_filter = kwargs.get('metadata_filter')
+        if metadata_filter and not metadata_filter.is_empty:
+            if metadata_filter.document_ids is not None and len(metadata_filter.document_ids) == 0:
+                return []
+
+            search_kwargs.update(self._build_search_filter(metadata_filter) or {})
+
+        if metadata_filter and metadata_filter.post_filter_dataset_id:
+            k = search_kwargs.get('k', 4)
+            search_kwargs['k'] = k * metadata_filter.POST_FILTER_FETCH_FACTOR
+            if 'fetch_k' in search_kwargs:
+                search_kwargs['fetch_k'] = max(search_kwargs['fetch_k'], search_kwargs['k'])
+
+            return metadata_filter.filter_documents(self._search(vector_store, query, search_type, search_kwargs,
+                                                                 return_vectors))[:k]
+
+        return self._search(vector_store, query, search_type, search_kwargs, return_vectors)
+
+    def _search(self, vector_store: VectorStore, query: str, search_type: str, search_kwargs: dict,
+                return_vectors: bool) -> List[Document]:
+        if search_type == 'similarity_score_threshold' or return_vectors:
             score_threshold = search_kwargs.get("score_threshold")
             if (score_threshold is None) or (not isinstance(score_threshold, float)):
                 search_kwargs['score_threshold'] = .0
 
+            if return_vectors:
+                search_kwargs['with_vectors'] = True
+
             docs_with_similarity = vector_store.similarity_search_with_relevance_scores(
                 query, **search_kwargs
             )
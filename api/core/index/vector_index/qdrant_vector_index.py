@@ -1,3 +1,4 @@
+import logging
 import os
 from typing import Optional, Any, List, cast
 
@@ -8,7 +9,7 @@ from langchain.vectorstores import VectorStore
 from pydantic import BaseModel
 
 from core.index.base import BaseIndex
-from core.index.vector_index.base import BaseVectorIndex
+from core.index.vector_index.base import BaseVectorIndex, VectorSearchFilter
 from core.vector_store.qdrant_vector_store import QdrantVectorStore
 from models.dataset import Dataset
 
@@ -35,6 +36,9 @@ class QdrantConfig(BaseModel):
 
 
 class QdrantVectorIndex(BaseVectorIndex):
+    # collections whose payload index this process has created, existing collections get it when opened
+    _payload_indexed_collections = set()
+
     def __init__(self, dataset: Dataset, config: QdrantConfig, embeddings: Embeddings):
         super().__init__(dataset, embeddings)
         self._client_config = config
@@ -66,8 +70,29 @@ class QdrantVectorIndex(BaseVectorIndex):
             **self._client_config.to_qdrant_params()
         )
 
+        self._create_payload_index(cast(QdrantVectorStore, self._vector_store).client)
+
         return self
 
+    def _create_payload_index(self, client: qdrant_client.QdrantClient):
+        """Index the payload fields used by search filters, creating an existing payload index is a no-op."""
+        from qdrant_client.http import models
+
+        collection_name = self.get_index_name(self.dataset)
+        if collection_name in self._payload_indexed_collections or self._is_origin():
+            # points of origin collections have no document_id in payload
+            return
+
+        try:
+            client.create_payload_index(
+                collection_name=collection_name,
+                field_name="metadata.document_id",
+                field_schema=models.PayloadSchemaType.KEYWORD
+            )
+            self._payload_indexed_collections.add(collection_name)
+        except Exception:
+            logging.warning("Failed to create payload index of collection {}".format(collection_name))
+
     def _get_vector_store(self) -> VectorStore:
         """Only for created index."""
         if self._vector_store:
@@ -76,6 +101,7 @@ class QdrantVectorIndex(BaseVectorIndex):
         client = qdrant_client.QdrantClient(
             **self._client_config.to_qdrant_params()
         )
+        self._create_payload_index(client)
 
         return QdrantVectorStore(
             client=client,
@@ -106,6 +132,29 @@ class QdrantVectorIndex(BaseVectorIndex):
             ],
         ))
 
+    def _build_search_filter(self, metadata_filter: VectorSearchFilter) -> Optional[dict]:
+        if self._is_origin():
+            # points of origin collections have no document_id in payload
+            return None
+
+        from qdrant_client.http import models
+
+        must = []
+        if metadata_filter.document_ids is not None:
+            must.append(models.FieldCondition(
+                key="metadata.document_id",
+                match=models.MatchAny(any=metadata_filter.document_ids),
+            ))
+
+        must_not = []
+        if metadata_filter.exclude_document_ids:
+            must_not.append(models.FieldCondition(
+                key="metadata.document_id",
+                match=models.MatchAny(any=metadata_filter.exclude_document_ids),
+            ))
+
+        return {'filter': models.Filter(must=must or None, must_not=must_not or None)}
+
     def _is_origin(self):
         if self.dataset.index_struct_dict:
             class_prefix: str = self.dataset.index_struct_dict['vector_store']['collection_name']
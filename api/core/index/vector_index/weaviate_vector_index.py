@@ -8,7 +8,7 @@ from langchain.vectorstores import VectorStore
 from pydantic import BaseModel, root_validator
 
 from core.index.base import BaseIndex
-from core.index.vector_index.base import BaseVectorIndex
+from core.index.vector_index.base import BaseVectorIndex, VectorSearchFilter
 from core.vector_store.weaviate_vector_store import WeaviateVectorStore
 from models.dataset import Dataset
 
@@ -126,6 +126,42 @@ class WeaviateVectorIndex(BaseVectorIndex):
             "valueText": document_id
         })
 
+    def _build_search_filter(self, metadata_filter: VectorSearchFilter) -> Optional[dict]:
+        if self._is_origin():
+            # objects of origin classes have no document_id attribute
+            return None
+
+        operands = []
+        if metadata_filter.document_ids is not None:
+            operands.append(self._join_where_operands('Or', [{
+                "operator": "Equal",
+                "path": ["document_id"],
+                "valueText": document_id
+            } for document_id in metadata_filter.document_ids]))
+
+        if metadata_filter.exclude_document_ids:
+            operands.append(self._join_where_operands('And', [{
+                "operator": "NotEqual",
+                "path": ["document_id"],
+                "valueText": document_id
+            } for document_id in metadata_filter.exclude_document_ids]))
+
+        operands = [operand for operand in operands if operand]
+        if not operands:
+            return None
+
+        return {'where_filter': self._join_where_operands('And', operands)}
+
+    @staticmethod
+    def _join_where_operands(operator: str, operands: list) -> Optional[dict]:
+        if not operands:
+            return None
+
+        if len(operands) == 1:
+            return operands[0]
+
+        return {"operator": operator, "operands": operands}
+
     def _is_origin(self):
         if self.dataset.index_struct_dict:
             class_prefix: str = self.dataset.index_struct_dict['vector_store']['class_prefix']
@@ -0,0 +1,136 @@
+import logging
+import multiprocessing
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Iterator, Tuple, Iterable
+
+from flask import current_app, has_app_context
+from langchain.schema import Document
+
+from models.dataset import DatasetProcessRule
+
+# state of a worker process, set up once by _initialize_worker
+_worker_state = {}
+
+
+class IndexingProcessPool:
+    """
+    A process pool for the CPU bound stages of indexing: cleaning and splitting text documents and
+    extracting keywords of segments, which hold the GIL in regexes, tiktoken and jieba.
+
+    Workers are long lived and warm up jieba and tiktoken once, only texts, metadata and keywords
+    cross the process boundary. The pool is disabled in daemonic processes, e.g. celery prefork workers,
+    which are not allowed to have children.
+    """
+
+    _pool: Optional[ProcessPoolExecutor] = None
+    _max_workers = 0
+    _lock = threading.Lock()
+
+    def __init__(self, executor: ProcessPoolExecutor, max_workers: int):
+        self._executor = executor
+        self._max_workers = max_workers
+
+    @classmethod
+    def get(cls) -> Optional['IndexingProcessPool']:
+        """Get the pool of the process, None when disabled."""
+        max_workers = int(current_app.config.get('INDEXING_PROCESS_POOL_WORKERS', 0)) if has_app_context() else 0
+        if max_workers <= 0 or multiprocessing.current_process().daemon:
+            return None
+
+        with cls._lock:
+            if cls._pool is None or cls._max_workers != max_workers:
+                if cls._pool is not None:
+                    cls._pool.shutdown(wait=False)
+
+                cls._pool = ProcessPoolExecutor(max_workers=max_workers, initializer=_initialize_worker)
+                cls._max_workers = max_workers
+
+            return cls(cls._pool, max_workers)
+
+    def split_windows(self, text_docs_windows: Iterable[List[Document]],
+                      processing_rule: DatasetProcessRule) -> Iterator[Tuple[int, List[Document]]]:
+        """
+        Clean and split windows of text documents in the workers, in order.
+
+        :return: word count of each window and its segments as documents
+        """
+        pending = deque()
+        for text_docs_window in text_docs_windows:
+            pending.append(self._executor.submit(
+                _split_text_docs,
+                processing_rule.mode,
+                processing_rule.rules,
+                [(text_doc.page_content, text_doc.metadata) for text_doc in text_docs_window]
+            ))
+
+            # at most two windows per worker are held in memory
+            if len(pending) >= self._max_workers * 2:
+                yield self._to_split_result(pending.popleft().result())
+
+        while pending:
+            yield self._to_split_result(pending.popleft().result())
+
+    def extract_keywords(self, texts: List[str], max_keywords_per_chunk: int) -> List[List[str]]:
+        """Extract keywords of texts in the workers, in the order of texts."""
+        batch_size = max(len(texts) // self._max_workers, 1)
+        futures = [self._executor.submit(_extract_keywords, texts[i:i + batch_size], max_keywords_per_chunk)
+                   for i in range(0, len(texts), batch_size)]
+
+        keywords_list = []
+        for future in futures:
+            keywords_list.extend(future.result())
+
+        return keywords_list
+
+    @staticmethod
+    def _to_split_result(result: Tuple[int, List[Tuple[str, dict]]]) -> Tuple[int, List[Document]]:
+        word_count, documents = result
+        return word_count, [Document(page_content=page_content, metadata=metadata)
+                            for page_content, metadata in documents]
+
+
+def _initialize_worker():
+    import jieba
+    from core.index.keyword_table_index.jieba_keyword_table_handler import JiebaKeywordTableHandler
+    from core.indexing_runner import IndexingRunner
+
+    jieba.initialize()
+    _worker_state['keyword_table_handler'] = JiebaKeywordTableHandler()
+    _worker_state['indexing_runner'] = IndexingRunner()
+    _worker_state['splitters'] = {}
+
+    try:
+        # loads the tiktoken encoding
+        _worker_state['indexing_runner']._get_splitter(DatasetProcessRule(mode='automatic'))
+    except Exception:
+        logging.exception('Failed to warm up the splitter of the indexing worker')
+
+
+def _split_text_docs(mode: str, rules: Optional[str], text_docs: List[Tuple[str, dict]]) \
+        -> Tuple[int, List[Tuple[str, dict]]]:
+    indexing_runner = _worker_state['indexing_runner']
+    processing_rule = DatasetProcessRule(mode=mode, rules=rules)
+
+    splitters = _worker_state['splitters']
+    if (mode, rules) not in splitters:
+        splitters[(mode, rules)] = indexing_runner._get_splitter(processing_rule)
+
+    text_docs = [Document(page_content=page_content, metadata=metadata) for page_content, metadata in text_docs]
+    word_count = sum(len(text_doc.page_content) for text_doc in text_docs)
+
+    documents = indexing_runner._split_to_documents(
+        text_docs=text_docs,
+        splitter=splitters[(mode, rules)],
+        processing_rule=processing_rule,
+        tenant_id='',
+        document_form='text_model'
+    )
+
+    return word_count, [(document.page_content, document.metadata) for document in documents]
+
+
+def _extract_keywords(texts: List[str], max_keywords_per_chunk: int) -> List[List[str]]:
+    keyword_table_handler = _worker_state['keyword_table_handler']
+    return [list(keyword_table_handler.extract_keywords(text, max_keywords_per_chunk)) for text in texts]
@@ -0,0 +1,117 @@
+import json
+import logging
+import time
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import func
+
+from extensions.ext_database import db
+from extensions.ext_redis import redis_client
+from models.dataset import DocumentSegment
+
+
+class IndexingProgress:
+    """
+    Indexing progress of documents: the segment counts of many documents in one grouped query, and a feed
+    of progress events the indexing runner publishes to redis as chunks of segments complete, so that
+    clients watching a batch do not poll the database.
+    """
+
+    # statuses after which a document makes no more progress
+    FINISHED_STATUSES = ['completed', 'error', 'paused']
+
+    @staticmethod
+    def channel_name(dataset_id: str) -> str:
+        return 'dataset_indexing_progress:{}'.format(dataset_id)
+
+    @classmethod
+    def get_segment_counts(cls, document_ids: List[str]) -> Dict[str, Tuple[int, int]]:
+        """
+        Count the completed and total segments of documents, grouped by document.
+
+        :return: completed and total segments by document id, (0, 0) for documents without segments
+        """
+        counts = {str(document_id): (0, 0) for document_id in document_ids}
+        if not counts:
+            return counts
+
+        rows = db.session.query(
+            DocumentSegment.document_id,
+            func.count(DocumentSegment.id).filter(DocumentSegment.completed_at.isnot(None)),
+            func.count(DocumentSegment.id)
+        ).filter(
+            DocumentSegment.document_id.in_(list(counts)),
+            DocumentSegment.status != 're_segment'
+        ).group_by(DocumentSegment.document_id).all()
+
+        for document_id, completed_segments, total_segments in rows:
+            counts[str(document_id)] = (completed_segments, total_segments)
+
+        return counts
+
+    @classmethod
+    def publish(cls, dataset_id: str, document_id: str, indexing_status: str,
+                completed_segments: int, total_segments: int) -> None:
+        """Publish the progress of a document, a failure is logged and does not interrupt the indexing."""
+        try:
+            redis_client.publish(cls.channel_name(dataset_id), json.dumps({
+                'id': document_id,
+                'indexing_status': indexing_status,
+                'completed_segments': completed_segments,
+                'total_segments': total_segments
+            }))
+        except Exception:
+            logging.exception('Failed to publish the indexing progress of document {}'.format(document_id))
+
+    @classmethod
+    def listen(cls, dataset_id: str, document_ids: List[str], snapshot: Callable[[], List[dict]],
+               timeout: int = 600, resync_interval: int = 30, ping_interval: int = 10) -> Iterator[Optional[dict]]:
+        """
+        Follow the progress of documents of a dataset until all of them finish or the timeout expires.
+
+        The statuses from `snapshot` are yielded first and again every `resync_interval` seconds, which covers
+        the changes no event is published for, e.g. pausing or failing. In between, the published events of
+        the documents are yielded. None is yielded every `ping_interval` seconds without events, to keep
+        the connection alive.
+        """
+        document_ids = set(str(document_id) for document_id in document_ids)
+        statuses = {}
+
+        pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+        # subscribe before the first snapshot, so no event is missed in between
+        pubsub.subscribe(cls.channel_name(dataset_id))
+        try:
+            deadline = time.monotonic() + timeout
+            next_resync_at = 0
+            last_sent_at = time.monotonic()
+            while True:
+                now = time.monotonic()
+                if now >= next_resync_at:
+                    for status in snapshot():
+                        statuses[status['id']] = status['indexing_status']
+                        yield status
+
+                    next_resync_at = now + resync_interval
+                    last_sent_at = now
+
+                if document_ids <= set(statuses) and \
+                        all(status in cls.FINISHED_STATUSES for status in statuses.values()):
+                    return
+
+                if now >= deadline:
+                    return
+
+                message = pubsub.get_message(timeout=1.0)
+                if message is None:
+                    if time.monotonic() - last_sent_at >= ping_interval:
+                        last_sent_at = time.monotonic()
+                        yield None
+                    continue
+
+                event = json.loads(message['data'])
+                if event['id'] in document_ids:
+                    statuses[event['id']] = event['indexing_status']
+                    last_sent_at = time.monotonic()
+                    yield event
+        finally:
+            pubsub.close()
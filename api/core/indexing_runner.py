@@ -1,25 +1,32 @@
 import datetime
+import itertools
 import json
 import logging
-import re
-import threading
 import time
 import uuid
-from typing import Optional, List, cast
+from collections import defaultdict, deque
+from typing import Optional, List, Iterator, Iterable, Tuple
 
-from flask_login import current_user
 from langchain.schema import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter, TextSplitter
+from sqlalchemy import func
 
 from core.data_loader.file_extractor import FileExtractor
 from core.data_loader.loader.notion import NotionLoader
+from core.docstore.artifact_store import ArtifactStore
 from core.docstore.dataset_docstore import DatesetDocumentStore
-from core.generator.llm_generator import LLMGenerator
+from core.docstore.segment_hydrator import SegmentHydrator
+from core.embedding.cached_embedding import CacheEmbedding
+from core.embedding.embedding_projection import EmbeddingProjection
+from core.generator.qa_generation_engine import QAGenerationEngine
 from core.index.index import IndexBuilder
+from core.indexing_process_pool import IndexingProcessPool
+from core.indexing_progress import IndexingProgress
 from core.model_providers.error import ProviderTokenNotInitError
 from core.model_providers.model_factory import ModelFactory
 from core.model_providers.models.entity.message import MessageType
 from core.spiltter.fixed_text_splitter import FixedRecursiveCharacterTextSplitter
+from core.spiltter.text_cleaner import TextCleaner, filter_string
 from extensions.ext_database import db
 from extensions.ext_redis import redis_client
 from extensions.ext_storage import storage
@@ -28,12 +35,27 @@ from models.dataset import Document as DatasetDocument
 from models.dataset import Dataset, DocumentSegment, DatasetProcessRule
 from models.model import UploadFile
 from models.source import DataSourceBinding
+from tasks.compute_indexing_estimate_task import compute_indexing_estimate_task
 
 
 class IndexingRunner:
+    # text documents (pages, rows, sections) loaded, cleaned and split at a time
+    SPLIT_WINDOW_SIZE = 100
+    # segments fetched at a time when indexing from the database
+    SEGMENT_BATCH_SIZE = 500
+    # characters of text kept in memory to save as a processing artifact, larger files are not cached,
+    # the copies of the text documents and of the segments take a few times as many bytes each
+    MAX_ARTIFACT_LENGTH = 2000000
+    # pdf pages and characters of other sources sampled for an indexing estimate
+    ESTIMATE_SAMPLE_PAGES = 20
+    ESTIMATE_SAMPLE_CHARACTERS = 100000
+    ESTIMATE_PREVIEW_SIZE = 5
+    # seconds before the exact estimate of a file may be enqueued again, e.g. after the task failed
+    ESTIMATE_TASK_LOCK_TTL = 600
 
     def __init__(self):
         self.storage = storage
+        self._text_cleaners = {}
 
     def run(self, dataset_documents: List[DatasetDocument]):
         """Run the indexing process."""
@@ -47,9 +69,6 @@ class IndexingRunner:
                 if not dataset:
                     raise ValueError("no dataset found")
 
-                # load file
-                text_docs = self._load_data(dataset_document)
-
                 # get the process rule
                 processing_rule = db.session.query(DatasetProcessRule). \
                     filter(DatasetProcessRule.id == dataset_document.dataset_process_rule_id). \
@@ -58,26 +77,22 @@ class IndexingRunner:
                 # get splitter
                 splitter = self._get_splitter(processing_rule)
 
-                # split to documents
-                documents = self._step_split(
-                    text_docs=text_docs,
+                # load and split to documents window by window
+                artifact_store = self._get_artifact_store(dataset_document)
+                self._step_split_lazily(
+                    text_docs=self._load_data_lazily(dataset_document, artifact_store),
                     splitter=splitter,
                     dataset=dataset,
                     dataset_document=dataset_document,
-                    processing_rule=processing_rule
+                    processing_rule=processing_rule,
+                    artifact_store=artifact_store
                 )
-                # new_documents = []
-                # for document in documents:
-                #     response = LLMGenerator.generate_qa_document(dataset.tenant_id, document.page_content)
-                #     document_qa_list = self.format_split_text(response)
-                #     for result in document_qa_list:
-                #         document = Document(page_content=result['question'], metadata={'source': result['answer']})
-                #         new_documents.append(document)
+
                 # build index
                 self._build_index(
                     dataset=dataset,
                     dataset_document=dataset_document,
-                    documents=documents
+                    documents=self._iter_segment_documents(dataset_document)
                 )
             except DocumentIsPausedException:
                 raise DocumentIsPausedException('Document paused, document id: {}'.format(dataset_document.id))
@@ -93,22 +108,6 @@ class IndexingRunner:
                 dataset_document.stopped_at = datetime.datetime.utcnow()
                 db.session.commit()
 
-    def format_split_text(self, text):
-        regex = r"Q\d+:\s*(.*?)\s*A\d+:\s*([\s\S]*?)(?=Q|$)"
-        matches = re.findall(regex, text, re.MULTILINE)
-
-        result = []
-        for match in matches:
-            q = match[0]
-            a = match[1]
-            if q and a:
-                result.append({
-                    "question": q,
-                    "answer": re.sub(r"\n\s*", "\n", a.strip())
-                })
-
-        return result
-
     def run_in_splitting_status(self, dataset_document: DatasetDocument):
         """Run the indexing process when the index_status is splitting."""
         try:
@@ -129,9 +128,6 @@ class IndexingRunner:
             db.session.delete(document_segments)
             db.session.commit()
 
-            # load file
-            text_docs = self._load_data(dataset_document)
-
             # get the process rule
             processing_rule = db.session.query(DatasetProcessRule). \
                 filter(DatasetProcessRule.id == dataset_document.dataset_process_rule_id). \
@@ -140,20 +136,22 @@ class IndexingRunner:
             # get splitter
             splitter = self._get_splitter(processing_rule)
 
-            # split to documents
-            documents = self._step_split(
-                text_docs=text_docs,
+            # load and split to documents window by window
+            artifact_store = self._get_artifact_store(dataset_document)
+            self._step_split_lazily(
+                text_docs=self._load_data_lazily(dataset_document, artifact_store),
                 splitter=splitter,
                 dataset=dataset,
                 dataset_document=dataset_document,
-                processing_rule=processing_rule
+                processing_rule=processing_rule,
+                artifact_store=artifact_store
             )
 
             # build index
             self._build_index(
                 dataset=dataset,
                 dataset_document=dataset_document,
-                documents=documents
+                documents=self._iter_segment_documents(dataset_document)
             )
         except DocumentIsPausedException:
             raise DocumentIsPausedException('Document paused, document id: {}'.format(dataset_document.id))
@@ -223,88 +221,156 @@ class IndexingRunner:
             dataset_document.stopped_at = datetime.datetime.utcnow()
             db.session.commit()
 
+    def run_incrementally(self, dataset_documents: List[DatasetDocument]):
+        """
+        Re-index documents whose content was updated, keeping the segments whose content did not change.
+        Only the segments of new or changed text are embedded and indexed.
+        """
+        for dataset_document in dataset_documents:
+            try:
+                # get dataset
+                dataset = Dataset.query.filter_by(
+                    id=dataset_document.dataset_id
+                ).first()
+
+                if not dataset:
+                    raise ValueError("no dataset found")
+
+                # get the process rule
+                processing_rule = db.session.query(DatasetProcessRule). \
+                    filter(DatasetProcessRule.id == dataset_document.dataset_process_rule_id). \
+                    first()
+
+                # get splitter
+                splitter = self._get_splitter(processing_rule)
+
+                # load and split to documents window by window, diff them with the existing segments
+                self._step_split_incrementally(
+                    text_docs=self._load_data_lazily(dataset_document),
+                    splitter=splitter,
+                    dataset=dataset,
+                    dataset_document=dataset_document,
+                    processing_rule=processing_rule
+                )
+
+                # build index of the new segments
+                self._build_index(
+                    dataset=dataset,
+                    dataset_document=dataset_document,
+                    documents=self._iter_segment_documents(dataset_document)
+                )
+
+                # tokens of the document include the kept segments
+                tokens = db.session.query(func.sum(DocumentSegment.tokens)).filter(
+                    DocumentSegment.document_id == dataset_document.id
+                ).scalar()
+                DatasetDocument.query.filter_by(id=dataset_document.id).update({
+                    DatasetDocument.tokens: tokens or 0
+                })
+                db.session.commit()
+            except DocumentIsPausedException:
+                raise DocumentIsPausedException('Document paused, document id: {}'.format(dataset_document.id))
+            except ProviderTokenNotInitError as e:
+                dataset_document.indexing_status = 'error'
+                dataset_document.error = str(e.description)
+                dataset_document.stopped_at = datetime.datetime.utcnow()
+                db.session.commit()
+            except Exception as e:
+                logging.exception("consume document failed")
+                dataset_document.indexing_status = 'error'
+                dataset_document.error = str(e)
+                dataset_document.stopped_at = datetime.datetime.utcnow()
+                db.session.commit()
+
     def file_indexing_estimate(self, tenant_id: str, file_details: List[UploadFile], tmp_processing_rule: dict,
                                doc_form: str = None) -> dict:
         """
         Estimate the indexing for the document.
+
+        The exact estimate of a file under a processing rule is cached in the artifact store. Files without
+        one are estimated from a sample of their pages, and their exact estimate is computed in the background,
+        which also saves the segments of the file, reused when the file is indexed with the same rule.
         """
         embedding_model = ModelFactory.get_embedding_model(
             tenant_id=tenant_id
         )
 
+        processing_rule = DatasetProcessRule(
+            mode=tmp_processing_rule["mode"],
+            rules=json.dumps(tmp_processing_rule["rules"])
+        )
+
+        # get splitter
+        splitter = self._get_splitter(processing_rule)
+
+        # the segments are split the same way whatever the document form
+        rule_hash = ArtifactStore.generate_rule_hash(processing_rule)
+        embedding_model_name = self._embedding_model_name(embedding_model)
+
         tokens = 0
         preview_texts = []
         total_segments = 0
+        exact = True
         for file_detail in file_details:
-            # load data from file
-            text_docs = FileExtractor.load(file_detail)
-
-            processing_rule = DatasetProcessRule(
-                mode=tmp_processing_rule["mode"],
-                rules=json.dumps(tmp_processing_rule["rules"])
-            )
-
-            # get splitter
-            splitter = self._get_splitter(processing_rule)
-
-            # split to documents
-            documents = self._split_to_documents_for_estimate(
-                text_docs=text_docs,
-                splitter=splitter,
-                processing_rule=processing_rule
-            )
-
-            total_segments += len(documents)
-
-            for document in documents:
-                if len(preview_texts) < 5:
-                    preview_texts.append(document.page_content)
-
-                tokens += embedding_model.get_num_tokens(self.filter_string(document.page_content))
-
-        text_generation_model = ModelFactory.get_text_generation_model(
-            tenant_id=tenant_id
-        )
+            artifact_store = ArtifactStore(file_detail.hash) if file_detail.hash else None
+            estimate = artifact_store.get_estimate(rule_hash, embedding_model_name) if artifact_store else None
+            if estimate is None:
+                text_docs, scale = FileExtractor.sample(file_detail, self.ESTIMATE_SAMPLE_PAGES,
+                                                        self.ESTIMATE_SAMPLE_CHARACTERS)
+                estimate = self._estimate_sample(text_docs, scale, splitter, processing_rule, embedding_model)
+                if artifact_store and estimate['exact']:
+                    artifact_store.save_estimate(rule_hash, embedding_model_name, estimate['total_segments'],
+                                                 estimate['tokens'], estimate['preview'])
+                elif artifact_store:
+                    self._compute_file_indexing_estimate_later(file_detail, tmp_processing_rule, rule_hash,
+                                                               embedding_model_name)
+
+                exact = exact and estimate['exact']
+
+            total_segments += estimate['total_segments']
+            tokens += estimate['tokens']
+            preview_texts.extend(estimate['preview'][:self.ESTIMATE_PREVIEW_SIZE - len(preview_texts)])
+
+        if doc_form and doc_form == 'qa_model' and preview_texts:
+            return self._qa_indexing_estimate(tenant_id, preview_texts, total_segments, embedding_model, exact)
 
-        if doc_form and doc_form == 'qa_model':
-            if len(preview_texts) > 0:
-                # qa model document
-                response = LLMGenerator.generate_qa_document(current_user.current_tenant_id, preview_texts[0])
-                document_qa_list = self.format_split_text(response)
-                return {
-                    "total_segments": total_segments * 20,
-                    "tokens": total_segments * 2000,
-                    "total_price": '{:f}'.format(
-                        text_generation_model.get_token_price(total_segments * 2000, MessageType.HUMAN)),
-                    "currency": embedding_model.get_currency(),
-                    "qa_preview": document_qa_list,
-                    "preview": preview_texts
-                }
         return {
             "total_segments": total_segments,
             "tokens": tokens,
             "total_price": '{:f}'.format(embedding_model.get_token_price(tokens)),
             "currency": embedding_model.get_currency(),
-            "preview": preview_texts
+            "preview": preview_texts,
+            "exact": exact
         }
 
     def notion_indexing_estimate(self, tenant_id: str, notion_info_list: list, tmp_processing_rule: dict, doc_form: str = None) -> dict:
         """
         Estimate the indexing for the document.
+
+        Pages are estimated from a sample of their text, notion pages have no content hash to cache them by.
         """
         embedding_model = ModelFactory.get_embedding_model(
             tenant_id=tenant_id
         )
 
+        processing_rule = DatasetProcessRule(
+            mode=tmp_processing_rule["mode"],
+            rules=json.dumps(tmp_processing_rule["rules"])
+        )
+
+        # get splitter
+        splitter = self._get_splitter(processing_rule)
+
         # load data from notion
         tokens = 0
         preview_texts = []
         total_segments = 0
+        exact = True
         for notion_info in notion_info_list:
             workspace_id = notion_info['workspace_id']
             data_source_binding = DataSourceBinding.query.filter(
                 db.and_(
-                    DataSourceBinding.tenant_id == current_user.current_tenant_id,
+                    DataSourceBinding.tenant_id == tenant_id,
                     DataSourceBinding.provider == 'notion',
                     DataSourceBinding.disabled == False,
                     DataSourceBinding.source_info['workspace_id'] == f'"{workspace_id}"'
@@ -320,100 +386,246 @@ class IndexingRunner:
                     notion_obj_id=page['page_id'],
                     notion_page_type=page['type']
                 )
-                documents = loader.load()
+                text_docs, scale = FileExtractor.sample_documents(loader.load(), self.ESTIMATE_SAMPLE_CHARACTERS)
+                estimate = self._estimate_sample(text_docs, scale, splitter, processing_rule, embedding_model)
 
-                processing_rule = DatasetProcessRule(
-                    mode=tmp_processing_rule["mode"],
-                    rules=json.dumps(tmp_processing_rule["rules"])
+                total_segments += estimate['total_segments']
+                tokens += estimate['tokens']
+                preview_texts.extend(estimate['preview'][:self.ESTIMATE_PREVIEW_SIZE - len(preview_texts)])
+                exact = exact and estimate['exact']
+
+        if doc_form and doc_form == 'qa_model' and preview_texts:
+            return self._qa_indexing_estimate(tenant_id, preview_texts, total_segments, embedding_model, exact)
+
+        return {
+            "total_segments": total_segments,
+            "tokens": tokens,
+            "total_price": '{:f}'.format(embedding_model.get_token_price(tokens)),
+            "currency": embedding_model.get_currency(),
+            "preview": preview_texts,
+            "exact": exact
+        }
+
+    def compute_file_indexing_estimate(self, upload_file: UploadFile, tmp_processing_rule: dict) -> dict:
+        """
+        Compute the exact estimate of an upload file under a processing rule and cache it, with the segments
+        of the file, which the indexing of the file with the same rule copies instead of splitting it again.
+        """
+        embedding_model = ModelFactory.get_embedding_model(
+            tenant_id=upload_file.tenant_id
+        )
+
+        processing_rule = DatasetProcessRule(
+            mode=tmp_processing_rule["mode"],
+            rules=json.dumps(tmp_processing_rule["rules"])
+        )
+
+        splitter = self._get_splitter(processing_rule)
+        artifact_store = ArtifactStore(upload_file.hash)
+        rule_hash = ArtifactStore.generate_rule_hash(processing_rule)
+
+        tokens = 0
+        total_segments = 0
+        preview_texts = []
+
+        def count(documents: Iterable[Document]):
+            nonlocal tokens, total_segments
+            for document in documents:
+                total_segments += 1
+                tokens += embedding_model.get_num_tokens(document.page_content)
+                if len(preview_texts) < self.ESTIMATE_PREVIEW_SIZE:
+                    preview_texts.append(document.page_content)
+
+        cached_segments = artifact_store.get_segments(rule_hash)
+        if cached_segments is not None:
+            count(cached_segments['segments'])
+        else:
+            # split the file as the indexing does, see _load_data_lazily and _iter_split_windows
+            text_docs = artifact_store.get_text_docs()
+            if text_docs is None:
+                text_docs = self._save_artifact_on_exhausted(
+                    FileExtractor.lazy_load(upload_file), lambda docs: artifact_store.save_text_docs(docs)
                 )
 
-                # get splitter
-                splitter = self._get_splitter(processing_rule)
+            word_count = 0
+            artifact_segments = []
+            for text_docs_window in self._iter_windows(text_docs, self.SPLIT_WINDOW_SIZE):
+                for text_doc in text_docs_window:
+                    text_doc.page_content = self.filter_string(text_doc.page_content)
 
-                # split to documents
-                documents = self._split_to_documents_for_estimate(
-                    text_docs=documents,
+                word_count += sum([len(text_doc.page_content) for text_doc in text_docs_window])
+                documents = self._split_to_documents(
+                    text_docs=text_docs_window,
                     splitter=splitter,
-                    processing_rule=processing_rule
+                    processing_rule=processing_rule,
+                    tenant_id=upload_file.tenant_id,
+                    document_form='text_model'
                 )
-                total_segments += len(documents)
-                for document in documents:
-                    if len(preview_texts) < 5:
-                        preview_texts.append(document.page_content)
+                count(documents)
+
+                if artifact_segments is not None:
+                    if word_count > self.MAX_ARTIFACT_LENGTH:
+                        artifact_segments = None
+                    else:
+                        artifact_segments.extend(documents)
 
-                    tokens += embedding_model.get_num_tokens(document.page_content)
+            if artifact_segments is not None:
+                artifact_store.save_segments(rule_hash, word_count, artifact_segments)
+
+        artifact_store.save_estimate(rule_hash, self._embedding_model_name(embedding_model), total_segments, tokens,
+                                     preview_texts)
+
+        return {
+            'total_segments': total_segments,
+            'tokens': tokens,
+            'preview': preview_texts
+        }
 
+    @staticmethod
+    def _embedding_model_name(embedding_model) -> str:
+        return '{}/{}'.format(embedding_model.model_provider.provider_name, embedding_model.name)
+
+    def _compute_file_indexing_estimate_later(self, upload_file: UploadFile, tmp_processing_rule: dict,
+                                              rule_hash: str, embedding_model_name: str) -> None:
+        """Compute the exact estimate of a file in the background, once for concurrent estimates of the file."""
+        lock_key = 'indexing_estimate_task:{}:{}:{}'.format(upload_file.hash, rule_hash, embedding_model_name)
+        if redis_client.set(lock_key, 1, nx=True, ex=self.ESTIMATE_TASK_LOCK_TTL):
+            compute_indexing_estimate_task.delay(upload_file.id, tmp_processing_rule)
+
+    def _estimate_sample(self, text_docs: List[Document], scale: float, splitter: TextSplitter,
+                         processing_rule: DatasetProcessRule, embedding_model) -> dict:
+        """
+        Split and count the tokens of sampled text documents, extrapolated to the whole source by scale.
+        """
+        for text_doc in text_docs:
+            # remove invalid symbol
+            text_doc.page_content = self.filter_string(text_doc.page_content)
+
+        documents = self._split_to_documents_for_estimate(
+            text_docs=text_docs,
+            splitter=splitter,
+            processing_rule=processing_rule
+        )
+
+        tokens = sum(embedding_model.get_num_tokens(document.page_content) for document in documents)
+
+        return {
+            'total_segments': round(len(documents) * scale),
+            'tokens': round(tokens * scale),
+            'preview': [document.page_content for document in documents[:self.ESTIMATE_PREVIEW_SIZE]],
+            'exact': scale == 1
+        }
+
+    def _qa_indexing_estimate(self, tenant_id: str, preview_texts: List[str], total_segments: int,
+                              embedding_model, exact: bool) -> dict:
+        """
+        Estimate the indexing of qa documents, the qa pairs of the first preview text are generated as preview.
+        """
         text_generation_model = ModelFactory.get_text_generation_model(
             tenant_id=tenant_id
         )
 
-        if doc_form and doc_form == 'qa_model':
-            if len(preview_texts) > 0:
-                # qa model document
-                response = LLMGenerator.generate_qa_document(current_user.current_tenant_id, preview_texts[0])
-                document_qa_list = self.format_split_text(response)
-                return {
-                    "total_segments": total_segments * 20,
-                    "tokens": total_segments * 2000,
-                    "total_price": '{:f}'.format(
-                        text_generation_model.get_token_price(total_segments * 2000, MessageType.HUMAN)),
-                    "currency": embedding_model.get_currency(),
-                    "qa_preview": document_qa_list,
-                    "preview": preview_texts
-                }
+        # checkpointed by content hash, the preview is generated once and reused by the indexing
+        preview_node = Document(page_content=preview_texts[0],
+                                metadata={'doc_hash': helper.generate_text_hash(preview_texts[0])})
+        qa_documents = QAGenerationEngine(tenant_id).generate([preview_node])
+
         return {
-            "total_segments": total_segments,
-            "tokens": tokens,
-            "total_price": '{:f}'.format(embedding_model.get_token_price(tokens)),
+            "total_segments": total_segments * 20,
+            "tokens": total_segments * 2000,
+            "total_price": '{:f}'.format(
+                text_generation_model.get_token_price(total_segments * 2000, MessageType.HUMAN)),
             "currency": embedding_model.get_currency(),
-            "preview": preview_texts
+            "qa_preview": [{'question': qa_document.page_content, 'answer': qa_document.metadata['answer']}
+                           for qa_document in qa_documents],
+            "preview": preview_texts,
+            "exact": exact
         }
 
-    def _load_data(self, dataset_document: DatasetDocument) -> List[Document]:
-        # load file
+    def _load_data_lazily(self, dataset_document: DatasetDocument,
+                          artifact_store: Optional[ArtifactStore] = None) -> Iterator[Document]:
+        """
+        Yield the text documents (pages, rows, sections) of the data source one by one,
+        peak memory is bounded by the loader window instead of the file size.
+        """
         if dataset_document.data_source_type not in ["upload_file", "notion_import"]:
-            return []
+            return
 
         data_source_info = dataset_document.data_source_info_dict
-        text_docs = []
+        text_docs = iter([])
         if dataset_document.data_source_type == 'upload_file':
             if not data_source_info or 'upload_file_id' not in data_source_info:
                 raise ValueError("no upload file found")
 
-            file_detail = db.session.query(UploadFile). \
-                filter(UploadFile.id == data_source_info['upload_file_id']). \
-                one_or_none()
-
-            text_docs = FileExtractor.load(file_detail)
+            text_docs = artifact_store.get_text_docs() if artifact_store else None
+            if text_docs is None:
+                file_detail = db.session.query(UploadFile). \
+                    filter(UploadFile.id == data_source_info['upload_file_id']). \
+                    one_or_none()
+
+                text_docs = FileExtractor.lazy_load(file_detail)
+                if artifact_store:
+                    text_docs = self._save_artifact_on_exhausted(
+                        text_docs, lambda docs: artifact_store.save_text_docs(docs)
+                    )
         elif dataset_document.data_source_type == 'notion_import':
             loader = NotionLoader.from_document(dataset_document)
-            text_docs = loader.load()
+            text_docs = iter(loader.load())
 
-        # update document status to splitting
+        # update document status to splitting, parsing and splitting are interleaved from now on
         self._update_document_index_status(
             document_id=dataset_document.id,
-            after_indexing_status="splitting",
-            extra_update_params={
-                DatasetDocument.word_count: sum([len(text_doc.page_content) for text_doc in text_docs]),
-                DatasetDocument.parsing_completed_at: datetime.datetime.utcnow()
-            }
+            after_indexing_status="splitting"
         )
 
-        # replace doc id to document model id
-        text_docs = cast(List[Document], text_docs)
         for text_doc in text_docs:
             # remove invalid symbol
             text_doc.page_content = self.filter_string(text_doc.page_content)
             text_doc.metadata['document_id'] = dataset_document.id
             text_doc.metadata['dataset_id'] = dataset_document.dataset_id
 
-        return text_docs
+            yield text_doc
+
+    def _get_artifact_store(self, dataset_document: DatasetDocument) -> Optional[ArtifactStore]:
+        """
+        Get the artifact store of the upload file of the document, None for other data sources.
+        """
+        if dataset_document.data_source_type != 'upload_file':
+            return None
+
+        data_source_info = dataset_document.data_source_info_dict
+        if not data_source_info or 'upload_file_id' not in data_source_info:
+            return None
+
+        file_hash = db.session.query(UploadFile.hash). \
+            filter(UploadFile.id == data_source_info['upload_file_id']). \
+            scalar()
+
+        return ArtifactStore(file_hash) if file_hash else None
+
+    def _save_artifact_on_exhausted(self, documents: Iterator[Document], save_func) -> Iterator[Document]:
+        """
+        Pass the documents through and save a copy of them once all were consumed,
+        nothing is saved when the consumer stops early, e.g. the document is paused.
+        """
+        artifact_documents = []
+        artifact_length = 0
+        for document in documents:
+            if artifact_documents is not None:
+                artifact_length += len(document.page_content)
+                if artifact_length > self.MAX_ARTIFACT_LENGTH:
+                    artifact_documents = None
+                else:
+                    artifact_documents.append(Document(page_content=document.page_content,
+                                                       metadata=dict(document.metadata)))
+
+            yield document
+
+        if artifact_documents is not None:
+            save_func(artifact_documents)
 
     def filter_string(self, text):
-        text = re.sub(r'<\|', '<', text)
-        text = re.sub(r'\|>', '>', text)
-        text = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F\x80-\xFF]', '', text)
-        return text
+        return filter_string(text)
 
     def _get_splitter(self, processing_rule: DatasetProcessRule) -> TextSplitter:
         """
@@ -446,29 +658,67 @@ class IndexingRunner:
 
         return character_splitter
 
-    def _step_split(self, text_docs: List[Document], splitter: TextSplitter,
-                    dataset: Dataset, dataset_document: DatasetDocument, processing_rule: DatasetProcessRule) \
-            -> List[Document]:
+    def _step_split_lazily(self, text_docs: Iterator[Document], splitter: TextSplitter,
+                           dataset: Dataset, dataset_document: DatasetDocument,
+                           processing_rule: DatasetProcessRule,
+                           artifact_store: Optional[ArtifactStore] = None) -> None:
         """
-        Split the text documents into documents and save them to the document segment.
-        """
-        documents = self._split_to_documents(
-            text_docs=text_docs,
-            splitter=splitter,
-            processing_rule=processing_rule,
-            tenant_id=dataset.tenant_id,
-            document_form=dataset_document.doc_form
-        )
+        Clean and split the text documents window by window, saving the segments of each window
+        before loading the next one. The segments are indexed from the database afterwards.
 
-        # save node to document segment
+        When the same file was split with the same rule before, the segments are copied from the
+        artifact store and the text documents are never loaded.
+        """
         doc_store = DatesetDocumentStore(
             dataset=dataset,
             user_id=dataset_document.created_by,
             document_id=dataset_document.id
         )
 
-        # add document segments
-        doc_store.add_documents(documents)
+        rule_hash = ArtifactStore.generate_rule_hash(processing_rule, dataset_document.doc_form)
+        # qa documents are generated by the llm, a failed generation must not be cached
+        cache_segments = artifact_store is not None and dataset_document.doc_form != 'qa_model'
+        cached_segments = artifact_store.get_segments(rule_hash) if cache_segments else None
+
+        word_count = 0
+        if cached_segments is not None:
+            text_docs.close()
+            word_count = cached_segments['word_count']
+
+            for documents in self._iter_windows(cached_segments['segments'], self.SEGMENT_BATCH_SIZE):
+                # check document is paused
+                self._check_document_paused_status(dataset_document.id)
+
+                for document in documents:
+                    document.metadata['doc_id'] = str(uuid.uuid4())
+                    document.metadata['document_id'] = dataset_document.id
+                    document.metadata['dataset_id'] = dataset_document.dataset_id
+
+                # add document segments
+                doc_store.add_documents(documents)
+        else:
+            artifact_segments = []
+            for window_word_count, documents in self._iter_split_windows(text_docs, splitter, processing_rule,
+                                                                           dataset.tenant_id, dataset_document.doc_form):
+                # check document is paused
+                self._check_document_paused_status(dataset_document.id)
+
+                word_count += window_word_count
+
+                if cache_segments and artifact_segments is not None:
+                    if word_count > self.MAX_ARTIFACT_LENGTH:
+                        artifact_segments = None
+                    else:
+                        artifact_segments.extend([
+                            Document(page_content=document.page_content, metadata=dict(document.metadata))
+                            for document in documents
+                        ])
+
+                # add document segments
+                doc_store.add_documents(documents)
+
+            if cache_segments and artifact_segments is not None:
+                artifact_store.save_segments(rule_hash, word_count, artifact_segments)
 
         # update document status to indexing
         cur_time = datetime.datetime.utcnow()
@@ -476,6 +726,8 @@ class IndexingRunner:
             document_id=dataset_document.id,
             after_indexing_status="indexing",
             extra_update_params={
+                DatasetDocument.word_count: word_count,
+                DatasetDocument.parsing_completed_at: cur_time,
                 DatasetDocument.cleaning_completed_at: cur_time,
                 DatasetDocument.splitting_completed_at: cur_time,
             }
@@ -490,7 +742,178 @@ class IndexingRunner:
             }
         )
 
-        return documents
+    def _step_split_incrementally(self, text_docs: Iterator[Document], splitter: TextSplitter,
+                                  dataset: Dataset, dataset_document: DatasetDocument,
+                                  processing_rule: DatasetProcessRule) -> None:
+        """
+        Split the updated text documents and match the nodes with the existing segments by content hash.
+        Matched segments are kept in the index and moved to the position of their node, segments without
+        a node are removed, and nodes without a segment are saved as segments in indexing status.
+        """
+        segments = db.session.query(
+            DocumentSegment.id, DocumentSegment.index_node_id, DocumentSegment.index_node_hash,
+            DocumentSegment.position, DocumentSegment.status
+        ).filter(
+            DocumentSegment.document_id == dataset_document.id
+        ).order_by(DocumentSegment.position.asc()).all()
+
+        reusable_segments = defaultdict(deque)
+        for segment in segments:
+            if segment.status == 'completed':
+                reusable_segments[segment.index_node_hash].append(segment)
+
+        kept_segment_ids = set()
+        moved_segments = []
+        new_documents = []
+        new_positions = []
+        word_count = 0
+        position = 0
+        for window_word_count, documents in self._iter_split_windows(text_docs, splitter, processing_rule,
+                                                                       dataset.tenant_id, dataset_document.doc_form):
+            # check document is paused
+            self._check_document_paused_status(dataset_document.id)
+
+            word_count += window_word_count
+
+            for document in documents:
+                position += 1
+                matched_segments = reusable_segments.get(document.metadata['doc_hash'])
+                if matched_segments:
+                    segment = matched_segments.popleft()
+                    kept_segment_ids.add(segment.id)
+                    if segment.position != position:
+                        moved_segments.append({'id': segment.id, 'position': position})
+                else:
+                    new_documents.append(document)
+                    new_positions.append(position)
+
+        # remove the segments without a node from the index and the database
+        removed_segments = [segment for segment in segments if segment.id not in kept_segment_ids]
+        if removed_segments:
+            index_node_ids = [segment.index_node_id for segment in removed_segments]
+
+            vector_index = IndexBuilder.get_index(dataset, 'high_quality')
+            if vector_index:
+                vector_index.delete_by_ids(index_node_ids)
+
+            IndexBuilder.get_index(dataset, 'economy').delete_by_ids(index_node_ids)
+
+            DocumentSegment.query.filter(
+                DocumentSegment.id.in_([segment.id for segment in removed_segments])
+            ).delete(synchronize_session=False)
+            db.session.commit()
+
+            SegmentHydrator.invalidate(index_node_ids)
+
+        if moved_segments:
+            db.session.bulk_update_mappings(DocumentSegment, moved_segments)
+            db.session.commit()
+
+        # add the new segments at the position of their node
+        doc_store = DatesetDocumentStore(
+            dataset=dataset,
+            user_id=dataset_document.created_by,
+            document_id=dataset_document.id
+        )
+        for i in range(0, len(new_documents), self.SEGMENT_BATCH_SIZE):
+            self._check_document_paused_status(dataset_document.id)
+            doc_store.add_documents(new_documents[i:i + self.SEGMENT_BATCH_SIZE],
+                                    positions=new_positions[i:i + self.SEGMENT_BATCH_SIZE])
+
+        logging.info('Incremental split of document {}: {} segments kept, {} removed, {} added'.format(
+            dataset_document.id, len(kept_segment_ids), len(removed_segments), len(new_documents)))
+
+        # update document status to indexing
+        cur_time = datetime.datetime.utcnow()
+        self._update_document_index_status(
+            document_id=dataset_document.id,
+            after_indexing_status="indexing",
+            extra_update_params={
+                DatasetDocument.word_count: word_count,
+                DatasetDocument.parsing_completed_at: cur_time,
+                DatasetDocument.cleaning_completed_at: cur_time,
+                DatasetDocument.splitting_completed_at: cur_time,
+            }
+        )
+
+        # update status of the new segments to indexing, kept segments stay completed
+        DocumentSegment.query.filter(
+            DocumentSegment.document_id == dataset_document.id,
+            DocumentSegment.status == 'waiting'
+        ).update({
+            DocumentSegment.status: "indexing",
+            DocumentSegment.indexing_at: datetime.datetime.utcnow()
+        })
+        db.session.commit()
+
+    def _iter_segment_documents(self, dataset_document: DatasetDocument, status: str = 'indexing') \
+            -> Iterator[Document]:
+        """
+        Yield the segments of the document as nodes, fetched in batches keyed by position.
+        """
+        last_position = None
+        while True:
+            query = DocumentSegment.query.filter(
+                DocumentSegment.document_id == dataset_document.id,
+                DocumentSegment.status == status
+            )
+            if last_position is not None:
+                query = query.filter(DocumentSegment.position > last_position)
+
+            segments = query.order_by(DocumentSegment.position.asc()).limit(self.SEGMENT_BATCH_SIZE).all()
+            if not segments:
+                break
+
+            for segment in segments:
+                yield Document(
+                    page_content=segment.content,
+                    metadata={
+                        "doc_id": segment.index_node_id,
+                        "doc_hash": segment.index_node_hash,
+                        "document_id": segment.document_id,
+                        "dataset_id": segment.dataset_id,
+                    }
+                )
+
+            last_position = segments[-1].position
+
+    @staticmethod
+    def _iter_windows(items: Iterable, window_size: int) -> Iterator[list]:
+        iterator = iter(items)
+        while True:
+            window = list(itertools.islice(iterator, window_size))
+            if not window:
+                break
+
+            yield window
+
+    def _iter_split_windows(self, text_docs: Iterator[Document], splitter: TextSplitter,
+                            processing_rule: DatasetProcessRule, tenant_id: str, document_form: str) \
+            -> Iterator[Tuple[int, List[Document]]]:
+        """
+        Clean and split the text documents window by window, in the indexing process pool when it is enabled.
+
+        :return: word count of each window and its nodes
+        """
+        text_docs_windows = self._iter_windows(text_docs, self.SPLIT_WINDOW_SIZE)
+
+        # qa documents are generated by the llm within the app context
+        indexing_process_pool = IndexingProcessPool.get() if document_form != 'qa_model' else None
+        if indexing_process_pool:
+            yield from indexing_process_pool.split_windows(text_docs_windows, processing_rule)
+            return
+
+        for text_docs_window in text_docs_windows:
+            word_count = sum([len(text_doc.page_content) for text_doc in text_docs_window])
+            documents = self._split_to_documents(
+                text_docs=text_docs_window,
+                splitter=splitter,
+                processing_rule=processing_rule,
+                tenant_id=tenant_id,
+                document_form=document_form
+            )
+
+            yield word_count, documents
 
     def _split_to_documents(self, text_docs: List[Document], splitter: TextSplitter,
                             processing_rule: DatasetProcessRule, tenant_id: str, document_form: str) -> List[Document]:
@@ -498,7 +921,6 @@ class IndexingRunner:
         Split the text documents into nodes.
         """
         all_documents = []
-        all_qa_documents = []
         for text_doc in text_docs:
             # document clean
             document_text = self._document_clean(text_doc.page_content, processing_rule)
@@ -517,43 +939,9 @@ class IndexingRunner:
             all_documents.extend(split_documents)
         # processing qa document
         if document_form == 'qa_model':
-            for i in range(0, len(all_documents), 10):
-                threads = []
-                sub_documents = all_documents[i:i + 10]
-                for doc in sub_documents:
-                    document_format_thread = threading.Thread(target=self.format_qa_document, kwargs={
-                        'tenant_id': tenant_id, 'document_node': doc, 'all_qa_documents': all_qa_documents})
-                    threads.append(document_format_thread)
-                    document_format_thread.start()
-                for thread in threads:
-                    thread.join()
-            return all_qa_documents
+            return QAGenerationEngine(tenant_id).generate(all_documents)
         return all_documents
 
-    def format_qa_document(self, tenant_id: str, document_node, all_qa_documents):
-        format_documents = []
-        if document_node.page_content is None or not document_node.page_content.strip():
-            return
-        try:
-            # qa model document
-            response = LLMGenerator.generate_qa_document(tenant_id, document_node.page_content)
-            document_qa_list = self.format_split_text(response)
-            qa_documents = []
-            for result in document_qa_list:
-                qa_document = Document(page_content=result['question'], metadata=document_node.metadata.copy())
-                doc_id = str(uuid.uuid4())
-                hash = helper.generate_text_hash(result['question'])
-                qa_document.metadata['answer'] = result['answer']
-                qa_document.metadata['doc_id'] = doc_id
-                qa_document.metadata['doc_hash'] = hash
-                qa_documents.append(qa_document)
-            format_documents.extend(qa_documents)
-        except Exception as e:
-            logging.exception(e)
-
-        all_qa_documents.extend(format_documents)
-
-
     def _split_to_documents_for_estimate(self, text_docs: List[Document], splitter: TextSplitter,
                                          processing_rule: DatasetProcessRule) -> List[Document]:
         """
@@ -588,49 +976,14 @@ class IndexingRunner:
         """
         Clean the document text according to the processing rules.
         """
-        if processing_rule.mode == "automatic":
-            rules = DatasetProcessRule.AUTOMATIC_RULES
-        else:
-            rules = json.loads(processing_rule.rules) if processing_rule.rules else {}
-
-        if 'pre_processing_rules' in rules:
-            pre_processing_rules = rules["pre_processing_rules"]
-            for pre_processing_rule in pre_processing_rules:
-                if pre_processing_rule["id"] == "remove_extra_spaces" and pre_processing_rule["enabled"] is True:
-                    # Remove extra spaces
-                    pattern = r'\n{3,}'
-                    text = re.sub(pattern, '\n\n', text)
-                    pattern = r'[\t\f\r\x20\u00a0\u1680\u180e\u2000-\u200a\u202f\u205f\u3000]{2,}'
-                    text = re.sub(pattern, ' ', text)
-                elif pre_processing_rule["id"] == "remove_urls_emails" and pre_processing_rule["enabled"] is True:
-                    # Remove email
-                    pattern = r'([a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+)'
-                    text = re.sub(pattern, '', text)
-
-                    # Remove URL
-                    pattern = r'https?://[^\s]+'
-                    text = re.sub(pattern, '', text)
-
-        return text
-
-    def format_split_text(self, text):
-        regex = r"Q\d+:\s*(.*?)\s*A\d+:\s*([\s\S]*?)(?=Q|$)"  # 匹配Q和A的正则表达式
-        matches = re.findall(regex, text, re.MULTILINE)  # 获取所有匹配到的结果
-
-        result = []  # 存储最终的结果
-        for match in matches:
-            q = match[0]
-            a = match[1]
-            if q and a:
-                # 如果Q和A都存在，就将其添加到结果中
-                result.append({
-                    "question": q,
-                    "answer": re.sub(r"\n\s*", "\n", a.strip())
-                })
+        # the cleaner of a processing rule is compiled once, texts are cleaned window by window
+        cache_key = (processing_rule.mode, processing_rule.rules)
+        if cache_key not in self._text_cleaners:
+            self._text_cleaners[cache_key] = TextCleaner.from_processing_rule(processing_rule)
 
-        return result
+        return self._text_cleaners[cache_key].clean(text)
 
-    def _build_index(self, dataset: Dataset, dataset_document: DatasetDocument, documents: List[Document]) -> None:
+    def _build_index(self, dataset: Dataset, dataset_document: DatasetDocument, documents: Iterable[Document]) -> None:
         """
         Build the index for the document.
         """
@@ -645,10 +998,17 @@ class IndexingRunner:
         indexing_start_at = time.perf_counter()
         tokens = 0
         chunk_size = 100
-        for i in range(0, len(documents), chunk_size):
+        projection_sample_documents = []
+        completed_segments, total_segments = IndexingProgress.get_segment_counts([dataset_document.id])[
+            dataset_document.id]
+        for chunk_documents in self._iter_windows(documents, chunk_size):
             # check document is paused
             self._check_document_paused_status(dataset_document.id)
-            chunk_documents = documents[i:i + chunk_size]
+
+            if len(projection_sample_documents) < EmbeddingProjection.SAMPLE_SIZE:
+                projection_sample_documents.extend(
+                    chunk_documents[:EmbeddingProjection.SAMPLE_SIZE - len(projection_sample_documents)]
+                )
 
             tokens += sum(
                 embedding_model.get_num_tokens(document.page_content)
@@ -663,7 +1023,7 @@ class IndexingRunner:
             keyword_table_index.add_texts(chunk_documents)
 
             document_ids = [document.metadata['doc_id'] for document in chunk_documents]
-            db.session.query(DocumentSegment).filter(
+            completed_segments += db.session.query(DocumentSegment).filter(
                 DocumentSegment.document_id == dataset_document.id,
                 DocumentSegment.index_node_id.in_(document_ids),
                 DocumentSegment.status == "indexing"
@@ -673,9 +1033,14 @@ class IndexingRunner:
             })
 
             db.session.commit()
+            IndexingProgress.publish(dataset_document.dataset_id, dataset_document.id, 'indexing',
+                                     completed_segments, total_segments)
 
         indexing_end_at = time.perf_counter()
 
+        if vector_index:
+            self._fit_projection_basis(dataset, embedding_model, projection_sample_documents)
+
         # update document status to completed
         self._update_document_index_status(
             document_id=dataset_document.id,
@@ -687,6 +1052,25 @@ class IndexingRunner:
             }
         )
 
+    def _fit_projection_basis(self, dataset: Dataset, embedding_model, documents: List[Document]) -> None:
+        """
+        Fit the 2-D projection basis used by hit testing on a sample of the embeddings just indexed.
+        """
+        if not documents:
+            return
+
+        try:
+            step = max(len(documents) // EmbeddingProjection.SAMPLE_SIZE, 1)
+            sample_documents = documents[::step][:EmbeddingProjection.SAMPLE_SIZE]
+
+            # embeddings were just cached by indexing, no provider call here
+            embeddings = CacheEmbedding(embedding_model)
+            sample_embeddings = embeddings.embed_documents([document.page_content for document in sample_documents])
+
+            EmbeddingProjection(dataset.id).fit(sample_embeddings)
+        except Exception:
+            logging.exception("fit projection basis failed")
+
     def _check_document_paused_status(self, document_id: str):
         indexing_cache_key = 'document_{}_is_paused'.format(document_id)
         result = redis_client.get(indexing_cache_key)
@@ -710,8 +1094,17 @@ class IndexingRunner:
             update_params.update(extra_update_params)
 
         DatasetDocument.query.filter_by(id=document_id).update(update_params)
+        DatasetDocument.update_counters(document_id)
+        dataset_id = db.session.query(DatasetDocument.dataset_id).filter(DatasetDocument.id == document_id).scalar()
+        if dataset_id:
+            Dataset.update_counters(dataset_id)
         db.session.commit()
 
+        if dataset_id:
+            completed_segments, total_segments = IndexingProgress.get_segment_counts([document_id])[document_id]
+            IndexingProgress.publish(dataset_id, document_id, after_indexing_status,
+                                     completed_segments, total_segments)
+
     def _update_segments_by_document(self, dataset_document_id: str, update_params: dict) -> None:
         """
         Update the document segment by document id.
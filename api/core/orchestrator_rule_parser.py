@@ -1,6 +1,7 @@
 import math
 from typing import Optional
 
+from flask import current_app
 from langchain import WikipediaAPIWrapper
 from langchain.callbacks.manager import Callbacks
 from langchain.memory.chat_memory import BaseChatMemory
@@ -191,13 +192,16 @@ class OrchestratorRuleParser:
         if not dataset:
             return None
 
-        if dataset and dataset.available_document_count == 0 and dataset.available_document_count == 0:
+        if dataset.available_document_count == 0 or dataset.available_segment_count == 0:
             return None
 
         k = self._dynamic_calc_retrieve_k(dataset, rest_tokens)
         tool = DatasetRetrieverTool.from_dataset(
             dataset=dataset,
             k=k,
+            hybrid_search=current_app.config.get('HYBRID_SEARCH_ENABLED', False),
+            vector_weight=current_app.config.get('HYBRID_SEARCH_VECTOR_WEIGHT', 0.7),
+            keyword_weight=current_app.config.get('HYBRID_SEARCH_KEYWORD_WEIGHT', 0.3),
             callbacks=[DatasetToolCallbackHandler(conversation_message_task)]
         )
 
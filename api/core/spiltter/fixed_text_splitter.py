@@ -5,6 +5,10 @@ from typing import (
     Any,
     List,
     Optional,
+    AbstractSet,
+    Collection,
+    Literal,
+    Union,
 )
 
 from langchain.text_splitter import RecursiveCharacterTextSplitter
@@ -17,6 +21,37 @@ class FixedRecursiveCharacterTextSplitter(RecursiveCharacterTextSplitter):
         self._fixed_separator = fixed_separator
         self._separators = separators or ["\n\n", "\n", " ", ""]
 
+        # every distinct piece of the text being split is measured once
+        self._uncached_length_function = self._length_function
+        self._length_function = self._cached_length
+        self._length_cache = {}
+
+    @classmethod
+    def from_tiktoken_encoder(
+            cls,
+            encoding_name: str = "gpt2",
+            model_name: Optional[str] = None,
+            allowed_special: Union[Literal["all"], AbstractSet[str]] = set(),
+            disallowed_special: Union[Literal["all"], Collection[str]] = "all",
+            **kwargs: Any,
+    ) -> FixedRecursiveCharacterTextSplitter:
+        """Text splitter that uses tiktoken encoder to count length, each distinct piece is encoded once."""
+        import tiktoken
+
+        if model_name is not None:
+            enc = tiktoken.encoding_for_model(model_name)
+        else:
+            enc = tiktoken.get_encoding(encoding_name)
+
+        def _tiktoken_encoder(text: str) -> int:
+            return len(enc.encode(
+                text,
+                allowed_special=allowed_special,
+                disallowed_special=disallowed_special,
+            ))
+
+        return cls(length_function=_tiktoken_encoder, **kwargs)
+
     def split_text(self, text: str) -> List[str]:
         """Split incoming text and return chunks."""
         if self._fixed_separator:
@@ -24,14 +59,17 @@ class FixedRecursiveCharacterTextSplitter(RecursiveCharacterTextSplitter):
         else:
             chunks = list(text)
 
-        final_chunks = []
-        for chunk in chunks:
-            if self._length_function(chunk) > self._chunk_size:
-                final_chunks.extend(self.recursive_split_text(chunk))
-            else:
-                final_chunks.append(chunk)
+        try:
+            final_chunks = []
+            for chunk in chunks:
+                if self._length_function(chunk) > self._chunk_size:
+                    final_chunks.extend(self.recursive_split_text(chunk))
+                else:
+                    final_chunks.append(chunk)
 
-        return final_chunks
+            return final_chunks
+        finally:
+            self._length_cache = {}
 
     def recursive_split_text(self, text: str) -> List[str]:
         """Split incoming text and return chunks."""
@@ -66,3 +104,11 @@ class FixedRecursiveCharacterTextSplitter(RecursiveCharacterTextSplitter):
             merged_text = self._merge_splits(_good_splits, separator)
             final_chunks.extend(merged_text)
         return final_chunks
+
+    def _cached_length(self, text: str) -> int:
+        length = self._length_cache.get(text)
+        if length is None:
+            length = self._uncached_length_function(text)
+            self._length_cache[text] = length
+
+        return length
@@ -0,0 +1,68 @@
+import json
+import re
+from typing import List, Callable
+
+from models.dataset import DatasetProcessRule
+
+INVALID_SYMBOLS_PATTERN = re.compile(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F\x80-\xFF]')
+EXTRA_NEWLINES_PATTERN = re.compile(r'\n{3,}')
+EXTRA_SPACES_PATTERN = re.compile(r'[\t\f\r\x20\u00a0\u1680\u180e\u2000-\u200a\u202f\u205f\u3000]{2,}')
+EMAIL_PATTERN = re.compile(r'([a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+)')
+URL_PATTERN = re.compile(r'https?://[^\s]+')
+
+
+def filter_string(text: str) -> str:
+    """Remove invalid symbols of a text."""
+    if '<|' in text:
+        text = text.replace('<|', '<')
+    if '|>' in text:
+        text = text.replace('|>', '>')
+
+    return INVALID_SYMBOLS_PATTERN.sub('', text)
+
+
+def _remove_extra_newlines(text: str) -> str:
+    return EXTRA_NEWLINES_PATTERN.sub('\n\n', text) if '\n\n\n' in text else text
+
+
+def _remove_extra_spaces(text: str) -> str:
+    return EXTRA_SPACES_PATTERN.sub(' ', text)
+
+
+def _remove_emails(text: str) -> str:
+    return EMAIL_PATTERN.sub('', text) if '@' in text else text
+
+
+def _remove_urls(text: str) -> str:
+    return URL_PATTERN.sub('', text) if '://' in text else text
+
+
+class TextCleaner:
+    """
+    The pre-processing rules of a processing rule, parsed once and applied to every text with precompiled
+    patterns. A pattern is skipped when a substring check shows that it cannot match.
+    """
+
+    def __init__(self, pre_processing_rules: List[dict]):
+        self._steps: List[Callable[[str], str]] = []
+        for pre_processing_rule in pre_processing_rules:
+            if pre_processing_rule["id"] == "remove_extra_spaces" and pre_processing_rule["enabled"] is True:
+                self._steps.extend([_remove_extra_newlines, _remove_extra_spaces])
+            elif pre_processing_rule["id"] == "remove_urls_emails" and pre_processing_rule["enabled"] is True:
+                # emails go first, so the scheme of an url like http://a@b.co is kept as before
+                self._steps.extend([_remove_emails, _remove_urls])
+
+    @classmethod
+    def from_processing_rule(cls, processing_rule: DatasetProcessRule) -> 'TextCleaner':
+        if processing_rule.mode == "automatic":
+            rules = DatasetProcessRule.AUTOMATIC_RULES
+        else:
+            rules = json.loads(processing_rule.rules) if processing_rule.rules else {}
+
+        return cls(rules.get('pre_processing_rules', []))
+
+    def clean(self, text: str) -> str:
+        for step in self._steps:
+            text = step(text)
+
+        return text
@@ -1,17 +1,26 @@
+import logging
 import re
-from typing import Type
+import threading
+from collections import defaultdict
+from typing import Type, List
 
-from flask import current_app
+from flask import current_app, Flask
+from langchain.schema import Document
 from langchain.tools import BaseTool
 from pydantic import Field, BaseModel
 
 from core.callback_handler.index_tool_callback_handler import DatasetIndexToolCallbackHandler
+from core.docstore.segment_hydrator import SegmentHydrator
 from core.embedding.cached_embedding import CacheEmbedding
 from core.index.keyword_table_index.keyword_table_index import KeywordTableIndex, KeywordTableConfig
+from core.index.vector_index.base import VectorSearchFilter
 from core.index.vector_index.vector_index import VectorIndex
 from core.model_providers.model_factory import ModelFactory
 from extensions.ext_database import db
-from models.dataset import Dataset, DocumentSegment
+from models.dataset import Dataset
+
+# smoothing constant of reciprocal rank fusion, keeps the top ranks from dominating
+RRF_RANK_CONSTANT = 60
 
 
 class DatasetRetrieverToolInput(BaseModel):
@@ -28,6 +37,9 @@ class DatasetRetrieverTool(BaseTool):
     tenant_id: str
     dataset_id: str
     k: int = 3
+    hybrid_search: bool = False
+    vector_weight: float = 0.7
+    keyword_weight: float = 0.3
 
     @classmethod
     def from_dataset(cls, dataset: Dataset, **kwargs):
@@ -70,26 +82,11 @@ class DatasetRetrieverTool(BaseTool):
             documents = kw_table_index.search(query, search_kwargs={'k': self.k})
             return str("\n".join([document.page_content for document in documents]))
         else:
-            embedding_model = ModelFactory.get_embedding_model(
-                tenant_id=dataset.tenant_id
-            )
-
-            embeddings = CacheEmbedding(embedding_model)
-
-            vector_index = VectorIndex(
-                dataset=dataset,
-                config=current_app.config,
-                embeddings=embeddings
-            )
-
             if self.k > 0:
-                documents = vector_index.search(
-                    query,
-                    search_type='similarity',
-                    search_kwargs={
-                        'k': self.k
-                    }
-                )
+                if self.hybrid_search:
+                    documents = self._hybrid_search(dataset, query)
+                else:
+                    documents = self._vector_search(dataset, query)
             else:
                 documents = []
 
@@ -97,24 +94,88 @@ class DatasetRetrieverTool(BaseTool):
             hit_callback.on_tool_end(documents)
             document_context_list = []
             index_node_ids = [document.metadata['doc_id'] for document in documents]
-            segments = DocumentSegment.query.filter(DocumentSegment.completed_at.isnot(None),
-                                                    DocumentSegment.status == 'completed',
-                                                    DocumentSegment.enabled == True,
-                                                    DocumentSegment.index_node_id.in_(index_node_ids)
-                                                    ).all()
-
-            if segments:
-                index_node_id_to_position = {id: position for position, id in enumerate(index_node_ids)}
-                sorted_segments = sorted(segments,
-                                         key=lambda segment: index_node_id_to_position.get(segment.index_node_id,
-                                                                                           float('inf')))
-                for segment in sorted_segments:
-                    if segment.answer:
-                        document_context_list.append(f'question:{segment.content} \nanswer:{segment.answer}')
-                    else:
-                        document_context_list.append(segment.content)
+            for document in SegmentHydrator(dataset.id).get_documents(index_node_ids):
+                if document.metadata.get('answer'):
+                    document_context_list.append(f'question:{document.page_content} \nanswer:{document.metadata["answer"]}')
+                else:
+                    document_context_list.append(document.page_content)
 
             return str("\n".join(document_context_list))
 
+    def _vector_search(self, dataset: Dataset, query: str) -> List[Document]:
+        embedding_model = ModelFactory.get_embedding_model(
+            tenant_id=dataset.tenant_id
+        )
+
+        embeddings = CacheEmbedding(embedding_model)
+
+        vector_index = VectorIndex(
+            dataset=dataset,
+            config=current_app.config,
+            embeddings=embeddings
+        )
+
+        return vector_index.search(
+            query,
+            search_type='similarity',
+            search_kwargs={
+                'k': self.k
+            },
+            metadata_filter=VectorSearchFilter.available_documents(dataset.id)
+        )
+
+    def _hybrid_search(self, dataset: Dataset, query: str) -> List[Document]:
+        """
+        Query the vector index and the keyword table concurrently, then fuse both rankings.
+        Both indexes are always built for high_quality datasets, see IndexingRunner._build_index.
+        """
+        keyword_documents = []
+        keyword_search_thread = threading.Thread(target=self._keyword_search_worker, kwargs={
+            'flask_app': current_app._get_current_object(),
+            'dataset_id': dataset.id,
+            'query': query,
+            'documents': keyword_documents
+        })
+        keyword_search_thread.start()
+
+        try:
+            vector_documents = self._vector_search(dataset, query)
+        finally:
+            keyword_search_thread.join()
+
+        return self._fuse_documents(vector_documents, keyword_documents)
+
+    def _keyword_search_worker(self, flask_app: Flask, dataset_id: str, query: str, documents: List[Document]):
+        with flask_app.app_context():
+            try:
+                dataset = db.session.query(Dataset).filter(Dataset.id == dataset_id).first()
+                if not dataset:
+                    return
+
+                kw_table_index = KeywordTableIndex(
+                    dataset=dataset,
+                    config=KeywordTableConfig(
+                        max_keywords_per_chunk=5
+                    )
+                )
+
+                documents.extend(kw_table_index.search(query, search_kwargs={'k': self.k}))
+            except Exception:
+                logging.exception("keyword search failed in hybrid search")
+
+    def _fuse_documents(self, vector_documents: List[Document], keyword_documents: List[Document]) -> List[Document]:
+        """Weighted reciprocal rank fusion of the vector and keyword rankings, top k kept."""
+        scores = defaultdict(float)
+        documents = {}
+        for weight, ranked_documents in ((self.vector_weight, vector_documents),
+                                         (self.keyword_weight, keyword_documents)):
+            for rank, document in enumerate(ranked_documents):
+                doc_id = document.metadata['doc_id']
+                scores[doc_id] += weight / (RRF_RANK_CONSTANT + rank + 1)
+                documents.setdefault(doc_id, document)
+
+        sorted_doc_ids = sorted(scores.keys(), key=lambda doc_id: scores[doc_id], reverse=True)
+        return [documents[doc_id] for doc_id in sorted_doc_ids[:self.k]]
+
     async def _arun(self, tool_input: str) -> str:
         raise NotImplementedError()
@@ -1,7 +1,8 @@
-from typing import cast, Any
+from typing import cast, Any, List, Optional, Tuple
 
 from langchain.schema import Document
 from langchain.vectorstores import Qdrant
+from qdrant_client.conversions import common_types
 from qdrant_client.http.models import Filter, PointIdsList, FilterSelector
 from qdrant_client.local.qdrant_local import QdrantLocal
 
@@ -45,6 +46,61 @@ class QdrantVectorStore(Qdrant):
 
         self.client.delete_collection(collection_name=self.collection_name)
 
+    def similarity_search_with_score_by_vector(
+            self,
+            embedding: List[float],
+            k: int = 4,
+            filter: Optional[Filter] = None,
+            search_params: Optional[common_types.SearchParams] = None,
+            offset: int = 0,
+            score_threshold: Optional[float] = None,
+            consistency: Optional[common_types.ReadConsistency] = None,
+            with_vectors: bool = False,
+            **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        """
+        Same as Qdrant.similarity_search_with_score_by_vector,
+        but can also return the stored vectors of the hits in metadata['vector'].
+        """
+        if filter is not None and isinstance(filter, dict):
+            filter = self._qdrant_filter_from_dict(filter)
+
+        query_vector = embedding
+        if self.vector_name is not None:
+            query_vector = (self.vector_name, embedding)
+
+        results = self.client.search(
+            collection_name=self.collection_name,
+            query_vector=query_vector,
+            query_filter=filter,
+            search_params=search_params,
+            limit=k,
+            offset=offset,
+            with_payload=True,
+            with_vectors=with_vectors,
+            score_threshold=score_threshold,
+            consistency=consistency,
+            **kwargs,
+        )
+
+        docs_and_scores = []
+        for result in results:
+            document = self._document_from_scored_point(
+                result, self.content_payload_key, self.metadata_payload_key
+            )
+
+            if with_vectors:
+                vector = result.vector
+                if isinstance(vector, dict):
+                    vector = vector.get(self.vector_name)
+
+                # metadata may be the stored payload itself in local mode, do not write into it
+                document.metadata = {**document.metadata, 'vector': vector}
+
+            docs_and_scores.append((document, result.score))
+
+        return docs_and_scores
+
     @classmethod
     def _document_from_scored_point(
             cls,
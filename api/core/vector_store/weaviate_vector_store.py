@@ -1,7 +1,55 @@
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from langchain.schema import Document
 from langchain.vectorstores import Weaviate
 
 
 class WeaviateVectorStore(Weaviate):
+    def similarity_search_with_score(
+            self, query: str, k: int = 4, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """
+        Same as Weaviate.similarity_search_with_score, but applies `where_filter`
+        and moves the queried _additional{vector} to metadata['vector'] when `with_vectors` is set.
+        """
+        if self._embedding is None:
+            raise ValueError(
+                "_embedding cannot be None for similarity_search_with_score"
+            )
+
+        with_vectors = kwargs.get('with_vectors', False)
+
+        query_obj = self._client.query.get(self._index_name, self._query_attrs)
+        if kwargs.get("where_filter"):
+            query_obj = query_obj.with_where(kwargs.get("where_filter"))
+
+        embedded_query = self._embedding.embed_query(query)
+        if not self._by_text:
+            query_obj = query_obj.with_near_vector({"vector": embedded_query})
+        else:
+            content: Dict[str, Any] = {"concepts": [query]}
+            if kwargs.get("search_distance"):
+                content["certainty"] = kwargs.get("search_distance")
+            query_obj = query_obj.with_near_text(content)
+
+        result = query_obj.with_limit(k).with_additional("vector").do()
+
+        if "errors" in result:
+            raise ValueError(f"Error during query: {result['errors']}")
+
+        docs_and_scores = []
+        for res in result["data"]["Get"][self._index_name]:
+            text = res.pop(self._text_key)
+            additional = res.pop("_additional")
+            score = np.dot(additional["vector"], embedded_query)
+            if with_vectors:
+                res['vector'] = additional["vector"]
+
+            docs_and_scores.append((Document(page_content=text, metadata=res), score))
+
+        return docs_and_scores
+
     def del_texts(self, where_filter: dict):
         if not where_filter:
             raise ValueError('where_filter must not be empty')
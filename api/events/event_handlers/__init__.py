@@ -6,3 +6,5 @@ from .update_app_dataset_join_when_app_model_config_updated import handle
 from .generate_conversation_name_when_first_message_created import handle
 from .generate_conversation_summary_when_few_message_created import handle
 from .create_document_index import handle
+from .rollup_app_statistics_when_message_created import handle
+from .add_message_to_search_index_when_message_created import handle
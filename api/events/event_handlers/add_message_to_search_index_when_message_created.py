@@ -0,0 +1,8 @@
+from events.message_event import message_was_created
+from tasks.add_message_to_search_index_task import add_message_to_search_index_task
+
+
+@message_was_created.connect
+def handle(sender, **kwargs):
+    message = sender
+    add_message_to_search_index_task.delay(message.id)
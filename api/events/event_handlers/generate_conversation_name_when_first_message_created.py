@@ -1,8 +1,6 @@
-import logging
-
-from core.generator.llm_generator import LLMGenerator
 from events.message_event import message_was_created
 from extensions.ext_database import db
+from services.conversation_generation_service import ConversationGenerationService
 
 
 @message_was_created.connect
@@ -13,16 +11,9 @@ def handle(sender, **kwargs):
 
     if is_first_message:
         if conversation.mode == 'chat':
-            app_model = conversation.app
-            if not app_model:
-                return
-
-            # generate conversation name
-            try:
-                name = LLMGenerator.generate_conversation_name(app_model.tenant_id, message.query, message.answer)
-                conversation.name = name
-            except:
-                conversation.name = 'New Chat'
-
+            # named by the first query until the batch task generates its name
+            conversation.name = ConversationGenerationService.placeholder_name(message.query)
             db.session.add(conversation)
             db.session.commit()
+
+            ConversationGenerationService.queue(ConversationGenerationService.NAME, conversation.id)
@@ -0,0 +1,14 @@
+from events.message_event import message_was_created
+from extensions.ext_redis import redis_client
+from services.app_statistic_service import AppStatisticService
+from tasks.rollup_app_statistics_task import rollup_app_statistics_task
+
+
+@message_was_created.connect
+def handle(sender, **kwargs):
+    message = sender
+
+    # at most one rollup task of the app per interval
+    rollup_cache_key = 'app_statistics_rollup_{}'.format(message.app_id)
+    if redis_client.set(rollup_cache_key, 1, ex=AppStatisticService.ROLLUP_INTERVAL, nx=True):
+        rollup_app_statistics_task.delay(message.app_id)
@@ -1,6 +1,6 @@
 from events.app_event import app_model_config_was_updated
 from extensions.ext_database import db
-from models.dataset import AppDatasetJoin
+from models.dataset import AppDatasetJoin, Dataset
 from models.model import AppModelConfig
 
 
@@ -41,6 +41,9 @@ def handle(sender, **kwargs):
             )
             db.session.add(app_dataset_join)
 
+    for dataset_id in set(removed_dataset_ids) | set(added_dataset_ids):
+        Dataset.update_counters(dataset_id)
+
     db.session.commit()
 
 
@@ -0,0 +1,84 @@
+# -*- coding:utf-8 -*-
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Sequence
+
+from sqlalchemy import tuple_, DateTime
+from sqlalchemy.orm import Query
+
+from extensions.ext_database import db
+
+
+class CursorPagination:
+    def __init__(self, data, limit, has_more, next_cursor, total=None):
+        self.data = data
+        self.limit = limit
+        self.has_more = has_more
+        self.next_cursor = next_cursor
+        self.total = total
+
+
+def encode_cursor(values: Sequence) -> str:
+    """Encode the sort key of the last item of a page into an opaque cursor."""
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+def decode_cursor(cursor: str, columns: Sequence) -> list:
+    """Decode a cursor into the values of the sort columns, raising ValueError if it is invalid."""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise ValueError()
+
+        return [datetime.fromisoformat(value) if isinstance(column.type, DateTime) else value
+                for column, value in zip(columns, values)]
+    except (ValueError, TypeError):
+        raise ValueError('Invalid cursor.')
+
+
+def filter_after(query, columns: Sequence, values: Sequence, descending: bool = True):
+    """Filter the rows after a sort key, as a row comparison which an index on the columns serves."""
+    if descending:
+        return query.where(tuple_(*columns) < tuple_(*values))
+
+    return query.where(tuple_(*columns) > tuple_(*values))
+
+
+def paginate_by_cursor(query, columns: Sequence, cursor: Optional[str], limit: int,
+                       descending: bool = True) -> CursorPagination:
+    """
+    Fetch a page of a query of entities ordered by columns, which end with a unique column, e.g.
+    (created_at, id). The page after the cursor is selected with a row comparison instead of an OFFSET,
+    one more row is fetched to tell whether there are more pages, and nothing is counted.
+    """
+    if cursor:
+        query = filter_after(query, columns, decode_cursor(cursor, columns), descending)
+
+    query = query.order_by(*[column.desc() if descending else column.asc() for column in columns]) \
+        .limit(limit + 1)
+
+    if isinstance(query, Query):
+        items = query.all()
+    else:
+        items = db.session.scalars(query).unique().all()
+
+    has_more = len(items) > limit
+    items = items[:limit]
+    next_cursor = encode_cursor([getattr(items[-1], column.key) for column in columns]) if has_more else None
+
+    return CursorPagination(data=items, limit=limit, has_more=has_more, next_cursor=next_cursor)
+
+
+def estimate_count(query) -> int:
+    """The row count the query planner estimates for a query, without running it."""
+    statement = query.statement if isinstance(query, Query) else query
+    connection = db.session.connection()
+    # IN lists are rendered as one bound parameter per value, the driver does not expand them
+    compiled = statement.compile(dialect=connection.dialect, compile_kwargs={'render_postcompile': True})
+    plan = connection.exec_driver_sql('EXPLAIN (FORMAT JSON) {}'.format(compiled), compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    return int(plan[0]['Plan']['Plan Rows'])
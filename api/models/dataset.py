@@ -3,7 +3,7 @@ import pickle
 from json import JSONDecodeError
 
 from sqlalchemy import func
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
 
 from extensions.ext_database import db
 from models.account import Account
@@ -37,6 +37,13 @@ class Dataset(db.Model):
     updated_at = db.Column(db.DateTime, nullable=False,
                            server_default=db.text('CURRENT_TIMESTAMP(0)'))
 
+    # counters, maintained by update_counters
+    app_count = db.Column(db.Integer, nullable=False, server_default=db.text('0'))
+    document_count = db.Column(db.Integer, nullable=False, server_default=db.text('0'))
+    available_document_count = db.Column(db.Integer, nullable=False, server_default=db.text('0'))
+    available_segment_count = db.Column(db.Integer, nullable=False, server_default=db.text('0'))
+    word_count = db.Column(db.Integer, nullable=False, server_default=db.text('0'))
+
     @property
     def dataset_keyword_table(self):
         dataset_keyword_table = db.session.query(DatasetKeywordTable).filter(
@@ -59,35 +66,31 @@ class Dataset(db.Model):
         return DatasetProcessRule.query.filter(DatasetProcessRule.dataset_id == self.id) \
             .order_by(DatasetProcessRule.created_at.desc()).first()
 
-    @property
-    def app_count(self):
-        return db.session.query(func.count(AppDatasetJoin.id)).filter(AppDatasetJoin.dataset_id == self.id).scalar()
-
-    @property
-    def document_count(self):
-        return db.session.query(func.count(Document.id)).filter(Document.dataset_id == self.id).scalar()
-
-    @property
-    def available_document_count(self):
-        return db.session.query(func.count(Document.id)).filter(
-            Document.dataset_id == self.id,
-            Document.indexing_status == 'completed',
-            Document.enabled == True,
-            Document.archived == False
-        ).scalar()
-
-    @property
-    def available_segment_count(self):
-        return db.session.query(func.count(DocumentSegment.id)).filter(
-            DocumentSegment.dataset_id == self.id,
-            DocumentSegment.status == 'completed',
-            DocumentSegment.enabled == True
-        ).scalar()
-
-    @property
-    def word_count(self):
-        return Document.query.with_entities(func.coalesce(func.sum(Document.word_count))) \
-            .filter(Document.dataset_id == self.id).scalar()
+    @classmethod
+    def update_counters(cls, dataset_id: str) -> None:
+        """Recount the counters of a dataset in one statement, committed with the change which affected them."""
+        db.session.query(Dataset).filter(Dataset.id == dataset_id).update({
+            Dataset.app_count: db.select(func.count(AppDatasetJoin.id)).where(
+                AppDatasetJoin.dataset_id == Dataset.id
+            ).scalar_subquery(),
+            Dataset.document_count: db.select(func.count(Document.id)).where(
+                Document.dataset_id == Dataset.id
+            ).scalar_subquery(),
+            Dataset.available_document_count: db.select(func.count(Document.id)).where(
+                Document.dataset_id == Dataset.id,
+                Document.indexing_status == 'completed',
+                Document.enabled == True,
+                Document.archived == False
+            ).scalar_subquery(),
+            Dataset.available_segment_count: db.select(func.count(DocumentSegment.id)).where(
+                DocumentSegment.dataset_id == Dataset.id,
+                DocumentSegment.status == 'completed',
+                DocumentSegment.enabled == True
+            ).scalar_subquery(),
+            Dataset.word_count: db.select(func.coalesce(func.sum(Document.word_count), 0)).where(
+                Document.dataset_id == Dataset.id
+            ).scalar_subquery()
+        }, synchronize_session=False)
 
 
 class DatasetProcessRule(db.Model):
@@ -143,6 +146,7 @@ class Document(db.Model):
     __table_args__ = (
         db.PrimaryKeyConstraint('id', name='document_pkey'),
         db.Index('document_dataset_id_idx', 'dataset_id'),
+        db.Index('document_dataset_created_at_idx', 'dataset_id', 'created_at', 'id'),
         db.Index('document_is_paused_idx', 'is_paused'),
     )
 
@@ -210,6 +214,10 @@ class Document(db.Model):
     doc_form = db.Column(db.String(
         255), nullable=False, server_default=db.text("'text_model'::character varying"))
 
+    # counters, maintained by update_counters
+    segment_count = db.Column(db.Integer, nullable=False, server_default=db.text('0'))
+    hit_count = db.Column(db.Integer, nullable=False, server_default=db.text('0'))
+
     DATA_SOURCES = ['upload_file', 'notion_import']
 
     @property
@@ -282,14 +290,30 @@ class Document(db.Model):
     def dataset(self):
         return db.session.query(Dataset).filter(Dataset.id == self.dataset_id).one_or_none()
 
-    @property
-    def segment_count(self):
-        return DocumentSegment.query.filter(DocumentSegment.document_id == self.id).count()
-
-    @property
-    def hit_count(self):
-        return DocumentSegment.query.with_entities(func.coalesce(func.sum(DocumentSegment.hit_count))) \
-            .filter(DocumentSegment.document_id == self.id).scalar()
+    @classmethod
+    def update_counters(cls, document_id: str) -> None:
+        """Recount the counters of a document in one statement, committed with the change which affected them."""
+        db.session.query(Document).filter(Document.id == document_id).update(
+            cls._counter_values(), synchronize_session=False
+        )
+
+    @classmethod
+    def update_dataset_counters(cls, dataset_id: str) -> None:
+        """Recount the counters of all the documents of a dataset in one statement."""
+        db.session.query(Document).filter(Document.dataset_id == dataset_id).update(
+            cls._counter_values(), synchronize_session=False
+        )
+
+    @classmethod
+    def _counter_values(cls) -> dict:
+        return {
+            Document.segment_count: db.select(func.count(DocumentSegment.id)).where(
+                DocumentSegment.document_id == Document.id
+            ).scalar_subquery(),
+            Document.hit_count: db.select(func.coalesce(func.sum(DocumentSegment.hit_count), 0)).where(
+                DocumentSegment.document_id == Document.id
+            ).scalar_subquery()
+        }
 
 
 class DocumentSegment(db.Model):
@@ -301,6 +325,8 @@ class DocumentSegment(db.Model):
         db.Index('document_segment_tenant_dataset_idx', 'dataset_id', 'tenant_id'),
         db.Index('document_segment_tenant_document_idx', 'document_id', 'tenant_id'),
         db.Index('document_segment_dataset_node_idx', 'dataset_id', 'index_node_id'),
+        db.Index('document_segment_document_position_idx', 'document_id', 'position'),
+        db.Index('document_segment_search_vector_idx', 'search_vector', postgresql_using='gin'),
     )
 
     # initial fields
@@ -319,6 +345,9 @@ class DocumentSegment(db.Model):
     keywords = db.Column(db.JSON, nullable=True)
     index_node_id = db.Column(db.String(255), nullable=True)
     index_node_hash = db.Column(db.String(255), nullable=True)
+    # jieba tokenized content for keyword search, NULL until backfilled for segments created before it,
+    # deferred as it is only used in filters
+    search_vector = db.deferred(db.Column(TSVECTOR, nullable=True))
 
     # basic fields
     hit_count = db.Column(db.Integer, nullable=False, default=0)
@@ -2,13 +2,24 @@ import json
 
 from flask import current_app, request
 from flask_login import UserMixin
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.dialects.postgresql import UUID, TSVECTOR
 
 from libs.helper import generate_string
 from extensions.ext_database import db
 from .account import Account, Tenant
 
 
+class PreloadMixin:
+    """Properties which query the database can be computed in batch for many rows and preloaded."""
+
+    def preload(self, **properties):
+        self.__dict__.setdefault('_preloaded_properties', {}).update(properties)
+
+    @property
+    def preloaded_properties(self) -> dict:
+        return self.__dict__.get('_preloaded_properties', {})
+
+
 class DifySetup(db.Model):
     __tablename__ = 'dify_setups'
     __table_args__ = (
@@ -204,11 +215,12 @@ class InstalledApp(db.Model):
         return tenant
 
 
-class Conversation(db.Model):
+class Conversation(PreloadMixin, db.Model):
     __tablename__ = 'conversations'
     __table_args__ = (
         db.PrimaryKeyConstraint('id', name='conversation_pkey'),
-        db.Index('conversation_app_from_user_idx', 'app_id', 'from_source', 'from_end_user_id')
+        db.Index('conversation_app_from_user_idx', 'app_id', 'from_source', 'from_end_user_id'),
+        db.Index('conversation_app_created_at_idx', 'app_id', 'created_at', 'id')
     )
 
     id = db.Column(UUID, server_default=db.text('uuid_generate_v4()'))
@@ -265,8 +277,11 @@ class Conversation(db.Model):
             else:
                 model_config['configs'] = override_model_configs
         else:
-            app_model_config = db.session.query(AppModelConfig).filter(
-                AppModelConfig.id == self.app_model_config_id).first()
+            if 'app_model_config' in self.preloaded_properties:
+                app_model_config = self.preloaded_properties['app_model_config']
+            else:
+                app_model_config = db.session.query(AppModelConfig).filter(
+                    AppModelConfig.id == self.app_model_config_id).first()
 
             model_config['configs'] = app_model_config.configs
             model_config['model'] = app_model_config.model_dict
@@ -298,18 +313,31 @@ class Conversation(db.Model):
 
     @property
     def annotated(self):
+        if 'annotation' in self.preloaded_properties:
+            return self.preloaded_properties['annotation'] is not None
+
         return db.session.query(MessageAnnotation).filter(MessageAnnotation.conversation_id == self.id).count() > 0
 
     @property
     def annotation(self):
-        return db.session.query(MessageAnnotation).filter(MessageAnnotation.conversation_id == self.id).first()
+        if 'annotation' in self.preloaded_properties:
+            return self.preloaded_properties['annotation']
+
+        return db.session.query(MessageAnnotation).filter(MessageAnnotation.conversation_id == self.id) \
+            .order_by(MessageAnnotation.created_at.asc()).first()
 
     @property
     def message_count(self):
+        if 'message_count' in self.preloaded_properties:
+            return self.preloaded_properties['message_count']
+
         return db.session.query(Message).filter(Message.conversation_id == self.id).count()
 
     @property
     def user_feedback_stats(self):
+        if 'user_feedback_stats' in self.preloaded_properties:
+            return self.preloaded_properties['user_feedback_stats']
+
         like = db.session.query(MessageFeedback) \
             .filter(MessageFeedback.conversation_id == self.id,
                     MessageFeedback.from_source == 'user',
@@ -324,6 +352,9 @@ class Conversation(db.Model):
 
     @property
     def admin_feedback_stats(self):
+        if 'admin_feedback_stats' in self.preloaded_properties:
+            return self.preloaded_properties['admin_feedback_stats']
+
         like = db.session.query(MessageFeedback) \
             .filter(MessageFeedback.conversation_id == self.id,
                     MessageFeedback.from_source == 'admin',
@@ -338,7 +369,11 @@ class Conversation(db.Model):
 
     @property
     def first_message(self):
-        return db.session.query(Message).filter(Message.conversation_id == self.id).first()
+        if 'first_message' in self.preloaded_properties:
+            return self.preloaded_properties['first_message']
+
+        return db.session.query(Message).filter(Message.conversation_id == self.id) \
+            .order_by(Message.created_at.asc()).first()
 
     @property
     def app(self):
@@ -346,6 +381,9 @@ class Conversation(db.Model):
 
     @property
     def from_end_user_session_id(self):
+        if 'from_end_user_session_id' in self.preloaded_properties:
+            return self.preloaded_properties['from_end_user_session_id']
+
         if self.from_end_user_id:
             end_user = db.session.query(EndUser).filter(EndUser.id == self.from_end_user_id).first()
             if end_user:
@@ -364,6 +402,7 @@ class Message(db.Model):
         db.PrimaryKeyConstraint('id', name='message_pkey'),
         db.Index('message_app_id_idx', 'app_id', 'created_at'),
         db.Index('message_conversation_id_idx', 'conversation_id'),
+        db.Index('message_conversation_created_at_idx', 'conversation_id', 'created_at', 'id'),
         db.Index('message_end_user_idx', 'app_id', 'from_source', 'from_end_user_id'),
         db.Index('message_account_idx', 'app_id', 'from_source', 'from_account_id'),
     )
@@ -460,7 +499,7 @@ class MessageFeedback(db.Model):
         return account
 
 
-class MessageAnnotation(db.Model):
+class MessageAnnotation(PreloadMixin, db.Model):
     __tablename__ = 'message_annotations'
     __table_args__ = (
         db.PrimaryKeyConstraint('id', name='message_annotation_pkey'),
@@ -480,6 +519,9 @@ class MessageAnnotation(db.Model):
 
     @property
     def account(self):
+        if 'account' in self.preloaded_properties:
+            return self.preloaded_properties['account']
+
         account = db.session.query(Account).filter(Account.id == self.account_id).first()
         return account
 
@@ -672,3 +714,55 @@ class MessageAgentThought(db.Model):
     created_by_role = db.Column(db.String, nullable=False)
     created_by = db.Column(UUID, nullable=False)
     created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.current_timestamp())
+
+
+class AppHourlyStatistic(db.Model):
+    """Message statistics of an app rolled up per UTC hour, see AppStatisticService."""
+    __tablename__ = 'app_hourly_statistics'
+    __table_args__ = (
+        db.PrimaryKeyConstraint('id', name='app_hourly_statistic_pkey'),
+        db.UniqueConstraint('app_id', 'hour', name='app_hourly_statistic_app_hour_key'),
+    )
+
+    id = db.Column(UUID, nullable=False, server_default=db.text('uuid_generate_v4()'))
+    app_id = db.Column(UUID, nullable=False)
+    hour = db.Column(db.DateTime, nullable=False)
+    message_count = db.Column(db.Integer, nullable=False, server_default=db.text('0'))
+    message_tokens = db.Column(db.BigInteger, nullable=False, server_default=db.text('0'))
+    answer_tokens = db.Column(db.BigInteger, nullable=False, server_default=db.text('0'))
+    total_price = db.Column(db.Numeric(20, 7))
+    provider_response_latency = db.Column(db.Float, nullable=False, server_default=db.text('0'))
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.text('CURRENT_TIMESTAMP(0)'))
+
+
+class ConversationHourlyStatistic(db.Model):
+    """Message count of a conversation per UTC hour, for the distinct and per conversation app statistics."""
+    __tablename__ = 'conversation_hourly_statistics'
+    __table_args__ = (
+        db.PrimaryKeyConstraint('id', name='conversation_hourly_statistic_pkey'),
+        db.Index('conversation_hourly_statistic_app_hour_idx', 'app_id', 'hour'),
+        db.Index('conversation_hourly_statistic_conversation_idx', 'conversation_id'),
+    )
+
+    id = db.Column(UUID, nullable=False, server_default=db.text('uuid_generate_v4()'))
+    app_id = db.Column(UUID, nullable=False)
+    hour = db.Column(db.DateTime, nullable=False)
+    conversation_id = db.Column(UUID, nullable=False)
+    from_end_user_id = db.Column(UUID)
+    message_count = db.Column(db.Integer, nullable=False, server_default=db.text('0'))
+
+
+class MessageSearchIndex(db.Model):
+    """The jieba tokenized query and answer of a message for the keyword search of the logs."""
+    __tablename__ = 'message_search_indexes'
+    __table_args__ = (
+        db.PrimaryKeyConstraint('message_id', name='message_search_index_pkey'),
+        db.Index('message_search_index_app_conversation_idx', 'app_id', 'conversation_id'),
+        db.Index('message_search_index_content_idx', 'content', postgresql_using='gin'),
+    )
+
+    message_id = db.Column(UUID, nullable=False)
+    app_id = db.Column(UUID, nullable=False)
+    conversation_id = db.Column(UUID, nullable=False)
+    content = db.Column(TSVECTOR, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.text('CURRENT_TIMESTAMP(0)'))
@@ -0,0 +1,290 @@
+import datetime
+import logging
+from typing import Optional, List
+
+import pytz
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from extensions.ext_database import db
+from models.model import AppHourlyStatistic, Message
+
+# bounds of the ranges without a start or an end
+MIN_DATETIME = datetime.datetime(1970, 1, 1)
+MAX_DATETIME = datetime.datetime(9999, 1, 1)
+
+# the day in the timezone of the account of a UTC timestamp column
+DAY_SQL = "date(DATE_TRUNC('day', {column} AT TIME ZONE 'UTC' AT TIME ZONE :tz))"
+# the raw rows of a range which are not rolled up yet
+RAW_RANGE_SQL = "(({column} >= :start AND {column} < :rollup_start) OR ({column} >= :rollup_end AND {column} < :end))"
+ROLLUP_RANGE_SQL = "hour >= :rollup_start AND hour < :rollup_end"
+
+
+class AppStatisticService:
+    """
+    Daily app statistics from hourly rollups of the messages.
+
+    The closed UTC hours of an app are rolled up into app_hourly_statistics and conversation_hourly_statistics,
+    and the statistics of a range read the rollups of its whole hours and only scan the raw messages of the
+    hours which are not rolled up yet and of the partial hours at its bounds.
+    """
+
+    # hours are rolled up once they ended this long ago, messages still being generated are complete by then
+    ROLLUP_DELAY = datetime.timedelta(minutes=15)
+    # one rollup task per app at most every interval seconds
+    ROLLUP_INTERVAL = 600
+    # hours rolled up in one transaction when catching up
+    ROLLUP_BATCH_HOURS = 24
+
+    @classmethod
+    def rollup(cls, app_id: str) -> int:
+        """
+        Roll up the closed hours of an app after its last rolled up hour.
+
+        :return: number of hours rolled up
+        """
+        rollup_start = cls.get_rolled_up_to(app_id)
+        if rollup_start is None:
+            first_created_at = db.session.query(func.min(Message.created_at)) \
+                .filter(Message.app_id == app_id).scalar()
+            if first_created_at is None:
+                return 0
+
+            rollup_start = _floor_hour(first_created_at)
+
+        rollup_end = _floor_hour(datetime.datetime.utcnow() - cls.ROLLUP_DELAY)
+        hours = 0
+        while rollup_start < rollup_end:
+            batch_end = min(rollup_start + datetime.timedelta(hours=cls.ROLLUP_BATCH_HOURS), rollup_end)
+            try:
+                cls._rollup_hours(app_id, rollup_start, batch_end)
+            except IntegrityError:
+                # another rollup of the app inserted the same hours
+                db.session.rollback()
+                logging.info('Hours of app {} are being rolled up by another task.'.format(app_id))
+                break
+
+            hours += int((batch_end - rollup_start).total_seconds() // 3600)
+            rollup_start = batch_end
+
+        return hours
+
+    @classmethod
+    def _rollup_hours(cls, app_id: str, start: datetime.datetime, end: datetime.datetime):
+        """Replace the rollups of the hours from start to end with the aggregates of their messages."""
+        arg_dict = {'app_id': app_id, 'start': start, 'end': end}
+
+        db.session.execute(db.text(
+            'DELETE FROM app_hourly_statistics WHERE app_id = :app_id AND hour >= :start AND hour < :end'
+        ), arg_dict)
+        db.session.execute(db.text(
+            'DELETE FROM conversation_hourly_statistics WHERE app_id = :app_id AND hour >= :start AND hour < :end'
+        ), arg_dict)
+
+        db.session.execute(db.text('''
+            INSERT INTO app_hourly_statistics
+                (app_id, hour, message_count, message_tokens, answer_tokens, total_price, provider_response_latency)
+            SELECT app_id, DATE_TRUNC('hour', created_at), COUNT(id), SUM(message_tokens), SUM(answer_tokens),
+                SUM(total_price), SUM(provider_response_latency)
+                FROM messages WHERE app_id = :app_id AND created_at >= :start AND created_at < :end
+                GROUP BY app_id, DATE_TRUNC('hour', created_at)
+        '''), arg_dict)
+        db.session.execute(db.text('''
+            INSERT INTO conversation_hourly_statistics (app_id, hour, conversation_id, from_end_user_id, message_count)
+            SELECT app_id, DATE_TRUNC('hour', created_at), conversation_id, from_end_user_id, COUNT(id)
+                FROM messages WHERE app_id = :app_id AND created_at >= :start AND created_at < :end
+                GROUP BY app_id, DATE_TRUNC('hour', created_at), conversation_id, from_end_user_id
+        '''), arg_dict)
+
+        db.session.commit()
+
+    @classmethod
+    def get_rolled_up_to(cls, app_id: str) -> Optional[datetime.datetime]:
+        """Get the end of the last rolled up hour of an app, the messages created from then on are not rolled up."""
+        last_hour = db.session.query(func.max(AppHourlyStatistic.hour)) \
+            .filter(AppHourlyStatistic.app_id == app_id).scalar()
+
+        return last_hour + datetime.timedelta(hours=1) if last_hour else None
+
+    @classmethod
+    def get_daily_conversations(cls, app_id: str, timezone: str, start: Optional[datetime.datetime],
+                                end: Optional[datetime.datetime]) -> List:
+        return cls._execute_distinct_count(
+            'conversation_id', 'conversation_count', cls._get_range_args(app_id, timezone, start, end))
+
+    @classmethod
+    def get_daily_terminals(cls, app_id: str, timezone: str, start: Optional[datetime.datetime],
+                            end: Optional[datetime.datetime]) -> List:
+        return cls._execute_distinct_count(
+            'from_end_user_id', 'terminal_count', cls._get_range_args(app_id, timezone, start, end))
+
+    @classmethod
+    def get_daily_token_costs(cls, app_id: str, timezone: str, start: Optional[datetime.datetime],
+                              end: Optional[datetime.datetime]) -> List:
+        sql_query = f'''
+            SELECT date, SUM(token_count) AS token_count, SUM(total_price) AS total_price FROM (
+                SELECT {DAY_SQL.format(column='hour')} AS date, message_tokens + answer_tokens AS token_count,
+                    total_price
+                    FROM app_hourly_statistics WHERE app_id = :app_id AND {ROLLUP_RANGE_SQL}
+                UNION ALL
+                SELECT {DAY_SQL.format(column='created_at')} AS date, message_tokens + answer_tokens, total_price
+                    FROM messages WHERE app_id = :app_id AND {RAW_RANGE_SQL.format(column='created_at')}
+            ) t GROUP BY date ORDER BY date
+        '''
+
+        return cls._execute(sql_query, cls._get_range_args(app_id, timezone, start, end))
+
+    @classmethod
+    def get_daily_average_session_interactions(cls, app_id: str, timezone: str, start: Optional[datetime.datetime],
+                                               end: Optional[datetime.datetime]) -> List:
+        """Average message count of the conversations created each day, without debugging conversations."""
+        conversation_filter = 'c.override_model_configs IS NULL AND c.app_id = :app_id ' \
+                              'AND c.created_at >= :start AND c.created_at < :end'
+        sql_query = f'''
+            SELECT {DAY_SQL.format(column='c.created_at')} AS date, AVG(subquery.message_count) AS interactions
+            FROM (SELECT conversation_id, SUM(message_count) AS message_count FROM (
+                SELECT s.conversation_id, s.message_count
+                    FROM conversations c
+                    JOIN conversation_hourly_statistics s ON c.id = s.conversation_id
+                    WHERE {conversation_filter} AND s.hour < :rolled_up_to
+                UNION ALL
+                SELECT m.conversation_id, 1
+                    FROM conversations c
+                    JOIN messages m ON c.id = m.conversation_id
+                    WHERE {conversation_filter} AND m.created_at >= :rolled_up_to
+            ) t GROUP BY conversation_id) subquery
+            LEFT JOIN conversations c on c.id = subquery.conversation_id
+            GROUP BY date
+            ORDER BY date
+        '''
+
+        arg_dict = cls._get_range_args(app_id, timezone, start, end)
+        arg_dict['rolled_up_to'] = cls.get_rolled_up_to(app_id) or MIN_DATETIME
+
+        return cls._execute(sql_query, arg_dict)
+
+    @classmethod
+    def get_daily_user_satisfaction(cls, app_id: str, timezone: str, start: Optional[datetime.datetime],
+                                    end: Optional[datetime.datetime]) -> List:
+        """Message and feedback counts of the messages created each day."""
+        sql_query = f'''
+            SELECT mc.date, mc.message_count, COALESCE(fc.feedback_count, 0) AS feedback_count FROM (
+                SELECT date, SUM(message_count) AS message_count FROM (
+                    SELECT {DAY_SQL.format(column='hour')} AS date, message_count
+                        FROM app_hourly_statistics WHERE app_id = :app_id AND {ROLLUP_RANGE_SQL}
+                    UNION ALL
+                    SELECT {DAY_SQL.format(column='created_at')} AS date, 1
+                        FROM messages WHERE app_id = :app_id AND {RAW_RANGE_SQL.format(column='created_at')}
+                ) t GROUP BY date
+            ) mc LEFT JOIN (
+                SELECT {DAY_SQL.format(column='m.created_at')} AS date, COUNT(mf.id) AS feedback_count
+                    FROM message_feedbacks mf
+                    JOIN messages m ON m.id = mf.message_id
+                    WHERE mf.app_id = :app_id AND m.created_at >= :start AND m.created_at < :end
+                    GROUP BY date
+            ) fc ON fc.date = mc.date
+            ORDER BY mc.date
+        '''
+
+        return cls._execute(sql_query, cls._get_range_args(app_id, timezone, start, end))
+
+    @classmethod
+    def get_daily_average_response_time(cls, app_id: str, timezone: str, start: Optional[datetime.datetime],
+                                        end: Optional[datetime.datetime]) -> List:
+        sql_query = f'''
+            SELECT date, SUM(latency) / SUM(message_count) AS latency FROM (
+                SELECT {DAY_SQL.format(column='hour')} AS date, provider_response_latency AS latency, message_count
+                    FROM app_hourly_statistics WHERE app_id = :app_id AND {ROLLUP_RANGE_SQL}
+                UNION ALL
+                SELECT {DAY_SQL.format(column='created_at')} AS date, provider_response_latency, 1
+                    FROM messages WHERE app_id = :app_id AND {RAW_RANGE_SQL.format(column='created_at')}
+            ) t GROUP BY date ORDER BY date
+        '''
+
+        return cls._execute(sql_query, cls._get_range_args(app_id, timezone, start, end))
+
+    @classmethod
+    def get_daily_tokens_per_second(cls, app_id: str, timezone: str, start: Optional[datetime.datetime],
+                                    end: Optional[datetime.datetime]) -> List:
+        sql_query = f'''
+            SELECT date,
+                CASE
+                    WHEN SUM(latency) = 0 THEN 0
+                    ELSE (SUM(answer_tokens) / SUM(latency))
+                END as tokens_per_second
+            FROM (
+                SELECT {DAY_SQL.format(column='hour')} AS date, answer_tokens, provider_response_latency AS latency
+                    FROM app_hourly_statistics WHERE app_id = :app_id AND {ROLLUP_RANGE_SQL}
+                UNION ALL
+                SELECT {DAY_SQL.format(column='created_at')} AS date, answer_tokens, provider_response_latency
+                    FROM messages WHERE app_id = :app_id AND {RAW_RANGE_SQL.format(column='created_at')}
+            ) t GROUP BY date ORDER BY date
+        '''
+
+        return cls._execute(sql_query, cls._get_range_args(app_id, timezone, start, end))
+
+    @classmethod
+    def _execute_distinct_count(cls, column: str, label: str, arg_dict: dict) -> List:
+        # distinct counts do not add up, the ids of the rolled up hours and of the raw messages are counted together
+        sql_query = f'''
+            SELECT date, COUNT(DISTINCT {column}) AS {label} FROM (
+                SELECT {DAY_SQL.format(column='hour')} AS date, {column}
+                    FROM conversation_hourly_statistics WHERE app_id = :app_id AND {ROLLUP_RANGE_SQL}
+                UNION ALL
+                SELECT {DAY_SQL.format(column='created_at')} AS date, {column}
+                    FROM messages WHERE app_id = :app_id AND {RAW_RANGE_SQL.format(column='created_at')}
+            ) t GROUP BY date ORDER BY date
+        '''
+
+        return cls._execute(sql_query, arg_dict)
+
+    @classmethod
+    def _execute(cls, sql_query: str, arg_dict: dict) -> List:
+        with db.engine.begin() as conn:
+            return list(conn.execute(db.text(sql_query), arg_dict))
+
+    @classmethod
+    def _get_range_args(cls, app_id: str, timezone: str, start: Optional[datetime.datetime],
+                        end: Optional[datetime.datetime]) -> dict:
+        """
+        Split a range of UTC datetimes into the whole hours read from the rollups and the rest read from messages.
+
+        :return: arguments of the queries, the rollups are read from rollup_start to rollup_end
+        """
+        start = start or MIN_DATETIME
+        end = end or MAX_DATETIME
+
+        rollup_start = rollup_end = start
+        rolled_up_to = cls.get_rolled_up_to(app_id)
+        if rolled_up_to and _is_whole_hour_offset(timezone, [start, min(end, datetime.datetime.utcnow())]):
+            rollup_start = min(_ceil_hour(start), end)
+            rollup_end = max(min(_floor_hour(end), rolled_up_to), rollup_start)
+
+        return {
+            'tz': timezone,
+            'app_id': app_id,
+            'start': start,
+            'end': end,
+            'rollup_start': rollup_start,
+            'rollup_end': rollup_end
+        }
+
+
+def _floor_hour(dt: datetime.datetime) -> datetime.datetime:
+    return dt.replace(minute=0, second=0, microsecond=0)
+
+
+def _ceil_hour(dt: datetime.datetime) -> datetime.datetime:
+    floor_hour = _floor_hour(dt)
+    return floor_hour if floor_hour == dt else floor_hour + datetime.timedelta(hours=1)
+
+
+def _is_whole_hour_offset(timezone: str, utc_datetimes: List[datetime.datetime]) -> bool:
+    """Whether the UTC hours fall into a single day of the timezone, which is not true for e.g. Asia/Kolkata."""
+    tz = pytz.timezone(timezone)
+    for utc_datetime in utc_datetimes:
+        utc_offset = pytz.utc.localize(utc_datetime).astimezone(tz).utcoffset()
+        if utc_offset.total_seconds() % 3600 != 0:
+            return False
+
+    return True
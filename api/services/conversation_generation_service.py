@@ -0,0 +1,170 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from flask import current_app, Flask
+from sqlalchemy import func
+
+from core.generator.llm_generator import LLMGenerator
+from core.model_providers.error import LLMError
+from extensions.ext_database import db
+from extensions.ext_redis import redis_client
+from models.model import App, Conversation, Message
+from tasks.generate_conversation_batch_task import generate_conversation_batch_task
+
+
+class ConversationGenerationService:
+    """
+    Names and summaries of chat conversations, generated in batches.
+
+    Conversations are queued in a redis set per kind of generation as their messages are created, and a batch
+    task drains each queue at most once per interval, generating on a bounded thread pool, so a busy
+    conversation costs one set insert per message instead of a task and a message count.
+    """
+
+    NAME = 'name'
+    SUMMARY = 'summary'
+
+    # seconds a conversation waits in the queue at most, names are shown to the user sooner
+    INTERVALS = {NAME: 5, SUMMARY: 60}
+    # conversations generated by a batch task, the rest are left to the next one
+    BATCH_SIZE = 100
+    # messages a conversation has before it is summarized
+    SUMMARY_MIN_MESSAGES = 5
+    # characters of the first query the conversation is named by until its name is generated
+    PLACEHOLDER_NAME_LENGTH = 30
+    # messages loaded at a time to fill the context of a summary
+    SUMMARY_MESSAGE_BATCH_SIZE = 20
+
+    @staticmethod
+    def queue_key(kind: str) -> str:
+        return 'conversation_{}_pending'.format(kind)
+
+    @classmethod
+    def placeholder_name(cls, query: str) -> str:
+        return query[:cls.PLACEHOLDER_NAME_LENGTH].strip() or 'New Chat'
+
+    @classmethod
+    def queue(cls, kind: str, conversation_id: str) -> None:
+        """Queue a conversation for a generation, which a batch task picks up within the interval of the kind."""
+        redis_client.sadd(cls.queue_key(kind), conversation_id)
+        cls._schedule(kind)
+
+    @classmethod
+    def _schedule(cls, kind: str) -> None:
+        # at most one batch task of the kind per interval
+        schedule_key = 'conversation_{}_batch_scheduled'.format(kind)
+        if redis_client.set(schedule_key, 1, ex=cls.INTERVALS[kind], nx=True):
+            generate_conversation_batch_task.apply_async((kind,), countdown=cls.INTERVALS[kind])
+
+    @classmethod
+    def generate_pending(cls, kind: str) -> int:
+        """
+        Generate a batch of the queued conversations of a kind, another batch task is scheduled while
+        conversations are left in the queue.
+
+        :return: number of conversations generated
+        """
+        conversation_ids = [conversation_id.decode() if isinstance(conversation_id, bytes) else conversation_id
+                            for conversation_id in redis_client.spop(cls.queue_key(kind), cls.BATCH_SIZE) or []]
+
+        if kind == cls.NAME:
+            generated = cls.generate_names(conversation_ids)
+        else:
+            generated = cls.generate_summaries(conversation_ids)
+
+        if redis_client.scard(cls.queue_key(kind)):
+            cls._schedule(kind)
+
+        return generated
+
+    @classmethod
+    def generate_names(cls, conversation_ids: List[str]) -> int:
+        """Name conversations by their first message, unless they were renamed in the meantime."""
+        if not conversation_ids:
+            return 0
+
+        # the first message of each conversation
+        rows = db.session.query(Message.conversation_id, Message.query, Message.answer, App.tenant_id) \
+            .join(App, App.id == Message.app_id) \
+            .filter(Message.conversation_id.in_(conversation_ids)) \
+            .order_by(Message.conversation_id, Message.created_at.asc()) \
+            .distinct(Message.conversation_id) \
+            .all()
+
+        return cls._generate(cls._generate_name, rows)
+
+    @classmethod
+    def generate_summaries(cls, conversation_ids: List[str]) -> int:
+        """Summarize the conversations without a summary which have enough messages."""
+        if not conversation_ids:
+            return 0
+
+        # the messages of the conversations counted in one grouped query
+        rows = db.session.query(Conversation.id, App.tenant_id) \
+            .join(App, App.id == Conversation.app_id) \
+            .join(Message, Message.conversation_id == Conversation.id) \
+            .filter(Conversation.id.in_(conversation_ids), Conversation.summary.is_(None)) \
+            .group_by(Conversation.id, App.tenant_id) \
+            .having(func.count(Message.id) >= cls.SUMMARY_MIN_MESSAGES) \
+            .all()
+
+        return cls._generate(cls._generate_summary, rows)
+
+    @classmethod
+    def _generate(cls, generate_func, rows: list) -> int:
+        if not rows:
+            return 0
+
+        flask_app = current_app._get_current_object()
+        max_workers = min(int(flask_app.config.get('CONVERSATION_GENERATION_MAX_WORKERS', 4)), len(rows))
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='conversation_generation') as executor:
+            results = list(executor.map(lambda row: generate_func(flask_app, row), rows))
+
+        return sum(results)
+
+    @classmethod
+    def _generate_name(cls, flask_app: Flask, row) -> bool:
+        conversation_id, query, answer, tenant_id = row
+        with flask_app.app_context():
+            try:
+                name = LLMGenerator.generate_conversation_name(tenant_id, query, answer)
+            except LLMError:
+                return False
+            except Exception:
+                logging.exception('Failed to generate the name of conversation {}'.format(conversation_id))
+                return False
+
+            # the user may rename the conversation before its name is generated
+            Conversation.query.filter(
+                Conversation.id == conversation_id,
+                Conversation.name == cls.placeholder_name(query)
+            ).update({Conversation.name: name[:255]}, synchronize_session=False)
+            db.session.commit()
+
+            return True
+
+    @classmethod
+    def _generate_summary(cls, flask_app: Flask, row) -> bool:
+        conversation_id, tenant_id = row
+        with flask_app.app_context():
+            messages = db.session.query(Message.query, Message.answer) \
+                .filter(Message.conversation_id == conversation_id) \
+                .order_by(Message.created_at.asc()) \
+                .yield_per(cls.SUMMARY_MESSAGE_BATCH_SIZE)
+
+            try:
+                summary = LLMGenerator.generate_conversation_summary(tenant_id, messages)
+            except LLMError:
+                return False
+            except Exception:
+                logging.exception('Failed to generate the summary of conversation {}'.format(conversation_id))
+                return False
+
+            Conversation.query.filter(
+                Conversation.id == conversation_id,
+                Conversation.summary.is_(None)
+            ).update({Conversation.summary: summary}, synchronize_session=False)
+            db.session.commit()
+
+            return True
@@ -1,13 +1,105 @@
-from typing import Union, Optional
+from typing import Union, Optional, List
 
+from sqlalchemy import func
+
+from libs.cursor_pagination import CursorPagination, paginate_by_cursor, estimate_count
 from libs.infinite_scroll_pagination import InfiniteScrollPagination
 from extensions.ext_database import db
 from models.account import Account
-from models.model import Conversation, App, EndUser
+from models.model import Conversation, App, EndUser, Message, MessageFeedback, MessageAnnotation, AppModelConfig
 from services.errors.conversation import ConversationNotExistsError, LastConversationNotExistsError
 
 
 class ConversationService:
+    @classmethod
+    def paginate_list_by_cursor(cls, query, cursor: Optional[str], limit: int) -> CursorPagination:
+        """
+        Fetch a page of a console conversation list query, newest first, after the cursor of the previous page.
+        The total is the estimate of the query planner, as an exact count costs as much as scanning all pages.
+        """
+        pagination = paginate_by_cursor(query, [Conversation.created_at, Conversation.id], cursor, limit)
+        pagination.total = estimate_count(query)
+        cls.load_list_aggregates(pagination.data)
+
+        return pagination
+
+    @classmethod
+    def load_list_aggregates(cls, conversations: List[Conversation]) -> None:
+        """
+        Preload the properties marshalled by the console conversation lists for a page of conversations,
+        with one grouped query per property instead of a few queries per conversation.
+        """
+        if not conversations:
+            return
+
+        conversation_ids = [conversation.id for conversation in conversations]
+
+        message_counts = dict(
+            db.session.query(Message.conversation_id, func.count(Message.id))
+            .filter(Message.conversation_id.in_(conversation_ids))
+            .group_by(Message.conversation_id)
+            .all()
+        )
+
+        feedback_stats = {conversation_id: {'user': {'like': 0, 'dislike': 0}, 'admin': {'like': 0, 'dislike': 0}}
+                          for conversation_id in conversation_ids}
+        feedback_counts = db.session.query(
+            MessageFeedback.conversation_id, MessageFeedback.from_source, MessageFeedback.rating,
+            func.count(MessageFeedback.id)
+        ).filter(MessageFeedback.conversation_id.in_(conversation_ids)) \
+            .group_by(MessageFeedback.conversation_id, MessageFeedback.from_source, MessageFeedback.rating) \
+            .all()
+        for conversation_id, from_source, rating, count in feedback_counts:
+            if from_source in feedback_stats[conversation_id] and rating in ('like', 'dislike'):
+                feedback_stats[conversation_id][from_source][rating] = count
+
+        # the first message and the first annotation of each conversation
+        first_messages = {
+            message.conversation_id: message for message in
+            db.session.query(Message).filter(Message.conversation_id.in_(conversation_ids))
+            .distinct(Message.conversation_id)
+            .order_by(Message.conversation_id, Message.created_at.asc())
+            .all()
+        }
+        annotations = {
+            annotation.conversation_id: annotation for annotation in
+            db.session.query(MessageAnnotation).filter(MessageAnnotation.conversation_id.in_(conversation_ids))
+            .distinct(MessageAnnotation.conversation_id)
+            .order_by(MessageAnnotation.conversation_id, MessageAnnotation.created_at.asc())
+            .all()
+        }
+
+        account_ids = {annotation.account_id for annotation in annotations.values()}
+        if account_ids:
+            accounts = {account.id: account for account in
+                        db.session.query(Account).filter(Account.id.in_(account_ids)).all()}
+            for annotation in annotations.values():
+                annotation.preload(account=accounts.get(annotation.account_id))
+
+        end_user_ids = {conversation.from_end_user_id for conversation in conversations
+                        if conversation.from_end_user_id}
+        end_user_session_ids = dict(
+            db.session.query(EndUser.id, EndUser.session_id).filter(EndUser.id.in_(end_user_ids)).all()
+        ) if end_user_ids else {}
+
+        app_model_config_ids = {conversation.app_model_config_id for conversation in conversations
+                                if not conversation.override_model_configs}
+        app_model_configs = {
+            app_model_config.id: app_model_config for app_model_config in
+            db.session.query(AppModelConfig).filter(AppModelConfig.id.in_(app_model_config_ids)).all()
+        } if app_model_config_ids else {}
+
+        for conversation in conversations:
+            conversation.preload(
+                message_count=message_counts.get(conversation.id, 0),
+                user_feedback_stats=feedback_stats[conversation.id]['user'],
+                admin_feedback_stats=feedback_stats[conversation.id]['admin'],
+                first_message=first_messages.get(conversation.id),
+                annotation=annotations.get(conversation.id),
+                from_end_user_session_id=end_user_session_ids.get(conversation.from_end_user_id),
+                app_model_config=app_model_configs.get(conversation.app_model_config_id)
+            )
+
     @classmethod
     def pagination_by_last_id(cls, app_model: App, user: Optional[Union[Account | EndUser]],
                               last_id: Optional[str], limit: int,
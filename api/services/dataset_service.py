@@ -9,6 +9,8 @@ from typing import Optional, List
 from flask import current_app
 from sqlalchemy import func
 
+from core.docstore.segment_hydrator import SegmentHydrator
+from core.helper.search_tokenizer import to_search_vector, to_ts_query
 from core.model_providers.model_factory import ModelFactory
 from extensions.ext_redis import redis_client
 from flask_login import current_user
@@ -17,6 +19,7 @@ from events.dataset_event import dataset_was_deleted
 from events.document_event import document_was_deleted
 from extensions.ext_database import db
 from libs import helper
+from libs.cursor_pagination import estimate_count
 from models.account import Account
 from models.dataset import Dataset, Document, DatasetQuery, DatasetProcessRule, AppDatasetJoin, DocumentSegment
 from models.model import UploadFile
@@ -56,6 +59,33 @@ class DatasetService:
 
         return datasets.items, datasets.total
 
+    @staticmethod
+    def reconcile_counters(batch_size: int = 100) -> int:
+        """
+        Recount the counters of all datasets and their documents, fixing the drift of the changes which
+        do not update them, e.g. segments disabled after an indexing error.
+        """
+        count = 0
+        last_id = None
+        while True:
+            query = db.session.query(Dataset.id)
+            if last_id:
+                query = query.filter(Dataset.id > last_id)
+
+            dataset_ids = [dataset_id for dataset_id, in query.order_by(Dataset.id.asc()).limit(batch_size)]
+            if not dataset_ids:
+                break
+
+            for dataset_id in dataset_ids:
+                Document.update_dataset_counters(dataset_id)
+                Dataset.update_counters(dataset_id)
+                db.session.commit()
+
+            count += len(dataset_ids)
+            last_id = dataset_ids[-1]
+
+        return count
+
     @staticmethod
     def get_process_rules(dataset_id):
         # get the latest process rule
@@ -340,6 +370,7 @@ class DocumentService:
         document_was_deleted.send(document.id, dataset_id=document.dataset_id)
 
         db.session.delete(document)
+        Dataset.update_counters(document.dataset_id)
         db.session.commit()
 
     @staticmethod
@@ -863,6 +894,59 @@ class DocumentService:
 
 
 class SegmentService:
+    # segment counts are exact up to this number, above it they are estimated by the query planner
+    EXACT_COUNT_LIMIT = 1000
+    INDEX_BATCH_SIZE = 500
+
+    @classmethod
+    def filter_by_keyword(cls, query, keyword: str):
+        """Filter segments containing all the words of a keyword, over the GIN indexed search vector."""
+        ts_query = to_ts_query(keyword)
+        if ts_query is None:
+            # keywords of symbols only, which have no tokens
+            return query.filter(DocumentSegment.content.ilike('%{}%'.format(keyword)))
+
+        return query.filter(DocumentSegment.search_vector.op('@@')(func.to_tsquery('simple', ts_query)))
+
+    @classmethod
+    def count(cls, query) -> int:
+        """
+        Count the segments of a query, scanning at most EXACT_COUNT_LIMIT + 1 rows. Larger counts are
+        the row estimate of the query plan, which is never below the number of rows scanned.
+        """
+        limited_query = query.with_entities(DocumentSegment.id).order_by(None).limit(cls.EXACT_COUNT_LIMIT + 1)
+        count = db.session.query(func.count()).select_from(limited_query.subquery()).scalar()
+        if count <= cls.EXACT_COUNT_LIMIT:
+            return count
+
+        return max(estimate_count(query.with_entities(DocumentSegment.id).order_by(None)), count)
+
+    @classmethod
+    def index_all_segments(cls) -> int:
+        """Fill the search vector of the segments created before it, in batches."""
+        count = 0
+        last_id = None
+        while True:
+            query = db.session.query(DocumentSegment.id, DocumentSegment.content).filter(
+                DocumentSegment.search_vector.is_(None)
+            )
+            if last_id:
+                query = query.filter(DocumentSegment.id > last_id)
+
+            segments = query.order_by(DocumentSegment.id.asc()).limit(cls.INDEX_BATCH_SIZE).all()
+            if not segments:
+                break
+
+            for segment_id, content in segments:
+                db.session.query(DocumentSegment).filter(DocumentSegment.id == segment_id).update(
+                    {DocumentSegment.search_vector: to_search_vector(content)}, synchronize_session=False
+                )
+            db.session.commit()
+            count += len(segments)
+            last_id = segments[-1][0]
+
+        return count
+
     @classmethod
     def segment_create_args_validate(cls, args: dict, document: Document):
         if document.doc_form == 'qa_model':
@@ -894,6 +978,7 @@ class SegmentService:
             content=content,
             word_count=len(content),
             tokens=tokens,
+            search_vector=to_search_vector(content),
             created_by=current_user.id
         )
         if document.doc_form == 'qa_model':
@@ -920,6 +1005,7 @@ class SegmentService:
                 segment.keywords = args['keywords']
             db.session.add(segment)
             db.session.commit()
+            SegmentHydrator.invalidate([segment.index_node_id])
             # update segment index task
             redis_client.setex(indexing_cache_key, 600, 1)
             update_segment_keyword_index_task.delay(segment.id)
@@ -933,6 +1019,7 @@ class SegmentService:
             # calc embedding use tokens
             tokens = embedding_model.get_num_tokens(content)
             segment.content = content
+            segment.search_vector = to_search_vector(content)
             segment.index_node_hash = segment_hash
             segment.word_count = len(content)
             segment.tokens = tokens
@@ -943,6 +1030,7 @@ class SegmentService:
                 segment.answer = args['answer']
             db.session.add(segment)
             db.session.commit()
+            SegmentHydrator.invalidate([segment.index_node_id])
             # update segment index task
             redis_client.setex(indexing_cache_key, 600, 1)
             update_segment_index_task.delay(segment.id, args['keywords'])
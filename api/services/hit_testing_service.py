@@ -8,18 +8,22 @@ from langchain.embeddings.base import Embeddings
 from langchain.schema import Document
 from sklearn.manifold import TSNE
 
+from core.docstore.segment_hydrator import SegmentHydrator
 from core.embedding.cached_embedding import CacheEmbedding
+from core.embedding.embedding_projection import EmbeddingProjection
+from core.index.vector_index.base import VectorSearchFilter
 from core.index.vector_index.vector_index import VectorIndex
 from core.model_providers.model_factory import ModelFactory
 from extensions.ext_database import db
 from models.account import Account
-from models.dataset import Dataset, DocumentSegment, DatasetQuery
+from models.dataset import Dataset, DatasetQuery
 
 
 class HitTestingService:
     @classmethod
-    def retrieve(cls, dataset: Dataset, query: str, account: Account, limit: int = 10) -> dict:
-        if dataset.available_document_count == 0 or dataset.available_document_count == 0:
+    def retrieve(cls, dataset: Dataset, query: str, account: Account, limit: int = 10,
+                 projection: str = 'pca') -> dict:
+        if dataset.available_document_count == 0 or dataset.available_segment_count == 0:
             return {
                 "query": {
                     "content": query,
@@ -46,7 +50,9 @@ class HitTestingService:
             search_type='similarity_score_threshold',
             search_kwargs={
                 'k': 10
-            }
+            },
+            return_vectors=True,
+            metadata_filter=VectorSearchFilter.available_documents(dataset.id)
         )
         end = time.perf_counter()
         logging.debug(f"Hit testing retrieve in {end - start:0.4f} seconds")
@@ -62,34 +68,41 @@ class HitTestingService:
         db.session.add(dataset_query)
         db.session.commit()
 
-        return cls.compact_retrieve_response(dataset, embeddings, query, documents)
+        return cls.compact_retrieve_response(dataset, embeddings, query, documents, projection)
 
     @classmethod
-    def compact_retrieve_response(cls, dataset: Dataset, embeddings: Embeddings, query: str, documents: List[Document]):
+    def compact_retrieve_response(cls, dataset: Dataset, embeddings: Embeddings, query: str, documents: List[Document],
+                                  projection: str = 'pca'):
         text_embeddings = [
             embeddings.embed_query(query)
         ]
 
-        text_embeddings.extend(embeddings.embed_documents([document.page_content for document in documents]))
+        # use the vectors returned by the vector store, only embed documents it did not return one for
+        missing_vector_documents = [document for document in documents if not document.metadata.get('vector')]
+        if missing_vector_documents:
+            missing_vectors = embeddings.embed_documents(
+                [document.page_content for document in missing_vector_documents]
+            )
+            for document, vector in zip(missing_vector_documents, missing_vectors):
+                document.metadata['vector'] = vector
 
-        tsne_position_data = cls.get_tsne_positions_from_embeddings(text_embeddings)
+        text_embeddings.extend([document.metadata['vector'] for document in documents])
 
-        query_position = tsne_position_data.pop(0)
+        if projection == 'tsne':
+            tsne_position_data = cls.get_tsne_positions_from_embeddings(text_embeddings)
+        else:
+            tsne_position_data = EmbeddingProjection(dataset.id).project(text_embeddings)
 
-        i = 0
-        records = []
-        for document in documents:
-            index_node_id = document.metadata['doc_id']
+        query_position = tsne_position_data.pop(0)
 
-            segment = db.session.query(DocumentSegment).filter(
-                DocumentSegment.dataset_id == dataset.id,
-                DocumentSegment.enabled == True,
-                DocumentSegment.status == 'completed',
-                DocumentSegment.index_node_id == index_node_id
-            ).first()
+        index_node_ids = [document.metadata['doc_id'] for document in documents]
+        segments = SegmentHydrator(dataset.id).get_segments(index_node_ids)
+        index_node_id_to_segment = {segment.index_node_id: segment for segment in segments}
 
+        records = []
+        for i, document in enumerate(documents):
+            segment = index_node_id_to_segment.get(document.metadata['doc_id'])
             if not segment:
-                i += 1
                 continue
 
             record = {
@@ -100,8 +113,6 @@ class HitTestingService:
 
             records.append(record)
 
-            i += 1
-
         return {
             "query": {
                 "content": query,
@@ -0,0 +1,79 @@
+from typing import List
+
+from sqlalchemy import func, or_
+from sqlalchemy.dialects.postgresql import insert
+
+from core.helper.search_tokenizer import to_search_vector, to_ts_query
+from extensions.ext_database import db
+from models.model import Message, MessageSearchIndex
+
+
+class MessageSearchService:
+    """
+    Keyword search of the app logs over message_search_indexes, which holds the jieba tokenized query and
+    answer of each message in a GIN indexed tsvector, instead of ILIKE scans of all the messages of an app.
+    """
+
+    INDEX_BATCH_SIZE = 500
+
+    @classmethod
+    def index_messages(cls, messages: List[Message]) -> None:
+        """Add or replace the search index rows of messages."""
+        if not messages:
+            return
+
+        stmt = insert(MessageSearchIndex).values([{
+            'message_id': message.id,
+            'app_id': message.app_id,
+            'conversation_id': message.conversation_id,
+            'content': to_search_vector(f'{message.query}\n{message.answer}')
+        } for message in messages])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[MessageSearchIndex.message_id],
+            set_={'content': stmt.excluded.content}
+        )
+
+        db.session.execute(stmt)
+        db.session.commit()
+
+    @classmethod
+    def index_all_messages(cls) -> int:
+        """Index the messages of all apps in batches, for the messages created before the search index."""
+        count = 0
+        last_id = None
+        while True:
+            query = db.session.query(Message)
+            if last_id:
+                query = query.filter(Message.id > last_id)
+
+            messages = query.order_by(Message.id.asc()).limit(cls.INDEX_BATCH_SIZE).all()
+            if not messages:
+                break
+
+            cls.index_messages(messages)
+            count += len(messages)
+            last_id = messages[-1].id
+
+        return count
+
+    @classmethod
+    def search_conversation_ids(cls, app_id: str, keyword: str):
+        """
+        Select the ids of the conversations of an app with a message matching the keyword. Used as
+        `Conversation.id.in_(...)`, each conversation is listed once however many of its messages match.
+        """
+        ts_query = to_ts_query(keyword)
+        if ts_query is None:
+            # keywords of symbols only, which have no tokens
+            return db.select(Message.conversation_id).where(
+                Message.app_id == app_id,
+                or_(
+                    Message.query.ilike('%{}%'.format(keyword)),
+                    Message.answer.ilike('%{}%'.format(keyword))
+                )
+            )
+
+        return db.select(MessageSearchIndex.conversation_id).where(
+            MessageSearchIndex.app_id == app_id,
+            MessageSearchIndex.content.op('@@')(func.to_tsquery('simple', ts_query))
+        )
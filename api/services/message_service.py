@@ -2,6 +2,7 @@ from typing import Optional, Union, List
 
 from core.completion import Completion
 from core.generator.llm_generator import LLMGenerator
+from libs.cursor_pagination import filter_after
 from libs.infinite_scroll_pagination import InfiniteScrollPagination
 from extensions.ext_database import db
 from models.account import Account
@@ -91,26 +92,16 @@ class MessageService:
             if not last_message:
                 raise LastMessageNotExistsError()
 
-            history_messages = base_query.filter(
-                Message.created_at < last_message.created_at,
-                Message.id != last_message.id
-            ).order_by(Message.created_at.desc()).limit(limit).all()
-        else:
-            history_messages = base_query.order_by(Message.created_at.desc()).limit(limit).all()
+            base_query = filter_after(base_query, [Message.created_at, Message.id],
+                                      [last_message.created_at, last_message.id])
 
-        has_more = False
-        if len(history_messages) == limit:
-            current_page_first_message = history_messages[-1]
-            rest_count = base_query.filter(
-                Message.created_at < current_page_first_message.created_at,
-                Message.id != current_page_first_message.id
-            ).count()
+        # one more message tells whether there are more, the id orders the messages created in the same second
+        history_messages = base_query.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit + 1).all()
 
-            if rest_count > 0:
-                has_more = True
+        has_more = len(history_messages) > limit
 
         return InfiniteScrollPagination(
-            data=history_messages,
+            data=history_messages[:limit],
             limit=limit,
             has_more=has_more
         )
@@ -0,0 +1,34 @@
+import logging
+import time
+
+import click
+from celery import shared_task
+
+from extensions.ext_database import db
+from models.model import Message
+from services.message_search_service import MessageSearchService
+
+
+@shared_task(queue='generation')
+def add_message_to_search_index_task(message_id: str):
+    """
+    Async add message to the search index of the logs
+    :param message_id:
+
+    Usage: add_message_to_search_index_task.delay(message_id)
+    """
+    start_at = time.perf_counter()
+
+    message = db.session.query(Message).filter(Message.id == message_id).first()
+    if not message:
+        logging.info(click.style('Message not found: {}'.format(message_id), fg='red'))
+        return
+
+    try:
+        MessageSearchService.index_messages([message])
+
+        end_at = time.perf_counter()
+        logging.info(click.style('Message added to search index: {} latency: {}'.format(
+            message_id, end_at - start_at), fg='green'))
+    except Exception:
+        logging.exception("add message to search index failed")
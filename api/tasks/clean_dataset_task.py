@@ -4,6 +4,7 @@ import time
 import click
 from celery import shared_task
 
+from core.embedding.embedding_projection import EmbeddingProjection
 from core.index.index import IndexBuilder
 from extensions.ext_database import db
 from models.dataset import DocumentSegment, Dataset, DatasetKeywordTable, DatasetQuery, DatasetProcessRule, \
@@ -51,6 +52,11 @@ def clean_dataset_task(dataset_id: str, tenant_id: str, indexing_technique: str,
         except Exception:
             logging.exception("Delete nodes index failed when dataset deleted.")
 
+        try:
+            EmbeddingProjection(dataset_id).delete()
+        except Exception:
+            logging.exception("Delete projection basis failed when dataset deleted.")
+
         for document in documents:
             db.session.delete(document)
 
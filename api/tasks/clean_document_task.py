@@ -44,6 +44,7 @@ def clean_document_task(document_id: str, dataset_id: str):
         for segment in segments:
             db.session.delete(segment)
 
+        Dataset.update_counters(dataset_id)
         db.session.commit()
         end_at = time.perf_counter()
         logging.info(
@@ -0,0 +1,38 @@
+import logging
+import time
+
+import click
+from celery import shared_task
+
+from extensions.ext_database import db
+from models.model import UploadFile
+
+
+@shared_task(queue='dataset')
+def compute_indexing_estimate_task(upload_file_id: str, tmp_processing_rule: dict):
+    """
+    Async compute the exact indexing estimate of an upload file under a processing rule
+    :param upload_file_id:
+    :param tmp_processing_rule:
+
+    Usage: compute_indexing_estimate_task.delay(upload_file_id, tmp_processing_rule)
+    """
+    logging.info(click.style('Start compute indexing estimate: {}'.format(upload_file_id), fg='green'))
+    start_at = time.perf_counter()
+
+    upload_file = db.session.query(UploadFile).filter(UploadFile.id == upload_file_id).first()
+    if not upload_file or not upload_file.hash:
+        logging.info(click.style('Upload file not found or not hashed: {}'.format(upload_file_id), fg='red'))
+        return
+
+    # imported here, the runner imports the task
+    from core.indexing_runner import IndexingRunner
+
+    try:
+        estimate = IndexingRunner().compute_file_indexing_estimate(upload_file, tmp_processing_rule)
+
+        end_at = time.perf_counter()
+        logging.info(click.style('Computed indexing estimate: {} segments: {} latency: {}'.format(
+            upload_file_id, estimate['total_segments'], end_at - start_at), fg='green'))
+    except Exception:
+        logging.exception("compute indexing estimate failed")
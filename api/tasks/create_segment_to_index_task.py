@@ -11,7 +11,8 @@ from werkzeug.exceptions import NotFound
 from core.index.index import IndexBuilder
 from extensions.ext_database import db
 from extensions.ext_redis import redis_client
-from models.dataset import DocumentSegment
+from models.dataset import DocumentSegment, Dataset
+from models.dataset import Document as DatasetDocument
 
 
 @shared_task(queue='dataset')
@@ -87,6 +88,8 @@ def create_segment_to_index_task(segment_id: str, keywords: Optional[List[str]]
             DocumentSegment.completed_at: datetime.datetime.utcnow()
         }
         DocumentSegment.query.filter_by(id=segment.id).update(update_params)
+        DatasetDocument.update_counters(segment.document_id)
+        Dataset.update_counters(segment.dataset_id)
         db.session.commit()
 
         end_at = time.perf_counter()
@@ -97,6 +100,7 @@ def create_segment_to_index_task(segment_id: str, keywords: Optional[List[str]]
         segment.disabled_at = datetime.datetime.utcnow()
         segment.status = 'error'
         segment.error = str(e)
+        DatasetDocument.update_counters(segment.document_id)
         db.session.commit()
     finally:
         redis_client.delete(indexing_cache_key)
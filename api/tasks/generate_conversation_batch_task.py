@@ -0,0 +1,28 @@
+import logging
+import time
+
+import click
+from celery import shared_task
+
+
+@shared_task(queue='generation')
+def generate_conversation_batch_task(kind: str):
+    """
+    Async generate the names or summaries of the queued conversations
+    :param kind: name or summary
+
+    Usage: generate_conversation_batch_task.apply_async((kind,), countdown=interval)
+    """
+    # imported here, the service imports the task
+    from services.conversation_generation_service import ConversationGenerationService
+
+    start_at = time.perf_counter()
+
+    try:
+        generated = ConversationGenerationService.generate_pending(kind)
+
+        end_at = time.perf_counter()
+        logging.info(click.style('Conversation {} batch generated: {} conversations latency: {}'.format(
+            kind, generated, end_at - start_at), fg='green'))
+    except Exception:
+        logging.exception("generate conversation batch failed")
@@ -0,0 +1,27 @@
+import logging
+import time
+
+import click
+from celery import shared_task
+
+from services.app_statistic_service import AppStatisticService
+
+
+@shared_task(queue='generation')
+def rollup_app_statistics_task(app_id: str):
+    """
+    Async roll up the closed hours of the app statistics
+    :param app_id:
+
+    Usage: rollup_app_statistics_task.delay(app_id)
+    """
+    start_at = time.perf_counter()
+
+    try:
+        hours = AppStatisticService.rollup(app_id)
+
+        end_at = time.perf_counter()
+        logging.info(click.style('App statistics rolled up: {} hours: {} latency: {}'.format(
+            app_id, hours, end_at - start_at), fg='green'))
+    except Exception:
+        logging.exception("roll up app statistics failed")
@@ -0,0 +1,27 @@
+import inspect
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask
+
+from controllers.console.datasets.datasets_document import DatasetDocumentListApi
+from controllers.console.error import InvalidCursorError
+from libs.cursor_pagination import encode_cursor
+from models.dataset import Document
+
+
+@pytest.mark.parametrize('cursor', ['not base64!', encode_cursor(['only one value']), encode_cursor(['x', 'y'])])
+def test_document_list_rejects_an_invalid_cursor(mocker, cursor):
+    mocker.patch('controllers.console.datasets.datasets_document.current_user')
+    mocker.patch('controllers.console.datasets.datasets_document.DatasetService')
+    # the sort columns decode the cursor, the query is never run
+    mocker.patch('controllers.console.datasets.datasets_document.Document',
+                 created_at=Document.created_at, id=Document.id, hit_count=Document.hit_count)
+    # the view without the login and setup checks
+    get = inspect.unwrap(DatasetDocumentListApi.get)
+
+    with Flask(__name__).test_request_context('/', query_string={'cursor': cursor}):
+        with pytest.raises(InvalidCursorError) as e:
+            get(MagicMock(), 'dataset-1')
+
+    assert e.value.code == 400
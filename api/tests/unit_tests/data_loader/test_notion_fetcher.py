@@ -0,0 +1,79 @@
+import random
+import time
+from unittest.mock import MagicMock
+
+from core.data_loader.loader.notion_fetcher import NotionBlockFetcher, TokenBucket
+
+
+def _block(block_id: str, has_children: bool = False, block_type: str = 'paragraph') -> dict:
+    return {'id': block_id, 'type': block_type, 'has_children': has_children, block_type: {'rich_text': []}}
+
+
+# page -> [a, b (children), c (child page)], b -> 150 children over two result pages
+TREE = {
+    'page': [_block('a'), _block('b', has_children=True), _block('c', has_children=True, block_type='child_page')],
+    'b': [_block('b{}'.format(i)) for i in range(150)],
+}
+
+
+def _response(status_code: int, data: dict = None, headers: dict = None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    response.json.return_value = data or {}
+    return response
+
+
+def _fake_notion(rate_limited_once: bool = False):
+    calls = []
+
+    def request(method, url, params=None, json=None, timeout=None):
+        calls.append(url)
+        if rate_limited_once and len(calls) == 1:
+            return _response(429, headers={'Retry-After': '0.2'})
+
+        # children lists complete in random order
+        time.sleep(random.random() / 100)
+        block_id = url.split('/')[-2]
+        start = int((params or {}).get('start_cursor', 0))
+        children = TREE[block_id][start:start + 100]
+        next_cursor = str(start + 100) if start + 100 < len(TREE[block_id]) else None
+        return _response(200, {'results': children, 'next_cursor': next_cursor})
+
+    return request, calls
+
+
+def test_fetch_tree_follows_cursors_and_skips_child_pages(mocker):
+    request, calls = _fake_notion()
+    mocker.patch('requests.Session.request', side_effect=request)
+    mocker.patch.object(NotionBlockFetcher, '_get_bucket', return_value=TokenBucket(1000))
+
+    block_children = NotionBlockFetcher('token', max_workers=4).fetch_tree('page')
+
+    assert set(block_children) == {'page', 'b'}
+    assert [block['id'] for block in block_children['page']] == ['a', 'b', 'c']
+    assert [block['id'] for block in block_children['b']] == ['b{}'.format(i) for i in range(150)]
+    assert len(calls) == 3
+
+
+def test_request_waits_retry_after(mocker):
+    request, calls = _fake_notion(rate_limited_once=True)
+    mocker.patch('requests.Session.request', side_effect=request)
+    mocker.patch.object(NotionBlockFetcher, '_get_bucket', return_value=TokenBucket(1000))
+
+    start = time.monotonic()
+    children = NotionBlockFetcher('token').fetch_children('page')
+
+    assert time.monotonic() - start >= 0.2
+    assert [block['id'] for block in children] == ['a', 'b', 'c']
+    assert len(calls) == 2
+
+
+def test_token_bucket_limits_rate():
+    bucket = TokenBucket(rate=20, capacity=1)
+
+    start = time.monotonic()
+    for _ in range(5):
+        bucket.acquire()
+
+    assert time.monotonic() - start >= 0.19
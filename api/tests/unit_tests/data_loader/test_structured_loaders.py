@@ -0,0 +1,108 @@
+import random
+import re
+
+from core.data_loader.loader.html import HTMLLoader
+from core.data_loader.loader.markdown import MarkdownLoader
+
+# "dataset" in chinese
+DATASET_ZH = '\u6570\u636e\u96c6'
+
+
+def legacy_markdown_to_tups(markdown_text):
+    markdown_tups = []
+    lines = markdown_text.split("\n")
+
+    current_header = None
+    current_text = ""
+
+    for line in lines:
+        header_match = re.match(r"^#+\s", line)
+        if header_match:
+            if current_header is not None:
+                markdown_tups.append((current_header, current_text))
+
+            current_header = line
+            current_text = ""
+        else:
+            current_text += line + "\n"
+    markdown_tups.append((current_header, current_text))
+
+    if current_header is not None:
+        markdown_tups = [
+            (re.sub(r"#", "", key).strip(), re.sub(r"<.*?>", "", value))
+            for key, value in markdown_tups
+        ]
+    else:
+        markdown_tups = [
+            (key, re.sub("\n", "", value)) for key, value in markdown_tups
+        ]
+
+    return markdown_tups
+
+
+def test_markdown_to_tups_matches_legacy():
+    rng = random.Random(0)
+    pieces = ['# Title', '## Sub', '### Deep', '#NoSpace', 'text <b>bold</b>', '', '  ', 'a # b', DATASET_ZH]
+    loader = MarkdownLoader('unused.md')
+    for _ in range(500):
+        markdown_text = '\n'.join(rng.choice(pieces) for _ in range(rng.randint(0, 20)))
+        assert loader.markdown_to_tups(markdown_text) == legacy_markdown_to_tups(markdown_text)
+
+
+def test_markdown_heading_hierarchy(tmp_path):
+    file_path = tmp_path / 'guide.md'
+    file_path.write_text('# Guide\nabout [dify](https://dify.ai)\n## Install\nsteps\n### Docker\nrun\n'
+                         '## Usage\nuse\n# FAQ\nq\n', encoding='utf-8')
+
+    documents = MarkdownLoader(str(file_path)).load()
+
+    assert [document.page_content for document in documents] == [
+        '\n\nGuide\nabout dify', '\n\nInstall\nsteps', '\n\nDocker\nrun', '\n\nUsage\nuse', '\n\nFAQ\nq'
+    ]
+    assert [document.metadata['headings'] for document in documents] == [
+        'Guide', 'Guide > Install', 'Guide > Install > Docker', 'Guide > Usage', 'FAQ'
+    ]
+
+
+def test_html_sections(tmp_path):
+    file_path = tmp_path / 'guide.html'
+    file_path.write_text('<html><head><title>T</title><style>p {}</style></head><body>'
+                         '<p>intro</p><h1>Guide</h1><p>about <b>dify</b></p><script>var x = 1</script>'
+                         '<h2>Install</h2><ul><li>one</li><li>two</li></ul><h3>Docker</h3><p>run</p>'
+                         '<h2>Usage</h2><p>use &amp; share</p><h1>FAQ</h1><!-- comment --><div>q</div>'
+                         '</body></html>', encoding='utf-8')
+
+    documents = HTMLLoader(str(file_path)).load()
+
+    assert [document.page_content for document in documents] == [
+        'intro', 'Guide\nabout dify', 'Install\none\ntwo', 'Docker\nrun', 'Usage\nuse & share', 'FAQ\nq'
+    ]
+    assert [document.metadata.get('headings') for document in documents] == [
+        None, 'Guide', 'Guide > Install', 'Guide > Install > Docker', 'Guide > Usage', 'FAQ'
+    ]
+
+
+def test_html_streams_large_file_in_chunks(tmp_path, mocker):
+    mocker.patch.object(HTMLLoader, 'READ_CHUNK_SIZE', 1024)
+    file_path = tmp_path / 'large.html'
+    file_path.write_text(''.join(f'<h2>\u7b2c{i}\u8282</h2><p>{(DATASET_ZH + " ") * 100}</p>' for i in range(50)),
+                         encoding='utf-8')
+
+    documents = HTMLLoader(str(file_path)).load()
+
+    assert len(documents) == 50
+    assert documents[7].metadata['headings'] == '\u7b2c7\u8282'
+    assert documents[7].page_content == '\u7b2c7\u8282\n' + ' '.join([DATASET_ZH] * 100)
+
+
+def test_html_encodings(tmp_path):
+    gbk_file_path = tmp_path / 'gbk.html'
+    gbk_file_path.write_bytes(('<meta charset="gbk"><p>' + DATASET_ZH + '</p>').encode('gbk'))
+    undeclared_file_path = tmp_path / 'utf8.html'
+    undeclared_file_path.write_bytes(('<p>' + DATASET_ZH + '</p>').encode('utf-8'))
+    empty_file_path = tmp_path / 'empty.html'
+    empty_file_path.write_bytes(b'')
+
+    assert [document.page_content for document in HTMLLoader(str(gbk_file_path)).load()] == [DATASET_ZH]
+    assert [document.page_content for document in HTMLLoader(str(undeclared_file_path)).load()] == [DATASET_ZH]
+    assert HTMLLoader(str(empty_file_path)).load() == []
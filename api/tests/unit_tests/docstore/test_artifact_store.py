@@ -0,0 +1,59 @@
+import json
+
+import pytest
+from langchain.schema import Document
+
+from core.docstore.artifact_store import ArtifactStore
+from models.dataset import DatasetProcessRule
+
+FILE_HASH = '3a985da74fe225b2045c172d6bd390bd855f086e3e9d525b46bfe24511431532'
+
+
+@pytest.fixture
+def fake_storage(mocker):
+    store = {}
+
+    def load(key):
+        if key not in store:
+            raise FileNotFoundError("File not found")
+        return store[key]
+
+    mocker.patch('extensions.ext_storage.storage.load', side_effect=load)
+    mocker.patch('extensions.ext_storage.storage.save', side_effect=lambda key, data: store.__setitem__(key, data))
+    return store
+
+
+def test_rule_hash_depends_on_rules_and_doc_form():
+    automatic_rule = DatasetProcessRule(mode='automatic')
+    custom_rule = DatasetProcessRule(mode='custom', rules=json.dumps(DatasetProcessRule.AUTOMATIC_RULES))
+
+    assert ArtifactStore.generate_rule_hash(automatic_rule) == ArtifactStore.generate_rule_hash(automatic_rule)
+    assert ArtifactStore.generate_rule_hash(automatic_rule) != ArtifactStore.generate_rule_hash(custom_rule)
+    assert ArtifactStore.generate_rule_hash(automatic_rule) \
+        != ArtifactStore.generate_rule_hash(automatic_rule, 'qa_model')
+
+
+def test_segments_round_trip_without_document_metadata(fake_storage):
+    artifact_store = ArtifactStore(FILE_HASH)
+    assert artifact_store.get_segments('rule') is None
+
+    artifact_store.save_segments('rule', 11, [Document(page_content='hello world', metadata={
+        'doc_id': 'a', 'doc_hash': 'b', 'document_id': 'c', 'dataset_id': 'd', 'source': '/tmp/x.pdf', 'page': 0
+    })])
+
+    cached_segments = artifact_store.get_segments('rule')
+    segments = list(cached_segments['segments'])
+
+    assert cached_segments['word_count'] == 11
+    assert [segment.page_content for segment in segments] == ['hello world']
+    assert segments[0].metadata == {'doc_hash': 'b', 'page': 0}
+    assert artifact_store.get_text_docs() is None
+
+
+def test_estimates_are_kept_per_embedding_model(fake_storage):
+    artifact_store = ArtifactStore(FILE_HASH)
+    artifact_store.save_estimate('rule', 'openai/text-embedding-ada-002', 2, 200, ['a'])
+
+    assert artifact_store.get_estimate('rule', 'openai/text-embedding-ada-002')['tokens'] == 200
+    # another tokenizer counts the tokens of the same segments differently
+    assert artifact_store.get_estimate('rule', 'minimax/embo-01') is None
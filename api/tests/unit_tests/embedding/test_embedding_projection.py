@@ -0,0 +1,82 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from core.embedding.embedding_projection import EmbeddingProjection
+from services.hit_testing_service import HitTestingService
+
+DATASET_ID = '8f4b5e2c-3d1a-4f6e-9b7c-2a1d0e9f8c7b'
+DIMENSION = 1536
+
+
+@pytest.fixture
+def fake_redis(mocker):
+    store = {}
+    mocker.patch('extensions.ext_redis.redis_client.get', side_effect=lambda key: store.get(key))
+    mocker.patch('extensions.ext_redis.redis_client.set',
+                 side_effect=lambda key, value: store.__setitem__(key, value))
+    mocker.patch('extensions.ext_redis.redis_client.delete', side_effect=lambda key: store.pop(key, None))
+    return store
+
+
+def _clustered_embeddings(n: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((4, DIMENSION))
+    return centers[rng.integers(0, 4, n)] + 0.1 * rng.standard_normal((n, DIMENSION))
+
+
+def test_fit_caches_basis(fake_redis):
+    projection = EmbeddingProjection(DATASET_ID)
+    basis = projection.fit(_clustered_embeddings(100).tolist())
+
+    assert basis.components.shape == (DIMENSION, 2)
+    assert projection.get_basis().n_samples == 100
+
+    # a basis fitted on more samples is kept, layouts stay stable across indexing runs
+    assert projection.fit(_clustered_embeddings(50, seed=1).tolist()).n_samples == 100
+
+
+def test_project_without_basis_uses_stable_random_projection(fake_redis):
+    embeddings = _clustered_embeddings(11).tolist()
+
+    positions = EmbeddingProjection(DATASET_ID).project(embeddings)
+
+    assert len(positions) == 11
+    assert positions == EmbeddingProjection(DATASET_ID).project(embeddings)
+
+
+def _requests() -> list:
+    # two queries retrieving the same hits
+    hits = _clustered_embeddings(10, seed=2)
+    return [np.vstack([_clustered_embeddings(1, seed=seed), hits]).tolist() for seed in (3, 4)]
+
+
+def test_projection_keeps_the_hits_in_place_across_queries(fake_redis):
+    projection = EmbeddingProjection(DATASET_ID)
+    projection.fit(_clustered_embeddings(256).tolist())
+
+    first, second = (projection.project(request)[1:] for request in _requests())
+
+    assert first == second
+
+
+@pytest.mark.skipif(not os.environ.get('RUN_BENCHMARKS'), reason='set RUN_BENCHMARKS to run the benchmarks')
+def test_projection_benchmark_against_tsne(fake_redis):
+    """Latency of the projection basis against a fresh t-SNE per request."""
+    projection = EmbeddingProjection(DATASET_ID)
+    projection.fit(_clustered_embeddings(256).tolist())
+    requests = _requests()
+
+    start = time.perf_counter()
+    for request in requests:
+        projection.project(request)
+    projection_latency = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for request in requests:
+        HitTestingService.get_tsne_positions_from_embeddings(request)
+    tsne_latency = time.perf_counter() - start
+
+    assert projection_latency < tsne_latency
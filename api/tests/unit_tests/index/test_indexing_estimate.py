@@ -0,0 +1,138 @@
+from unittest.mock import MagicMock
+
+import pytest
+from flask import Flask
+from langchain.schema import Document
+from langchain.text_splitter import CharacterTextSplitter
+
+from core.data_loader.file_extractor import FileExtractor
+from core.indexing_runner import IndexingRunner
+
+PROCESSING_RULE = {'mode': 'automatic', 'rules': {}}
+EMBEDDING_MODEL_NAME = 'openai/text-embedding-ada-002'
+
+
+@pytest.fixture
+def embedding_model(mocker):
+    embedding_model = MagicMock()
+    embedding_model.get_num_tokens.side_effect = lambda text: len(text.split())
+    embedding_model.get_token_price.return_value = 0
+    embedding_model.get_currency.return_value = 'USD'
+    embedding_model.model_provider.provider_name = 'openai'
+    embedding_model.name = 'text-embedding-ada-002'
+    mocker.patch('core.indexing_runner.ModelFactory.get_embedding_model', return_value=embedding_model)
+    return embedding_model
+
+
+@pytest.fixture(autouse=True)
+def splitter(mocker):
+    # one segment per text document, the token splitters download their encoding
+    mocker.patch.object(IndexingRunner, '_get_splitter',
+                        return_value=CharacterTextSplitter(chunk_size=1000, chunk_overlap=0))
+
+
+@pytest.fixture
+def artifact_store(mocker):
+    artifact_store = MagicMock()
+    mocker.patch('core.indexing_runner.ArtifactStore', return_value=artifact_store,
+                 generate_rule_hash=MagicMock(return_value='rule-hash'))
+    return artifact_store
+
+
+def _upload_file(file_hash='file-hash'):
+    return MagicMock(id='file-1', hash=file_hash, tenant_id='tenant-1')
+
+
+def _text_docs(count):
+    return [Document(page_content=' '.join(['word'] * 100), metadata={}) for _ in range(count)]
+
+
+def test_sample_documents_from_the_start():
+    documents = [Document(page_content='a' * 10, metadata={}) for _ in range(10)]
+
+    sampled_documents, scale = FileExtractor.sample_documents(documents, 25)
+
+    assert len(sampled_documents) == 3
+    assert scale == 100 / 30
+
+
+def test_sample_documents_of_a_small_source_are_exact():
+    documents = [Document(page_content='a' * 10, metadata={}) for _ in range(2)]
+
+    sampled_documents, scale = FileExtractor.sample_documents(documents, 25)
+
+    assert len(sampled_documents) == 2
+    assert scale == 1.0
+
+
+def test_file_estimate_from_the_cache(mocker, embedding_model, artifact_store):
+    artifact_store.get_estimate.return_value = {'total_segments': 40, 'tokens': 4000, 'preview': ['a', 'b']}
+    sample = mocker.patch('core.indexing_runner.FileExtractor.sample')
+
+    estimate = IndexingRunner().file_indexing_estimate('tenant-1', [_upload_file()], PROCESSING_RULE)
+
+    artifact_store.get_estimate.assert_called_once_with('rule-hash', EMBEDDING_MODEL_NAME)
+
+    assert estimate['total_segments'] == 40
+    assert estimate['tokens'] == 4000
+    assert estimate['preview'] == ['a', 'b']
+    assert estimate['exact'] is True
+    sample.assert_not_called()
+
+
+def test_file_estimate_extrapolates_a_sample_and_computes_the_exact_estimate_later(mocker, embedding_model,
+                                                                                    artifact_store):
+    artifact_store.get_estimate.return_value = None
+    mocker.patch('core.indexing_runner.FileExtractor.sample', return_value=(_text_docs(4), 2.5))
+    redis_client = mocker.patch('core.indexing_runner.redis_client')
+    redis_client.set.side_effect = [True, None]
+    task = mocker.patch('core.indexing_runner.compute_indexing_estimate_task')
+
+    with Flask(__name__).app_context():
+        estimate = IndexingRunner().file_indexing_estimate('tenant-1', [_upload_file()], PROCESSING_RULE)
+        IndexingRunner().file_indexing_estimate('tenant-1', [_upload_file()], PROCESSING_RULE)
+
+    assert estimate['total_segments'] == 10
+    assert estimate['tokens'] == 1000
+    assert len(estimate['preview']) == 4
+    assert estimate['exact'] is False
+    artifact_store.save_estimate.assert_not_called()
+    task.delay.assert_called_once_with('file-1', PROCESSING_RULE)
+
+
+def test_file_estimate_of_a_fully_sampled_file_is_cached(mocker, embedding_model, artifact_store):
+    artifact_store.get_estimate.return_value = None
+    mocker.patch('core.indexing_runner.FileExtractor.sample', return_value=(_text_docs(2), 1.0))
+
+    estimate = IndexingRunner().file_indexing_estimate('tenant-1', [_upload_file()], PROCESSING_RULE)
+
+    assert estimate['exact'] is True
+    artifact_store.save_estimate.assert_called_once_with('rule-hash', EMBEDDING_MODEL_NAME, 2, 200, estimate['preview'])
+
+
+def test_compute_file_estimate_saves_the_segments_for_the_indexing(mocker, embedding_model, artifact_store):
+    artifact_store.get_segments.return_value = None
+    artifact_store.get_text_docs.return_value = iter(_text_docs(3))
+
+    estimate = IndexingRunner().compute_file_indexing_estimate(_upload_file(), PROCESSING_RULE)
+
+    assert estimate['total_segments'] == 3
+    assert estimate['tokens'] == 300
+    rule_hash, word_count, segments = artifact_store.save_segments.call_args[0]
+    assert rule_hash == 'rule-hash'
+    assert len(segments) == 3
+    artifact_store.save_estimate.assert_called_once_with('rule-hash', EMBEDDING_MODEL_NAME, 3, 300, estimate['preview'])
+
+
+def test_artifacts_beyond_the_max_length_are_not_kept(mocker):
+    mocker.patch.object(IndexingRunner, 'MAX_ARTIFACT_LENGTH', 1200)
+    save_func = MagicMock()
+
+    documents = list(IndexingRunner()._save_artifact_on_exhausted(iter(_text_docs(3)), save_func))
+
+    assert len(documents) == 3
+    save_func.assert_not_called()
+
+    list(IndexingRunner()._save_artifact_on_exhausted(iter(_text_docs(2)), save_func))
+
+    assert len(save_func.call_args[0][0]) == 2
@@ -0,0 +1,40 @@
+import random
+
+import pytest
+from flask import Flask
+
+from core.index.keyword_table_index.jieba_keyword_table_handler import JiebaKeywordTableHandler
+from core.indexing_process_pool import IndexingProcessPool
+
+
+def test_pool_disabled_by_default():
+    app = Flask(__name__)
+    with app.app_context():
+        assert IndexingProcessPool.get() is None
+
+
+@pytest.fixture
+def pool_app():
+    app = Flask(__name__)
+    app.config['INDEXING_PROCESS_POOL_WORKERS'] = 2
+    yield app
+
+    if IndexingProcessPool._pool is not None:
+        IndexingProcessPool._pool.shutdown()
+        IndexingProcessPool._pool = None
+        IndexingProcessPool._max_workers = 0
+
+
+def test_extract_keywords_in_pool_matches_in_process(pool_app):
+    rng = random.Random(0)
+    # chinese words for dataset, segment, index, keyword and vector
+    words = ['\u6570\u636e\u96c6', '\u5206\u6bb5', '\u7d22\u5f15', '\u5173\u952e\u8bcd', '\u5411\u91cf',
+             'dataset', 'segment', 'keyword', 'embedding', 'index']
+    texts = [' '.join(rng.choice(words) for _ in range(rng.randint(5, 50))) for _ in range(37)]
+
+    with pool_app.app_context():
+        keywords_list = IndexingProcessPool.get().extract_keywords(texts, 10)
+
+    keyword_table_handler = JiebaKeywordTableHandler()
+    assert [set(keywords) for keywords in keywords_list] \
+        == [keyword_table_handler.extract_keywords(text, 10) for text in texts]
@@ -0,0 +1,64 @@
+import json
+from unittest.mock import MagicMock
+
+from core.indexing_progress import IndexingProgress
+
+
+def test_segment_counts_of_all_documents_in_one_query(mocker):
+    db = mocker.patch('core.indexing_progress.db')
+    query = db.session.query.return_value.filter.return_value.group_by.return_value
+    query.all.return_value = [('doc-1', 3, 10)]
+
+    counts = IndexingProgress.get_segment_counts(['doc-1', 'doc-2'])
+
+    assert counts == {'doc-1': (3, 10), 'doc-2': (0, 0)}
+    assert db.session.query.call_count == 1
+
+
+def _fake_pubsub(mocker, events):
+    messages = [None if event is None else {'type': 'message', 'data': json.dumps(event)} for event in events]
+    pubsub = MagicMock()
+    pubsub.get_message.side_effect = messages + [None] * 100
+    mocker.patch('core.indexing_progress.redis_client.pubsub', return_value=pubsub)
+    return pubsub
+
+
+def _event(document_id, indexing_status, completed_segments=0, total_segments=0):
+    return {
+        'id': document_id,
+        'indexing_status': indexing_status,
+        'completed_segments': completed_segments,
+        'total_segments': total_segments
+    }
+
+
+def test_listen_follows_events_until_documents_finish(mocker):
+    pubsub = _fake_pubsub(mocker, [
+        _event('doc-1', 'indexing', 5, 10),
+        _event('other', 'indexing'),
+        None,
+        _event('doc-1', 'completed', 10, 10),
+        _event('doc-1', 'indexing', 5, 10),
+    ])
+    snapshot = MagicMock(return_value=[_event('doc-1', 'indexing', 0, 10), _event('doc-2', 'error')])
+
+    statuses = list(IndexingProgress.listen('dataset-id', ['doc-1', 'doc-2'], snapshot, ping_interval=60))
+
+    assert statuses == [
+        _event('doc-1', 'indexing', 0, 10),
+        _event('doc-2', 'error'),
+        _event('doc-1', 'indexing', 5, 10),
+        _event('doc-1', 'completed', 10, 10),
+    ]
+    pubsub.subscribe.assert_called_once_with('dataset_indexing_progress:dataset-id')
+    pubsub.close.assert_called_once()
+    snapshot.assert_called_once()
+
+
+def test_listen_pings_and_resyncs_without_events(mocker):
+    _fake_pubsub(mocker, [])
+    snapshot = MagicMock(side_effect=[[_event('doc-1', 'indexing')], [_event('doc-1', 'paused')]])
+
+    statuses = list(IndexingProgress.listen('dataset-id', ['doc-1'], snapshot, resync_interval=0, ping_interval=0))
+
+    assert statuses == [_event('doc-1', 'indexing'), None, _event('doc-1', 'paused')]
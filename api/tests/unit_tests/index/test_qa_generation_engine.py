@@ -0,0 +1,131 @@
+import json
+import threading
+import time
+
+import pytest
+from flask import Flask
+from langchain.schema import Document
+
+from core.generator.qa_generation_engine import QAGenerationEngine, QAGenerationError, parse_qa_pairs
+from core.model_providers.error import LLMRateLimitError, LLMBadRequestError
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    app.config['QA_GENERATION_MAX_WORKERS'] = 4
+    app.config['QA_GENERATION_RATE_LIMIT'] = 1000
+    with app.app_context():
+        yield app
+
+
+@pytest.fixture
+def redis(mocker):
+    store = {}
+    redis_client = mocker.patch('core.generator.qa_generation_engine.redis_client')
+    redis_client.get.side_effect = store.get
+    redis_client.setex.side_effect = lambda key, ttl, value: store.__setitem__(key, value)
+    return store
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(mocker):
+    mocker.patch.object(QAGenerationEngine, 'RETRY_BACKOFF', 0)
+    mocker.patch.object(QAGenerationEngine, '_buckets', {})
+
+
+def _node(content):
+    return Document(page_content=content, metadata={'doc_hash': 'hash-' + content, 'dataset_id': 'dataset-1'})
+
+
+def _response(content):
+    return 'Q1: question of {}\nA1: answer of {}'.format(content, content)
+
+
+def test_parse_qa_pairs():
+    pairs = parse_qa_pairs('Q1: What is it?\nA1: A thing.\nQ2: Why?\nA2: Because.\nQ3: Nothing?\nA3: ')
+
+    assert pairs == [
+        {'question': 'What is it?', 'answer': 'A thing.'},
+        {'question': 'Why?', 'answer': 'Because.'}
+    ]
+
+
+def test_generate_keeps_the_order_of_the_nodes(app, redis, mocker):
+    def generate_qa_document(tenant_id, content):
+        # the first nodes complete last
+        time.sleep(0.01 * (5 - int(content)))
+        return _response(content)
+
+    mocker.patch('core.generator.qa_generation_engine.LLMGenerator.generate_qa_document',
+                 side_effect=generate_qa_document)
+
+    documents = QAGenerationEngine('tenant-1').generate([_node(str(i)) for i in range(5)] + [_node(' ')])
+
+    assert [document.page_content for document in documents] == ['question of {}'.format(i) for i in range(5)]
+    assert documents[0].metadata['answer'] == 'answer of 0'
+    assert documents[0].metadata['dataset_id'] == 'dataset-1'
+    assert documents[0].metadata['doc_hash'] != 'hash-0'
+
+
+def test_generate_retries_rate_limited_requests(app, redis, mocker):
+    generate_qa_document = mocker.patch('core.generator.qa_generation_engine.LLMGenerator.generate_qa_document',
+                                        side_effect=[LLMRateLimitError('rate limited'), _response('1')])
+
+    documents = QAGenerationEngine('tenant-1').generate([_node('1')])
+
+    assert [document.page_content for document in documents] == ['question of 1']
+    assert generate_qa_document.call_count == 2
+
+
+def test_generate_raises_after_the_retries(app, redis, mocker):
+    mocker.patch('core.generator.qa_generation_engine.LLMGenerator.generate_qa_document',
+                 side_effect=LLMRateLimitError('rate limited'))
+
+    with pytest.raises(QAGenerationError):
+        QAGenerationEngine('tenant-1').generate([_node('1')])
+
+
+def test_generate_does_not_retry_other_errors(app, redis, mocker):
+    generate_qa_document = mocker.patch('core.generator.qa_generation_engine.LLMGenerator.generate_qa_document',
+                                        side_effect=LLMBadRequestError('bad request'))
+
+    with pytest.raises(LLMBadRequestError):
+        QAGenerationEngine('tenant-1').generate([_node('1')])
+
+    assert generate_qa_document.call_count == 1
+
+
+def test_generate_resumes_from_the_checkpoints(app, redis, mocker):
+    redis['qa_generation_checkpoint:tenant-1:hash-1'] = json.dumps([{'question': 'cached', 'answer': 'answer'}])
+    generate_qa_document = mocker.patch('core.generator.qa_generation_engine.LLMGenerator.generate_qa_document',
+                                        side_effect=lambda tenant_id, content: _response(content))
+
+    documents = QAGenerationEngine('tenant-1').generate([_node('1'), _node('2')])
+
+    assert [document.page_content for document in documents] == ['cached', 'question of 2']
+    generate_qa_document.assert_called_once_with('tenant-1', '2')
+    assert 'qa_generation_checkpoint:tenant-1:hash-2' in redis
+
+
+def test_generate_is_bounded_by_the_workers(app, redis, mocker):
+    app.config['QA_GENERATION_MAX_WORKERS'] = 2
+    lock = threading.Lock()
+    running = []
+    max_running = []
+
+    def generate_qa_document(tenant_id, content):
+        with lock:
+            running.append(content)
+            max_running.append(len(running))
+        time.sleep(0.01)
+        with lock:
+            running.remove(content)
+        return _response(content)
+
+    mocker.patch('core.generator.qa_generation_engine.LLMGenerator.generate_qa_document',
+                 side_effect=generate_qa_document)
+
+    QAGenerationEngine('tenant-1').generate([_node(str(i)) for i in range(6)])
+
+    assert max(max_running) <= 2
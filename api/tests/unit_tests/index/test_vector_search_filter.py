@@ -0,0 +1,59 @@
+from unittest.mock import MagicMock
+
+from langchain.schema import Document
+
+from core.index.vector_index.base import VectorSearchFilter
+from core.index.vector_index.qdrant_vector_index import QdrantVectorIndex, QdrantConfig
+
+
+def _unavailable_documents(mocker, count):
+    db = mocker.patch('core.index.vector_index.base.db')
+    db.session.query.return_value.filter.return_value.limit.return_value.all.return_value = \
+        [MagicMock(id='document-{}'.format(i)) for i in range(count)]
+    return db
+
+
+def _hit(document_id):
+    return Document(page_content='content', metadata={'doc_id': 'node-' + str(document_id),
+                                                      'document_id': document_id})
+
+
+def test_available_documents_excludes_the_unavailable_documents_in_the_query(mocker):
+    _unavailable_documents(mocker, 3)
+
+    metadata_filter = VectorSearchFilter.available_documents('dataset-1')
+
+    assert metadata_filter.exclude_document_ids == ['document-0', 'document-1', 'document-2']
+    assert metadata_filter.post_filter_dataset_id is None
+
+
+def test_available_documents_post_filters_beyond_the_cap(mocker):
+    mocker.patch.object(VectorSearchFilter, 'MAX_EXCLUDED_DOCUMENTS', 2)
+    db = _unavailable_documents(mocker, 3)
+
+    metadata_filter = VectorSearchFilter.available_documents('dataset-1', doc_form='text_model')
+
+    assert metadata_filter.is_empty
+    assert metadata_filter.post_filter_dataset_id == 'dataset-1'
+    db.session.query.return_value.filter.return_value.limit.assert_called_once_with(3)
+
+    # the hits are checked against the available documents
+    db.session.query.return_value.filter.return_value.all.return_value = [MagicMock(id='document-1')]
+    documents = metadata_filter.filter_documents([_hit('document-0'), _hit('document-1'), _hit(None)])
+
+    assert [document.metadata['document_id'] for document in documents] == ['document-1', None]
+
+
+def test_qdrant_payload_index_is_created_once_when_the_index_is_opened(mocker):
+    mocker.patch.object(QdrantVectorIndex, '_payload_indexed_collections', set())
+    client = MagicMock()
+    mocker.patch('qdrant_client.QdrantClient', return_value=client)
+    mocker.patch('core.index.vector_index.qdrant_vector_index.QdrantVectorStore')
+    dataset = MagicMock(id='dataset-1', index_struct_dict=None)
+
+    for _ in range(2):
+        QdrantVectorIndex(dataset, QdrantConfig(endpoint='http://localhost:6333', api_key=None, root_path=None),
+                          MagicMock())._get_vector_store()
+
+    client.create_payload_index.assert_called_once()
+    assert client.create_payload_index.call_args[1]['field_name'] == 'metadata.document_id'
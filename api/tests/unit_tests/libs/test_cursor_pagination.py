@@ -0,0 +1,76 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Query
+
+from libs.cursor_pagination import encode_cursor, decode_cursor, paginate_by_cursor, estimate_count
+from models.dataset import DocumentSegment
+from models.model import Conversation
+
+COLUMNS = [Conversation.created_at, Conversation.id]
+
+
+def test_cursor_round_trip():
+    values = [datetime(2023, 8, 17, 9, 30, 5), 'c2a5b7a4-0d8e-4c3c-9d0e-6f2a1b3c4d5e']
+
+    assert decode_cursor(encode_cursor(values), COLUMNS) == values
+
+
+@pytest.mark.parametrize('cursor', ['not base64!', encode_cursor(['only one value']), encode_cursor(['x', 'y'])])
+def test_invalid_cursor(cursor):
+    with pytest.raises(ValueError, match='Invalid cursor'):
+        decode_cursor(cursor, COLUMNS)
+
+
+def _conversations(count):
+    return [Conversation(id=str(i), created_at=datetime(2023, 8, 17, 9, 30, i)) for i in range(count, 0, -1)]
+
+
+def test_paginate_after_cursor(mocker):
+    queries = []
+
+    def all_(query):
+        queries.append(query.statement.compile(dialect=postgresql.dialect()))
+        return _conversations(3)
+
+    mocker.patch.object(Query, 'all', all_)
+    cursor = encode_cursor([datetime(2023, 8, 17, 9, 31), 'last-id'])
+
+    pagination = paginate_by_cursor(Query(Conversation), COLUMNS, cursor, limit=2)
+
+    sql = str(queries[0])
+    assert 'WHERE (conversations.created_at, conversations.id) < (%(param_1)s, %(param_2)s)' in sql
+    assert 'ORDER BY conversations.created_at DESC, conversations.id DESC' in sql
+    assert queries[0].params['param_1'] == datetime(2023, 8, 17, 9, 31)
+    assert queries[0].params['param_2'] == 'last-id'
+    assert queries[0].params['param_3'] == 3
+    assert [conversation.id for conversation in pagination.data] == ['3', '2']
+    assert pagination.has_more
+    assert decode_cursor(pagination.next_cursor, COLUMNS) == [datetime(2023, 8, 17, 9, 30, 2), '2']
+
+
+def test_paginate_last_page(mocker):
+    mocker.patch.object(Query, 'all', lambda query: _conversations(1))
+
+    pagination = paginate_by_cursor(Query(Conversation), COLUMNS, None, limit=2)
+
+    assert len(pagination.data) == 1
+    assert not pagination.has_more
+    assert pagination.next_cursor is None
+
+
+def test_estimate_count_expands_in_lists(mocker):
+    connection = mocker.patch('libs.cursor_pagination.db').session.connection.return_value
+    connection.dialect = postgresql.dialect()
+    connection.exec_driver_sql.return_value.scalar.return_value = [{'Plan': {'Plan Rows': 1500}}]
+    query = Query(DocumentSegment.id).filter(DocumentSegment.status.in_(['completed', 'error']))
+
+    assert estimate_count(query) == 1500
+
+    sql, params = connection.exec_driver_sql.call_args[0]
+    assert 'POSTCOMPILE' not in sql
+    assert sql.startswith('EXPLAIN (FORMAT JSON) SELECT')
+    assert 'document_segments.status IN (%(status_1_1)s, %(status_1_2)s)' in sql
+    assert params['status_1_1'] == 'completed'
+    assert params['status_1_2'] == 'error'
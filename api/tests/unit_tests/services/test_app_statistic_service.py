@@ -0,0 +1,49 @@
+import datetime
+
+from services.app_statistic_service import AppStatisticService, MIN_DATETIME, MAX_DATETIME
+
+
+def _range_args(mocker, rolled_up_to, timezone='Asia/Shanghai', start=None, end=None):
+    mocker.patch.object(AppStatisticService, 'get_rolled_up_to', return_value=rolled_up_to)
+    return AppStatisticService._get_range_args('app_id', timezone, start, end)
+
+
+def test_range_without_rollups_reads_messages(mocker):
+    start = datetime.datetime(2023, 8, 1, 16, 0)
+    arg_dict = _range_args(mocker, None, start=start)
+
+    assert arg_dict['start'] == start
+    assert arg_dict['end'] == MAX_DATETIME
+    assert arg_dict['rollup_start'] == arg_dict['rollup_end'] == start
+
+
+def test_range_reads_whole_hours_from_rollups(mocker):
+    arg_dict = _range_args(mocker, datetime.datetime(2023, 8, 10, 8),
+                           start=datetime.datetime(2023, 8, 1, 15, 30),
+                           end=datetime.datetime(2023, 8, 9, 15, 30))
+
+    assert arg_dict['rollup_start'] == datetime.datetime(2023, 8, 1, 16)
+    assert arg_dict['rollup_end'] == datetime.datetime(2023, 8, 9, 15)
+
+
+def test_range_reads_messages_after_rolled_up_hours(mocker):
+    arg_dict = _range_args(mocker, datetime.datetime(2023, 8, 10, 8))
+
+    assert arg_dict['start'] == MIN_DATETIME
+    assert arg_dict['rollup_start'] == MIN_DATETIME
+    assert arg_dict['rollup_end'] == datetime.datetime(2023, 8, 10, 8)
+
+
+def test_range_within_an_hour_reads_messages(mocker):
+    arg_dict = _range_args(mocker, datetime.datetime(2023, 8, 10, 8),
+                           start=datetime.datetime(2023, 8, 1, 15, 10),
+                           end=datetime.datetime(2023, 8, 1, 15, 50))
+
+    assert arg_dict['rollup_start'] == arg_dict['rollup_end'] == datetime.datetime(2023, 8, 1, 15, 50)
+
+
+def test_range_of_half_hour_timezone_reads_messages(mocker):
+    start = datetime.datetime(2023, 8, 1, 18, 30)
+    arg_dict = _range_args(mocker, datetime.datetime(2023, 8, 10, 8), timezone='Asia/Kolkata', start=start)
+
+    assert arg_dict['rollup_start'] == arg_dict['rollup_end'] == start
@@ -0,0 +1,103 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+from flask import Flask
+
+from core.generator.llm_generator import LLMGenerator
+from core.prompt.prompts import CONVERSATION_SUMMARY_PROMPT
+from services.conversation_generation_service import ConversationGenerationService
+
+
+def _model_instance(mocker, max_tokens):
+    model_instance = MagicMock()
+    # one token per character of the prompt messages
+    model_instance.get_num_tokens.side_effect = lambda messages: sum(len(message.content) for message in messages)
+    model_instance.model_rules.max_tokens.max = max_tokens
+    model_instance.run.return_value = SimpleNamespace(content=' summary ')
+    mocker.patch('core.generator.llm_generator.ModelFactory.get_text_generation_model', return_value=model_instance)
+    return model_instance
+
+
+def _messages(count, length=10):
+    return [SimpleNamespace(query='q' * length, answer='a' * length) for _ in range(count)]
+
+
+def test_summary_context_is_filled_in_order_with_each_message_tokenized_once(mocker):
+    prompt_tokens = len(CONVERSATION_SUMMARY_PROMPT.format(context=''))
+    message_tokens = len("\n\nHuman:" + 'q' * 10 + "\n\nAssistant:" + 'a' * 10)
+    # room for 3 messages
+    model_instance = _model_instance(mocker, prompt_tokens + 200 + 1 + message_tokens * 3 + 1)
+
+    consumed = []
+
+    def messages():
+        for message in _messages(10):
+            consumed.append(message)
+            yield message
+
+    summary = LLMGenerator.generate_conversation_summary('tenant-1', messages())
+
+    assert summary == 'summary'
+    prompt = model_instance.run.call_args[0][0][0].content
+    assert prompt.count('Human:') == 3
+    # the messages after the budget is full are not consumed, nor tokenized
+    assert len(consumed) == 4
+    assert model_instance.get_num_tokens.call_count == 3 + 3
+
+
+def test_summary_skips_the_messages_which_do_not_fit(mocker):
+    prompt_tokens = len(CONVERSATION_SUMMARY_PROMPT.format(context=''))
+    model_instance = _model_instance(mocker, prompt_tokens + 200 + 1 + 100)
+
+    messages = _messages(1, length=200) + _messages(1)
+
+    LLMGenerator.generate_conversation_summary('tenant-1', messages)
+
+    prompt = model_instance.run.call_args[0][0][0].content
+    assert 'q' * 200 not in prompt
+    assert "\n\nHuman:" + 'q' * 10 + "\n\nAssistant:" + 'a' * 10 in prompt
+
+
+def test_queue_schedules_one_batch_task_per_interval(mocker):
+    redis_client = mocker.patch('services.conversation_generation_service.redis_client')
+    redis_client.set.side_effect = [True, None]
+    task = mocker.patch('services.conversation_generation_service.generate_conversation_batch_task')
+
+    ConversationGenerationService.queue(ConversationGenerationService.SUMMARY, 'conversation-1')
+    ConversationGenerationService.queue(ConversationGenerationService.SUMMARY, 'conversation-2')
+
+    assert redis_client.sadd.call_count == 2
+    task.apply_async.assert_called_once_with(
+        ('summary',), countdown=ConversationGenerationService.INTERVALS['summary']
+    )
+
+
+def test_generate_pending_drains_a_batch_and_reschedules_the_rest(mocker):
+    redis_client = mocker.patch('services.conversation_generation_service.redis_client')
+    redis_client.spop.return_value = [b'conversation-1', b'conversation-2']
+    redis_client.scard.return_value = 3
+    redis_client.set.return_value = True
+    task = mocker.patch('services.conversation_generation_service.generate_conversation_batch_task')
+    generate_summaries = mocker.patch.object(ConversationGenerationService, 'generate_summaries', return_value=2)
+
+    generated = ConversationGenerationService.generate_pending(ConversationGenerationService.SUMMARY)
+
+    assert generated == 2
+    redis_client.spop.assert_called_once_with('conversation_summary_pending', ConversationGenerationService.BATCH_SIZE)
+    generate_summaries.assert_called_once_with(['conversation-1', 'conversation-2'])
+    task.apply_async.assert_called_once()
+
+
+def test_generate_is_bounded_by_the_workers(mocker):
+    app = Flask(__name__)
+    app.config['CONVERSATION_GENERATION_MAX_WORKERS'] = 2
+    executor = mocker.patch('services.conversation_generation_service.ThreadPoolExecutor')
+    executor.return_value.__enter__.return_value.map.side_effect = lambda func, rows: map(func, rows)
+    generate_func = MagicMock(side_effect=[True, False, True])
+
+    with app.app_context():
+        generated = ConversationGenerationService._generate(generate_func, ['row-1', 'row-2', 'row-3'])
+
+    assert generated == 2
+    assert executor.call_args[1]['max_workers'] == 2
+    assert generate_func.call_args_list[0][0] == (app, 'row-1')
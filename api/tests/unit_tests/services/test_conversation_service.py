@@ -0,0 +1,119 @@
+import datetime
+import json
+
+import pytest
+
+from extensions.ext_database import db
+from models.account import Account
+from models.model import Conversation, Message, MessageAnnotation, AppModelConfig
+from services.conversation_service import ConversationService
+
+# properties marshalled by the console chat and completion conversation lists
+LIST_PROPERTIES = ['from_end_user_session_id', 'summary_or_query', 'annotated', 'annotation', 'model_config',
+                   'message_count', 'user_feedback_stats', 'admin_feedback_stats', 'first_message']
+
+
+class FakeQuery:
+    def __init__(self, rows):
+        self._rows = rows
+
+    def filter(self, *args):
+        return self
+
+    def group_by(self, *args):
+        return self
+
+    def distinct(self, *args):
+        return self
+
+    def order_by(self, *args):
+        return self
+
+    def all(self):
+        return self._rows
+
+    def first(self):
+        return self._rows[0] if self._rows else None
+
+    def count(self):
+        return len(self._rows)
+
+
+class FakeSession:
+    """Session which records the queries and answers them with the rows of the queried entity."""
+
+    def __init__(self, rows_by_entity):
+        self.queries = []
+        self._rows_by_entity = rows_by_entity
+
+    def query(self, *entities):
+        entity = entities[0]
+        key = f'{entity.class_.__name__}.{entity.key}' if hasattr(entity, 'class_') else entity.__name__
+        self.queries.append(key)
+        return FakeQuery(self._rows_by_entity.get(key, []))
+
+
+def _page(size: int):
+    conversations = [Conversation(
+        id=f'conversation-{i}',
+        app_model_config_id='app-model-config',
+        model_id='gpt-3.5-turbo',
+        model_provider='openai',
+        summary=None,
+        from_end_user_id=f'end-user-{i}',
+        created_at=datetime.datetime.utcnow()
+    ) for i in range(size)]
+
+    rows_by_entity = {
+        'Message.conversation_id': [(conversation.id, 3) for conversation in conversations],
+        'MessageFeedback.conversation_id': [(conversation.id, 'user', 'like', 1) for conversation in conversations],
+        'Message': [Message(conversation_id=conversation.id, query='hello') for conversation in conversations],
+        'MessageAnnotation': [MessageAnnotation(conversation_id=conversations[0].id, account_id='account')],
+        'Account': [Account(id='account', name='admin')],
+        'EndUser.id': [(conversation.from_end_user_id, f'session-{i}') for i, conversation in enumerate(conversations)],
+        'AppModelConfig': [AppModelConfig(id='app-model-config', configs={}, model=json.dumps({'name': 'gpt'}))],
+    }
+
+    return conversations, FakeSession(rows_by_entity)
+
+
+@pytest.mark.parametrize('page_size', [1, 20, 100])
+def test_list_aggregates_query_count_does_not_grow_with_page(mocker, page_size):
+    conversations, session = _page(page_size)
+    mocker.patch.object(db, 'session', session)
+
+    ConversationService.load_list_aggregates(conversations)
+    assert len(session.queries) == 7
+
+    # marshalling the page reads the preloaded values only
+    session.queries.clear()
+    for conversation in conversations:
+        for name in LIST_PROPERTIES:
+            getattr(conversation, name)
+        if conversation.annotation:
+            conversation.annotation.account
+    assert session.queries == []
+
+
+def test_list_aggregates_values(mocker):
+    conversations, session = _page(2)
+    mocker.patch.object(db, 'session', session)
+
+    ConversationService.load_list_aggregates(conversations)
+
+    assert conversations[0].message_count == 3
+    assert conversations[0].user_feedback_stats == {'like': 1, 'dislike': 0}
+    assert conversations[0].admin_feedback_stats == {'like': 0, 'dislike': 0}
+    assert conversations[0].summary_or_query == 'hello'
+    assert conversations[0].annotated and conversations[0].annotation.account.name == 'admin'
+    assert not conversations[1].annotated and conversations[1].annotation is None
+    assert conversations[1].from_end_user_session_id == 'session-1'
+    assert conversations[1].model_config['model'] == {'name': 'gpt'}
+
+
+def test_properties_query_without_preload(mocker):
+    session = FakeSession({'Message': [Message(conversation_id='conversation', query='hello')]})
+    mocker.patch.object(db, 'session', session)
+
+    assert Conversation(id='conversation').message_count == 1
+    assert session.queries == ['Message']
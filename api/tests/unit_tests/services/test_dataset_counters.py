@@ -0,0 +1,46 @@
+from sqlalchemy import update
+from sqlalchemy.dialects import postgresql
+
+from models.dataset import Dataset, Document
+from services.dataset_service import DatasetService
+
+
+def _compile_update(mocker, model, update_counters, key):
+    db = mocker.patch('models.dataset.db.session')
+    update_counters(key)
+
+    values = db.query.return_value.filter.return_value.update.call_args[0][0]
+    return str(update(model).values(values).compile(dialect=postgresql.dialect()))
+
+
+def test_dataset_counters_are_recounted_in_one_statement(mocker):
+    sql = _compile_update(mocker, Dataset, Dataset.update_counters, 'dataset-id')
+
+    assert sql.startswith('UPDATE datasets SET app_count=(SELECT count(app_dataset_joins.id)')
+    assert 'WHERE app_dataset_joins.dataset_id = datasets.id' in sql
+    assert 'WHERE document_segments.dataset_id = datasets.id' in sql
+    for counter in ['document_count', 'available_document_count', 'available_segment_count', 'word_count']:
+        assert f'{counter}=(SELECT' in sql
+
+
+def test_document_counters_are_recounted_in_one_statement(mocker):
+    sql = _compile_update(mocker, Document, Document.update_counters, 'document-id')
+
+    assert 'segment_count=(SELECT count(document_segments.id)' in sql
+    assert 'hit_count=(SELECT coalesce(sum(document_segments.hit_count)' in sql
+    assert 'WHERE document_segments.document_id = documents.id' in sql
+
+
+def test_reconcile_counters_walks_datasets_by_id(mocker):
+    db = mocker.patch('services.dataset_service.db')
+    batches = [[('a',), ('b',)], [('c',)], []]
+    db.session.query.return_value.filter.return_value.order_by.return_value.limit.side_effect = batches[1:]
+    db.session.query.return_value.order_by.return_value.limit.return_value = batches[0]
+    update_dataset = mocker.patch.object(Dataset, 'update_counters')
+    update_documents = mocker.patch.object(Document, 'update_dataset_counters')
+
+    assert DatasetService.reconcile_counters(batch_size=2) == 3
+
+    assert [c.args[0] for c in update_dataset.call_args_list] == ['a', 'b', 'c']
+    assert [c.args[0] for c in update_documents.call_args_list] == ['a', 'b', 'c']
+    assert db.session.commit.call_count == 3
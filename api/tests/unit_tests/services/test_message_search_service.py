@@ -0,0 +1,40 @@
+from sqlalchemy.dialects import postgresql
+
+from core.helper.search_tokenizer import to_search_text, to_ts_query
+from services.message_search_service import MessageSearchService
+
+WELCOME = '\u6b22\u8fce\u4f7f\u7528'
+PEOPLES_REPUBLIC_OF_CHINA = '\u4e2d\u534e\u4eba\u6c11\u5171\u548c\u56fd'
+REPUBLIC = '\u5171\u548c\u56fd'
+PEOPLE = '\u4eba\u6c11'
+BEIJING = '\u5317\u4eac'
+
+
+def test_search_text_contains_sub_words():
+    tokens = to_search_text(WELCOME + ' Dify.AI ' + PEOPLES_REPUBLIC_OF_CHINA).split(' ')
+
+    assert {'dify', 'ai', REPUBLIC, PEOPLE, PEOPLES_REPUBLIC_OF_CHINA} <= set(tokens)
+
+
+def test_ts_query_matches_all_words_by_prefix():
+    assert to_ts_query('Hello ' + BEIJING) == "'hello':* & '" + BEIJING + "':*"
+    assert to_ts_query("it's a|b") == "'it':* & 's':* & 'a':* & 'b':*"
+    assert to_ts_query('!!! ...') is None
+
+
+def _compile(query) -> str:
+    return str(query.compile(dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True}))
+
+
+def test_search_conversation_ids_uses_search_index():
+    sql = _compile(MessageSearchService.search_conversation_ids('app-id', 'hello'))
+
+    assert 'FROM message_search_indexes' in sql
+    assert "message_search_indexes.content @@ to_tsquery('simple', '''hello'':*')" in sql
+
+
+def test_search_conversation_ids_falls_back_for_symbols():
+    sql = _compile(MessageSearchService.search_conversation_ids('app-id', '%%'))
+
+    assert 'FROM messages' in sql
+    assert 'ILIKE' in sql
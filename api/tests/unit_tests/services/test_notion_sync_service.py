@@ -0,0 +1,50 @@
+import datetime
+from unittest.mock import MagicMock
+
+from core.data_loader.loader.notion_fetcher import NotionBlockFetcher, TokenBucket
+from services.notion_sync_service import NotionSyncService
+
+# search results sorted by last_edited_time descending, two per result page
+RESULTS = [
+    {'id': 'page-{}'.format(i), 'last_edited_time': '2023-08-12T10:{:02d}:00.000Z'.format(50 - i)}
+    for i in range(10)
+]
+
+
+def _fake_search(mocker):
+    requests = []
+
+    def request(method, url, params=None, json=None, timeout=None):
+        requests.append(json)
+        start = int(json.get('start_cursor', 0))
+        response = MagicMock()
+        response.status_code = 200
+        response.json.return_value = {
+            'results': RESULTS[start:start + 2],
+            'has_more': start + 2 < len(RESULTS),
+            'next_cursor': str(start + 2) if start + 2 < len(RESULTS) else None
+        }
+        return response
+
+    mocker.patch('requests.Session.request', side_effect=request)
+    mocker.patch.object(NotionBlockFetcher, '_get_bucket', return_value=TokenBucket(1000))
+    return requests
+
+
+def test_get_edited_times_stops_at_watermark(mocker):
+    requests = _fake_search(mocker)
+
+    edited_times = NotionSyncService.get_edited_times_since('token', datetime.datetime(2023, 8, 12, 10, 47))
+
+    assert list(edited_times) == ['page0', 'page1', 'page2', 'page3']
+    assert len(requests) == 3
+    assert requests[0]['sort'] == {'direction': 'descending', 'timestamp': 'last_edited_time'}
+
+
+def test_get_edited_times_without_watermark_lists_all(mocker):
+    requests = _fake_search(mocker)
+
+    edited_times = NotionSyncService.get_edited_times_since('token')
+
+    assert len(edited_times) == 10
+    assert len(requests) == 5
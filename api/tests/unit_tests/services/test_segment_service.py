@@ -0,0 +1,55 @@
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.orm import Query
+
+from models.dataset import DocumentSegment
+from services.dataset_service import SegmentService
+
+BEIJING = '\u5317\u4eac'
+
+
+def _compile(query) -> str:
+    return str(query.statement.compile(dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True}))
+
+
+def _segment_query():
+    return Query(DocumentSegment).filter(DocumentSegment.document_id == 'document-id')
+
+
+def test_filter_by_keyword_uses_search_vector():
+    sql = _compile(SegmentService.filter_by_keyword(_segment_query(), BEIJING + ' Hello'))
+
+    assert "document_segments.search_vector @@ to_tsquery('simple', '''" + BEIJING + "'':* & ''hello'':*')" in sql
+    assert 'ILIKE' not in sql
+    # the vector is not loaded with the segments
+    assert 'document_segments.search_vector AS' not in sql
+
+
+def test_filter_by_keyword_falls_back_for_symbols():
+    sql = _compile(SegmentService.filter_by_keyword(_segment_query(), '%%'))
+
+    assert 'document_segments.content ILIKE' in sql
+
+
+def test_count_is_exact_up_to_limit(mocker):
+    db = mocker.patch('services.dataset_service.db')
+    db.session.query.return_value.select_from.return_value.scalar.return_value = 42
+    estimate = mocker.patch('services.dataset_service.estimate_count')
+
+    assert SegmentService.count(_segment_query()) == 42
+    estimate.assert_not_called()
+
+    subquery = db.session.query.return_value.select_from.call_args[0][0]
+    assert 'LIMIT {}'.format(SegmentService.EXACT_COUNT_LIMIT + 1) in str(subquery.compile(
+        dialect=postgresql.dialect(), compile_kwargs={'literal_binds': True}))
+
+
+def test_count_is_estimated_above_limit(mocker):
+    db = mocker.patch('services.dataset_service.db')
+    db.session.query.return_value.select_from.return_value.scalar.return_value = SegmentService.EXACT_COUNT_LIMIT + 1
+    mocker.patch('services.dataset_service.estimate_count', return_value=25000)
+
+    assert SegmentService.count(_segment_query()) == 25000
+
+    # estimates are never below the rows counted
+    mocker.patch('services.dataset_service.estimate_count', return_value=10)
+    assert SegmentService.count(_segment_query()) == SegmentService.EXACT_COUNT_LIMIT + 1
@@ -0,0 +1,183 @@
+import os
+import random
+import re
+import time
+from typing import List
+
+import pytest
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+from core.spiltter.fixed_text_splitter import FixedRecursiveCharacterTextSplitter
+
+# chinese words for dataset, segment and index, and the chinese full stop
+CJK_WORDS = ['\u6570\u636e\u96c6', '\u5206\u6bb5', '\u7d22\u5f15']
+CJK_FULL_STOP = '\u3002'
+
+# a BPE like tokenizer: words, runs of whitespace and single symbols, counts are not additive over concatenation
+TOKEN_PATTERN = re.compile(r"\s+|\w{1,6}|[^\w\s]")
+
+
+def _token_length(text: str) -> int:
+    return len(TOKEN_PATTERN.findall(text))
+
+
+class LegacyFixedRecursiveCharacterTextSplitter(RecursiveCharacterTextSplitter):
+    """The splitter before lengths were cached, the regression oracle."""
+
+    def __init__(self, fixed_separator: str = "\n\n", separators: List[str] = None, **kwargs):
+        super().__init__(**kwargs)
+        self._fixed_separator = fixed_separator
+        self._separators = separators or ["\n\n", "\n", " ", ""]
+
+    def split_text(self, text: str) -> List[str]:
+        chunks = text.split(self._fixed_separator) if self._fixed_separator else list(text)
+        final_chunks = []
+        for chunk in chunks:
+            if self._length_function(chunk) > self._chunk_size:
+                final_chunks.extend(self.recursive_split_text(chunk))
+            else:
+                final_chunks.append(chunk)
+        return final_chunks
+
+    def recursive_split_text(self, text: str) -> List[str]:
+        final_chunks = []
+        separator = self._separators[-1]
+        for _s in self._separators:
+            if _s == "":
+                separator = _s
+                break
+            if _s in text:
+                separator = _s
+                break
+        splits = text.split(separator) if separator else list(text)
+        _good_splits = []
+        for s in splits:
+            if self._length_function(s) < self._chunk_size:
+                _good_splits.append(s)
+            else:
+                if _good_splits:
+                    final_chunks.extend(self._merge_splits(_good_splits, separator))
+                    _good_splits = []
+                final_chunks.extend(self.recursive_split_text(s))
+        if _good_splits:
+            final_chunks.extend(self._merge_splits(_good_splits, separator))
+        return final_chunks
+
+
+def _corpus(seed: int, paragraphs: int) -> str:
+    rng = random.Random(seed)
+    words = ['dataset', 'segment', 'index', 'embedding', 'token', 'the', 'a', 'of', *CJK_WORDS,
+             'https://dify.ai/docs', 'foo@example.com', '3.14', '2023-08-12']
+    text = []
+    for _ in range(paragraphs):
+        sentences = []
+        for _ in range(rng.randint(1, 12)):
+            sentence = ' '.join(rng.choice(words) for _ in range(rng.randint(1, 40)))
+            sentences.append(sentence + rng.choice(['.', CJK_FULL_STOP, '', '\n']))
+        # a few long runs without any separator
+        if rng.random() < 0.05:
+            sentences.append('x' * rng.randint(100, 3000))
+        text.append(' '.join(sentences))
+    return rng.choice(['\n\n', '\n', '\n\n\n']).join(text)
+
+
+SPLITTER_ARGS = [
+    {'chunk_size': 50, 'fixed_separator': '\n\n', 'separators': ["\n\n", CJK_FULL_STOP, ".", " ", ""]},
+    {'chunk_size': 200, 'fixed_separator': '\n', 'separators': ["\n\n", CJK_FULL_STOP, ".", " ", ""]},
+    {'chunk_size': 1000, 'fixed_separator': '', 'separators': ["\n\n", CJK_FULL_STOP, ".", " ", ""]},
+    {'chunk_size': 120, 'fixed_separator': '\n\n', 'separators': None},
+]
+
+
+@pytest.mark.parametrize('splitter_args', SPLITTER_ARGS)
+def test_output_matches_legacy_splitter(splitter_args):
+    legacy_splitter = LegacyFixedRecursiveCharacterTextSplitter(
+        length_function=_token_length, chunk_overlap=0, **splitter_args)
+    splitter = FixedRecursiveCharacterTextSplitter(length_function=_token_length, chunk_overlap=0, **splitter_args)
+
+    for seed in range(20):
+        text = _corpus(seed, paragraphs=30)
+        assert splitter.split_text(text) == legacy_splitter.split_text(text)
+
+
+def test_output_matches_legacy_splitter_with_tiktoken():
+    tiktoken = pytest.importorskip('tiktoken')
+    try:
+        enc = tiktoken.get_encoding('gpt2')
+    except Exception:
+        pytest.skip('gpt2 encoding is not available')
+
+    splitter = FixedRecursiveCharacterTextSplitter.from_tiktoken_encoder(chunk_size=200, chunk_overlap=0)
+    legacy_splitter = LegacyFixedRecursiveCharacterTextSplitter(
+        length_function=lambda text: len(enc.encode(text, disallowed_special='all')), chunk_size=200, chunk_overlap=0)
+
+    for seed in range(5):
+        text = _corpus(seed, paragraphs=50)
+        assert splitter.split_text(text) == legacy_splitter.split_text(text)
+
+
+def test_tiktoken_encoder_measures_each_piece_once(mocker):
+    class StubEncoding:
+        def __init__(self):
+            self.encoded = []
+
+        def encode(self, text, allowed_special=set(), disallowed_special='all'):
+            self.encoded.append(text)
+            return TOKEN_PATTERN.findall(text)
+
+        def encode_batch(self, *args, **kwargs):
+            raise AssertionError('encode_batch starts a thread pool per call')
+
+    encoding = StubEncoding()
+    mocker.patch('tiktoken.get_encoding', return_value=encoding)
+
+    splitter_args = {'chunk_size': 200, 'chunk_overlap': 0, 'fixed_separator': '\n\n',
+                     'separators': ["\n\n", CJK_FULL_STOP, ".", " ", ""]}
+    splitter = FixedRecursiveCharacterTextSplitter.from_tiktoken_encoder(**splitter_args)
+    legacy_splitter = LegacyFixedRecursiveCharacterTextSplitter(length_function=_token_length, **splitter_args)
+
+    text = _corpus(7, paragraphs=50)
+    assert splitter.split_text(text) == legacy_splitter.split_text(text)
+    assert len(encoding.encoded) == len(set(encoding.encoded))
+
+
+def test_split_measures_fewer_pieces_than_legacy():
+    text = _corpus(42, paragraphs=600)
+    splitter_args = {'chunk_size': 200, 'chunk_overlap': 0, 'fixed_separator': '\n\n',
+                     'separators': ["\n\n", CJK_FULL_STOP, ".", " ", ""]}
+
+    calls = {'legacy': 0, 'cached': 0}
+
+    def counting_length(name):
+        def length(text):
+            calls[name] += 1
+            return _token_length(text)
+        return length
+
+    legacy_splitter = LegacyFixedRecursiveCharacterTextSplitter(length_function=counting_length('legacy'),
+                                                                **splitter_args)
+    splitter = FixedRecursiveCharacterTextSplitter(length_function=counting_length('cached'), **splitter_args)
+
+    assert splitter.split_text(text) == legacy_splitter.split_text(text)
+    assert calls['cached'] < calls['legacy']
+
+
+@pytest.mark.skipif(not os.environ.get('RUN_BENCHMARKS'), reason='set RUN_BENCHMARKS to run the benchmarks')
+def test_split_benchmark():
+    """Latency of the cached splitter against the legacy splitter, on a corpus of ~1MB."""
+    text = _corpus(42, paragraphs=600)
+    splitter_args = {'chunk_size': 200, 'chunk_overlap': 0, 'fixed_separator': '\n\n',
+                     'separators': ["\n\n", CJK_FULL_STOP, ".", " ", ""]}
+
+    legacy_splitter = LegacyFixedRecursiveCharacterTextSplitter(length_function=_token_length, **splitter_args)
+    splitter = FixedRecursiveCharacterTextSplitter(length_function=_token_length, **splitter_args)
+
+    start = time.perf_counter()
+    legacy_splitter.split_text(text)
+    legacy_latency = time.perf_counter() - start
+
+    start = time.perf_counter()
+    splitter.split_text(text)
+    latency = time.perf_counter() - start
+
+    assert latency < legacy_latency
@@ -0,0 +1,102 @@
+import json
+import os
+import random
+import re
+import time
+
+import pytest
+
+from core.spiltter.text_cleaner import TextCleaner, filter_string
+from models.dataset import DatasetProcessRule
+
+
+def legacy_filter_string(text):
+    text = re.sub(r'<\|', '<', text)
+    text = re.sub(r'\|>', '>', text)
+    text = re.sub(r'[\x00-\x08\x0B\x0C\x0E-\x1F\x7F\x80-\xFF]', '', text)
+    return text
+
+
+def legacy_document_clean(text, rules):
+    for pre_processing_rule in rules['pre_processing_rules']:
+        if pre_processing_rule["id"] == "remove_extra_spaces" and pre_processing_rule["enabled"] is True:
+            text = re.sub(r'\n{3,}', '\n\n', text)
+            text = re.sub(r'[\t\f\r\x20\u00a0\u1680\u180e\u2000-\u200a\u202f\u205f\u3000]{2,}', ' ', text)
+        elif pre_processing_rule["id"] == "remove_urls_emails" and pre_processing_rule["enabled"] is True:
+            text = re.sub(r'([a-zA-Z0-9_.+-]+@[a-zA-Z0-9-]+\.[a-zA-Z0-9-.]+)', '', text)
+            text = re.sub(r'https?://[^\s]+', '', text)
+    return text
+
+
+ALPHABET = ['a', 'b', 'h', 't', 'p', 's', 'http', 'https://', '://', '@', '.', '-', '_', '+', '/', ':',
+            ' ', '  ', '\n', '\n\n\n\n', '\t', '\u3000', ' ', '<|', '|>', '<', '|', '>', '\x00', '\x1f',
+            '\x7f', 'é', '\u6570\u636e', 'foo@bar.com', 'http://dify.ai/x']
+
+
+def _fuzz_text(rng: random.Random, length: int) -> str:
+    return ''.join(rng.choice(ALPHABET) for _ in range(length))
+
+
+def _rules(remove_extra_spaces: bool, remove_urls_emails: bool) -> dict:
+    return {'pre_processing_rules': [
+        {'id': 'remove_extra_spaces', 'enabled': remove_extra_spaces},
+        {'id': 'remove_urls_emails', 'enabled': remove_urls_emails}
+    ]}
+
+
+def test_filter_string_matches_legacy():
+    rng = random.Random(0)
+    for _ in range(2000):
+        text = _fuzz_text(rng, 40)
+        assert filter_string(text) == legacy_filter_string(text)
+
+
+@pytest.mark.parametrize('remove_extra_spaces,remove_urls_emails', [(True, True), (True, False), (False, True)])
+def test_clean_matches_legacy(remove_extra_spaces, remove_urls_emails):
+    rules = _rules(remove_extra_spaces, remove_urls_emails)
+    text_cleaner = TextCleaner.from_processing_rule(DatasetProcessRule(mode='custom', rules=json.dumps(rules)))
+
+    rng = random.Random(1)
+    for _ in range(2000):
+        text = _fuzz_text(rng, 40)
+        assert text_cleaner.clean(text) == legacy_document_clean(text, rules)
+
+
+def _page_sized_texts(count: int) -> list:
+    rng = random.Random(2)
+    words = ['dataset', 'segment', 'document', '\u6570\u636e\u96c6', '\u5206\u6bb5', 'indexing', 'the', 'of',
+             '  ', '\n']
+    rare_words = ['foo@example.com', 'https://dify.ai/docs', '<|endoftext|>', 'café', '\x0c', '\n\n\n\n']
+    return [' '.join(rng.choice(rare_words) if rng.random() < 0.01 else rng.choice(words)
+                     for _ in range(rng.randint(10, 100)))
+            for _ in range(count)]
+
+
+def test_clean_matches_legacy_on_page_sized_texts():
+    texts = _page_sized_texts(2000)
+    rules = _rules(True, True)
+    text_cleaner = TextCleaner.from_processing_rule(DatasetProcessRule(mode='custom', rules=json.dumps(rules)))
+
+    results = [text_cleaner.clean(filter_string(text)) for text in texts]
+
+    assert results == [legacy_document_clean(legacy_filter_string(text), rules) for text in texts]
+
+
+@pytest.mark.skipif(not os.environ.get('RUN_BENCHMARKS'), reason='set RUN_BENCHMARKS to run the benchmarks')
+def test_cleaning_benchmark():
+    """Latency of the compiled cleaning against the legacy passes, on ~4MB of page and block sized texts."""
+    texts = _page_sized_texts(20000)
+    rules = _rules(True, True)
+    text_cleaner = TextCleaner.from_processing_rule(DatasetProcessRule(mode='custom', rules=json.dumps(rules)))
+
+    start = time.perf_counter()
+    for text in texts:
+        legacy_document_clean(legacy_filter_string(text), json.loads(json.dumps(rules)))
+    legacy_latency = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for text in texts:
+        text_cleaner.clean(filter_string(text))
+    latency = time.perf_counter() - start
+
+    assert latency < legacy_latency